@@ -0,0 +1,83 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# --- Streamlitアプリの起動時間・再実行時間の計測 ---
+# --- Startup and Rerun Timing Harness for the Streamlit App ---
+#
+# 使い方 / Usage:
+#   python bench_app.py --reruns 20 --output bench_history.jsonl
+#
+# 起動時間は新しいPythonプロセスでの初回実行 (import込み)、再実行時間は同じプロセスでの2回目以降の実行を計る。
+# 結果はJSONで出力し、--output を指定するとファイルに一行ずつ追記する。
+# Startup time is the first run in a fresh Python process (including imports);
+# rerun time is each subsequent run in the same process.
+# Results are printed as JSON and appended one line at a time to the --output file if given.
+
+APP_PATH = Path(__file__).resolve().parent / "main.py"
+
+# 新しいプロセスで実行するコード (初回実行と再実行の時間をJSONで出力する)
+# Code executed in a fresh process (prints first-run and rerun times as JSON)
+CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+at.run()
+startup_seconds = time.perf_counter() - start
+if at.exception:
+    raise SystemExit(str(at.exception))
+rerun_seconds = []
+for _ in range(int(sys.argv[2])):
+    rerun_start = time.perf_counter()
+    at.run()
+    rerun_seconds.append(time.perf_counter() - rerun_start)
+heavy_modules = [name for name in ("pandas", "matplotlib", "matplotlib_fontja") if name in sys.modules]
+print(json.dumps({"startup_seconds": startup_seconds, "rerun_seconds": rerun_seconds, "loaded_heavy_modules": heavy_modules}))
+"""
+
+
+def measure(num_reruns):
+    """
+    新しいプロセスでアプリを実行し、起動時間と再実行時間の統計を返す。
+    Runs the app in a fresh process and returns startup and rerun time statistics.
+    """
+    wall_start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, str(APP_PATH), str(num_reruns)],
+        capture_output=True, text=True, check=True, cwd=APP_PATH.parent,
+    )
+    process_seconds = time.perf_counter() - wall_start
+    child_result = json.loads(completed.stdout.strip().splitlines()[-1])
+    rerun_seconds = child_result["rerun_seconds"]
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "process_seconds": process_seconds,
+        "startup_seconds": child_result["startup_seconds"],
+        "rerun_median_seconds": statistics.median(rerun_seconds) if rerun_seconds else None,
+        "rerun_max_seconds": max(rerun_seconds) if rerun_seconds else None,
+        "num_reruns": num_reruns,
+        "loaded_heavy_modules": child_result["loaded_heavy_modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlitアプリの起動・再実行時間を計測する") # Measure startup and rerun time of the Streamlit app
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--output", help="結果を追記するJSON Linesファイル / JSON Lines file to append results to")
+    args = parser.parse_args()
+
+    result = measure(args.reruns)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
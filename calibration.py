@@ -0,0 +1,350 @@
+import argparse
+import json
+
+import numpy as np
+
+from damage_calc import build_scenario
+from damage_table import DamageTable, buff_level_index, base_damage_array, status_ratio_correction_array
+
+# --- 未検証の定数の較正 ---
+# --- Calibrating Unverified Constants ---
+#
+# ゲーム内で記録したダメージ (条件が分かっているもの) から、未検証のメモリアスキル効果値を最尤推定する。
+# 尤度はシミュレーションではなく厳密に計算する:
+#   補助スキルの発動の組み合わせは、補助スキル効果の値ごとの確率分布にまとめる。
+#   乱数係数 (0.9〜1.0 の一様分布) は、記録したダメージになる区間の長さとして解析的に積分する。
+#   クリティカルと最低ダメージの処理は、記録したダメージから乱数処理後のダメージを逆算する。
+# 各記録はメモリア詳細種別一つの効果値にしか依存しないため、種別ごとに1変数で推定し、
+# 尤度比 (プロファイル尤度) から95%信頼区間を求める。
+# Fits unverified memoria skill effect rates by maximum likelihood from damage recorded in game under known conditions.
+# The likelihood is computed exactly rather than by simulation:
+#   support skill activation combinations are collapsed into a probability distribution over support skill factors,
+#   the random factor (uniform on 0.9-1.0) is integrated analytically as the length of the interval giving the recorded damage,
+#   and the critical / minimum damage stage is inverted to recover the damage after the random factor.
+# Every record depends on the effect rate of a single memoria subtype, so each subtype is fitted as a one-variable
+# problem, and 95% confidence intervals come from the likelihood ratio (profile likelihood).
+#
+# 使い方 / Usage:
+#   python calibration.py observed.json --output calibration.json
+#
+# observed.json の例 / Example observed.json:
+#   {"setups": [
+#     {"scenario": {"base_attack": 800000, "selected_attack_memoria_subtype": "AⅤ", "atk_level": 10, ...},
+#      "damages": [412345, 398765, ...]}
+#   ]}
+# scenario は damage_calc.build_scenario と同じ形式 (バフと属性バフも含める)。
+# scenario has the same format as damage_calc.build_scenario (including buffs and attribute buffs).
+
+# 格子の点数と絞り込みの回数
+# Grid size and number of refinements
+GRID_SIZE = 201
+NUM_REFINEMENTS = 4
+
+# 起こりうる効果値の区間ごとの最低の格子点数 (狭い区間にも尤度の山がありうるため)
+# Minimum grid points per feasible interval (a narrow interval can still hold the likelihood peak)
+MIN_POINTS_PER_INTERVAL = 16
+
+# 95%信頼区間の対数尤度の低下幅。
+# 乱数係数が一様分布のため尤度は区間の端で最大になる (正則でない) 形になり、最大値からの低下は
+# 自由度1のカイ二乗分布 (低下幅1.92) ではなく指数分布に従う。そのため P(低下 > d) = 0.05 となる d = log(20) を使う。
+# Log-likelihood drop for the 95% confidence interval.
+# The uniform random factor makes the likelihood peak at an interval edge (a non-regular model), and the drop from the
+# maximum follows an exponential distribution rather than half a chi-square with 1 degree of freedom (drop 1.92).
+# So d = log(20), with P(drop > d) = 0.05, is used.
+CONFIDENCE_LOG_LIKELIHOOD_DROP = np.log(20)
+
+# 補助スキル効果の分布で無視する確率
+# Probabilities below this are dropped from the support skill factor distribution
+MIN_CONFIGURATION_PROBABILITY = 1e-15
+
+# 一度に計算する (格子点 × ダメージ × 補助スキル効果) の要素数の上限
+# Upper bound on (grid points x damages x support skill factors) elements computed at once
+MAX_BLOCK_ELEMENTS = 4_000_000
+
+
+def auxiliary_factor_distribution(table):
+    """
+    補助スキル効果 (1 + 発動した増幅の合計 + レジェンダリー増幅) の取りうる値と確率を返す。
+    Returns the possible support skill factors (1 + sum of activated amplifications + legendary amplification) and their probabilities.
+    """
+    sums = {0.0: 1.0}
+    for probability, amplification in zip(np.clip(table.aux_probabilities, 0.0, 1.0), table.aux_amplifications):
+        if probability == 0 or amplification == 0:
+            continue
+        next_sums = {}
+        for total, total_probability in sums.items():
+            for next_total, next_probability in [(total, total_probability * (1 - probability)),
+                                                 (round(total + amplification, 12), total_probability * probability)]:
+                if next_probability >= MIN_CONFIGURATION_PROBABILITY:
+                    next_sums[next_total] = next_sums.get(next_total, 0.0) + next_probability
+        sums = next_sums
+    totals = np.array(list(sums))
+    return 1 + (totals + table.legendary_amplification_total), np.array(list(sums.values()))
+
+
+class CalibrationSetup:
+    """
+    一つの条件 (シナリオ) で記録したダメージと、効果値によらない部分の事前計算。
+    Damages recorded under one condition (scenario) and the precomputed parts that do not depend on the effect rate.
+    """
+
+    def __init__(self, payload, damages, setup_index=0):
+        self.setup_index = setup_index
+        self.excluded = []
+        self.scenario = build_scenario(payload)
+        table = DamageTable(self.scenario)
+        self.subtype = self.scenario["selected_attack_memoria_subtype"]
+        self.current_rate = table.game_tables.memoria_skill_effect_rate[self.subtype]
+        self.unverified = self.subtype in table.game_tables.unverified_memoria_skills
+        self.breakthrough_rate = table.game_tables.breakthrough_multiplier_rate[self.scenario["selected_breakthrough_multiplier_rate"]]
+
+        final_atk = table.final_atk_by_level[buff_level_index(self.scenario["atk_level"])] + self.scenario["attribute_atk_buff_value"]
+        final_def = table.final_def_by_level[buff_level_index(self.scenario["def_level"])] + self.scenario["attribute_def_buff_value"]
+        # メモリア倍率1の基礎ダメージ = max(0, 最終攻撃力 - 2/3最終防御力)
+        # Base damage with memoria multiplier 1 = max(0, final ATK - 2/3 final DEF)
+        self.base_value = int(base_damage_array(final_atk, final_def, 1.0))
+
+        auxiliary_skill_factors, self.probabilities = auxiliary_factor_distribution(table)
+        self.correction_factors = table.total_correction_factors(
+            auxiliary_skill_factors, status_ratio_correction_array(final_atk, final_def))
+
+        corrections = table.game_tables.corrections
+        critical_correction = corrections["critical_multiplier"] if self.scenario["critical_active"] else 1.0
+        self.damages, self.counts = np.unique(np.asarray(damages, dtype=np.int64), return_counts=True)
+        # 最終ダメージから乱数処理後のダメージを逆算する (クリティカル倍率は1以上なので候補は一つ)
+        # Recover the damage after the random factor from the final damage (the critical multiplier is at least 1, so there is one candidate)
+        estimates = np.floor((self.damages - corrections["min_final_damage"]) / critical_correction).astype(np.int64)
+        candidates = np.full(len(self.damages), -1)
+        for offset in [-1, 0, 1]:
+            matches = (estimates + offset >= 0) & (
+                np.floor(corrections["min_final_damage"] + (estimates + offset) * critical_correction) == self.damages)
+            candidates = np.where(matches, estimates + offset, candidates)
+        self.randomized_damages = candidates
+        self._exclude(candidates < 0, "cannot occur after the critical / minimum damage stage")
+
+    def _exclude(self, mask, reason):
+        # 起こりえない記録を推定から外し、理由とともに excluded に残す
+        # Drop impossible records from the fit and keep them in excluded with the reason
+        for damage, count in zip(self.damages[mask], self.counts[mask]):
+            self.excluded.append({"setup": self.setup_index, "damage": int(damage), "count": int(count), "reason": reason})
+        self.damages, self.counts, self.randomized_damages = self.damages[~mask], self.counts[~mask], self.randomized_damages[~mask]
+
+    def feasible_rate_intervals(self):
+        """
+        記録ごと・補助スキル効果ごとに、その記録が起こりうる効果値の区間 (必要条件) を (記録数, 補助スキル効果の数, 2) の配列で返す。
+        基礎ダメージが0の条件は効果値によらないため None を返す (0以外の記録は起こりえないため推定から外す)。
+        Returns, for each record and support skill factor, the interval of effect rates in which the record can occur
+        (a necessary condition), as an array of shape (records, support skill factors, 2).
+        Setups with base damage 0 do not depend on the effect rate and return None (records other than 0 cannot occur and are excluded).
+        """
+        scale = self.base_value * self.breakthrough_rate
+        if scale == 0:
+            self._exclude(self.randomized_damages != 0, "cannot occur with base damage 0")
+            return None
+        # 補正後ダメージ K = floor(floor(scale * r) * C) は (scale * r - 1) * C - 1 以上 scale * r * C 以下で、
+        # 乱数処理後のダメージ R が起こるには K > R かつ 0.9K < R + 1 が必要
+        # The corrected damage K = floor(floor(scale * r) * C) lies between (scale * r - 1) * C - 1 and scale * r * C,
+        # and the damage R after the random factor requires K > R and 0.9K < R + 1
+        randomized = self.randomized_damages[:, None]
+        factors = self.correction_factors[None, :]
+        lower = randomized / (scale * factors)
+        upper = ((randomized + 1) / 0.9 + factors + 1) / (scale * factors)
+        return np.stack([lower, upper], axis=2)
+
+    def log_likelihoods(self, rates):
+        """
+        各効果値 (rates の各点) での、この条件の全ての記録の対数尤度の和を返す。
+        Returns the sum of the log-likelihoods of every record under this condition at each effect rate in rates.
+        """
+        rates = np.asarray(rates, dtype=np.float64)
+        base_damage = np.floor(self.base_value * (rates * self.breakthrough_rate))
+        corrected_damage = np.floor(base_damage[:, None] * self.correction_factors[None, :])
+
+        # 乱数処理後のダメージ K × 乱数係数 は [0.9K, K) 上の一様分布なので、R になる確率は
+        # [R, R+1) と [0.9K, K) の重なりの長さ / 0.1K。補助スキル効果ごとの確率の重みをまとめて掛ける。
+        # K = 0 なら乱数処理後のダメージは必ず0。
+        # K x random factor is uniform on [0.9K, K), so the probability of R is
+        # the overlap length of [R, R+1) and [0.9K, K) divided by 0.1K. The support skill factor probabilities are folded into the weights.
+        # When K = 0 the damage after the random factor is always 0.
+        with np.errstate(divide="ignore"):
+            weights = np.where(corrected_damage > 0, self.probabilities / (0.1 * corrected_damage), 0.0)
+        zero_probabilities = (self.probabilities * (corrected_damage == 0)).sum(axis=1)
+        lower_edges = (0.9 * corrected_damage)[:, None, :]
+        upper_edges = corrected_damage[:, None, :]
+
+        block_size = max(1, MAX_BLOCK_ELEMENTS // (len(rates) * len(self.correction_factors)))
+        log_likelihoods = np.zeros(len(rates))
+        for start in range(0, len(self.damages), block_size):
+            randomized = self.randomized_damages[start:start + block_size]
+            overlaps = np.minimum(randomized[None, :, None] + 1, upper_edges) - np.maximum(randomized[None, :, None], lower_edges)
+            np.maximum(overlaps, 0.0, out=overlaps)
+            likelihoods = np.matmul(overlaps, weights[:, :, None])[:, :, 0] + zero_probabilities[:, None] * (randomized == 0)[None, :]
+            with np.errstate(divide="ignore"):
+                log_likelihoods += np.log(likelihoods) @ self.counts[start:start + block_size]
+        return log_likelihoods
+
+
+def feasible_rate_set(setups):
+    """
+    全ての記録が起こりうる効果値の集合 (必要条件) を、重ならない区間の (区間数, 2) の配列で返す。
+    記録ごとに「どれかの補助スキル効果の区間に入る」ことを、全ての区間の端点を一度に走査して求める。
+    全ての記録を同時に説明できる効果値がない場合は、最も多くの記録を説明できる範囲 (複数あれば最も小さい効果値のもの) で
+    説明できない記録を推定から外す (各条件の excluded に残る)。
+    Returns the set of effect rates in which every record can occur (a necessary condition), as disjoint intervals of shape (intervals, 2).
+    "Inside the interval of some support skill factor" is evaluated for every record in one sweep over all interval endpoints.
+    If no effect rate explains every record at once, the records not explained by the range explaining the most records
+    (the lowest one if there are several) are excluded from the fit (they are kept in each setup's excluded).
+    """
+    while True:
+        feasible = _feasible_rate_set_or_exclude(setups)
+        if feasible is not None:
+            return feasible
+
+
+def _feasible_rate_set_or_exclude(setups):
+    setup_intervals_pairs = [(setup, setup.feasible_rate_intervals()) for setup in setups]
+    setup_intervals_pairs = [(setup, setup_intervals) for setup, setup_intervals in setup_intervals_pairs if setup_intervals is not None]
+    intervals = [setup_intervals for _, setup_intervals in setup_intervals_pairs]
+    if not intervals:
+        raise ValueError(f"subtype {setups[0].subtype}: every setup has base damage 0")
+
+    num_records = sum(len(setup_intervals) for setup_intervals in intervals)
+    if num_records == 0:
+        raise ValueError(f"subtype {setups[0].subtype}: none of the recorded damages can occur")
+    record_ids = np.concatenate([
+        np.repeat(np.arange(len(setup_intervals)), setup_intervals.shape[1]) + offset
+        for setup_intervals, offset in zip(intervals, np.cumsum([0] + [len(setup_intervals) for setup_intervals in intervals]))])
+    bounds = np.concatenate([setup_intervals.reshape(-1, 2) for setup_intervals in intervals])
+
+    # 記録ごとに端点を並べ、区間の重なり数が 0 -> 1 / 1 -> 0 になる点を「その記録が起こりうる範囲」の境界とする
+    # Sort the endpoints per record; where the overlap count goes 0 -> 1 / 1 -> 0 is a boundary of the record's feasible range
+    positions = np.concatenate([bounds[:, 0], bounds[:, 1]])
+    deltas = np.concatenate([np.ones(len(bounds), dtype=np.int64), -np.ones(len(bounds), dtype=np.int64)])
+    ids = np.concatenate([record_ids, record_ids])
+    order = np.lexsort((-deltas, positions, ids))
+    positions, deltas = positions[order], deltas[order]
+    # 各記録の増減の合計は0なので、全体の累積和は記録ごとの重なり数になる
+    # The deltas of each record sum to 0, so the overall cumulative sum is the per-record overlap count
+    overlaps = np.cumsum(deltas)
+    transitions = ((deltas == 1) & (overlaps == 1)) | ((deltas == -1) & (overlaps == 0))
+
+    # 起こりうる記録の数が全ての記録の数になる範囲を集める
+    # Collect the ranges where the number of possible records equals the number of records
+    positions, deltas = positions[transitions], deltas[transitions]
+    order = np.lexsort((-deltas, positions))
+    positions, deltas = positions[order], deltas[order]
+    num_possible = np.cumsum(deltas)
+    starts = np.flatnonzero(num_possible == num_records)
+    if len(starts):
+        return np.stack([positions[starts], positions[starts + 1]], axis=1)
+
+    # 最も多くの記録を説明できる範囲の中点で起こりえない記録を外す
+    # Exclude the records that cannot occur at the midpoint of the range explaining the most records
+    start = np.flatnonzero(num_possible == num_possible.max())[0]
+    midpoint = (positions[start] + positions[start + 1]) / 2
+    for setup, setup_intervals in setup_intervals_pairs:
+        possible = ((setup_intervals[:, :, 0] <= midpoint) & (midpoint <= setup_intervals[:, :, 1])).any(axis=1)
+        setup._exclude(~possible, "no effect rate explains it together with the other records")
+    return None
+
+
+def grid_over_intervals(intervals, size):
+    """
+    区間の長さに比例して (各区間に最低 MIN_POINTS_PER_INTERVAL 点) 格子点を置き、昇順の配列で返す。
+    Places grid points proportionally to interval lengths (at least MIN_POINTS_PER_INTERVAL per interval) and returns them in ascending order.
+    """
+    lengths = intervals[:, 1] - intervals[:, 0]
+    counts = np.maximum(MIN_POINTS_PER_INTERVAL, np.round(size * lengths / max(lengths.sum(), np.finfo(float).tiny))).astype(np.int64)
+    return np.concatenate([np.linspace(lower, upper, count) for (lower, upper), count in zip(intervals, counts)])
+
+
+def fit_effect_rate(setups):
+    """
+    同じメモリア詳細種別の条件の一覧から効果値を最尤推定する。
+    起こりうる効果値の集合の上で対数尤度を格子で評価し、信頼区間の周りに格子を絞り込むことを繰り返す。
+    Fits the effect rate by maximum likelihood from setups sharing one memoria subtype.
+    Evaluates the log-likelihood on a grid over the feasible set and repeatedly narrows the grid around the confidence interval.
+    """
+    feasible = feasible_rate_set(setups)
+
+    def total_log_likelihood(rates):
+        return sum(setup.log_likelihoods(rates) for setup in setups)
+
+    intervals = feasible
+    for _ in range(NUM_REFINEMENTS):
+        rates = grid_over_intervals(intervals, GRID_SIZE)
+        log_likelihoods = total_log_likelihood(rates)
+        max_log_likelihood = log_likelihoods.max()
+        if not np.isfinite(max_log_likelihood):
+            raise ValueError(f"subtype {setups[0].subtype}: no effect rate explains every recorded damage")
+        inside = np.flatnonzero(log_likelihoods >= max_log_likelihood - CONFIDENCE_LOG_LIKELIHOOD_DROP)
+        lower, upper = rates[max(inside[0] - 1, 0)], rates[min(inside[-1] + 1, len(rates) - 1)]
+        intervals = np.clip(feasible, lower, upper)
+        intervals = intervals[intervals[:, 1] > intervals[:, 0]]
+
+    best = np.flatnonzero(log_likelihoods == max_log_likelihood)
+    current_rate = setups[0].current_rate
+    # 現在の値で起こりえない記録がある場合、対数尤度の低下は無限大になるため None とする
+    # If some record cannot occur at the current value the log-likelihood drop is infinite, so it is None
+    current_log_likelihood_drop = float(max_log_likelihood - total_log_likelihood([current_rate])[0])
+    if not np.isfinite(current_log_likelihood_drop):
+        current_log_likelihood_drop = None
+    return {
+        "subtype": setups[0].subtype,
+        "num_setups": len(setups),
+        "num_damages": int(sum(setup.counts.sum() for setup in setups)),
+        "estimate": float(rates[best].mean()),
+        "estimate_range": [float(rates[best[0]]), float(rates[best[-1]])],
+        "ci95": [float(rates[inside[0]]), float(rates[inside[-1]])],
+        "current_rate": current_rate,
+        # 最大値からの現在の値の対数尤度の低下 (CONFIDENCE_LOG_LIKELIHOOD_DROP を超えれば5%水準で現在の値は否定される)
+        # Log-likelihood drop of the current value from the maximum (above CONFIDENCE_LOG_LIKELIHOOD_DROP it is rejected at the 5% level)
+        "current_rate_log_likelihood_drop": current_log_likelihood_drop,
+        "current_rate_rejected": current_log_likelihood_drop is None or current_log_likelihood_drop > CONFIDENCE_LOG_LIKELIHOOD_DROP,
+        # 推定から外した起こりえない記録 (setup は記録ファイルの setups の番号)
+        # Impossible records excluded from the fit (setup is the index into the observation file's setups)
+        "excluded_damages": [record for setup in setups for record in setup.excluded],
+    }
+
+
+def calibrate(observations, subtypes=None):
+    """
+    記録ファイルの内容から、メモリア詳細種別ごとの効果値を推定する。
+    subtypes が None なら、ゲームデータで未検証とされている種別のうち記録があるものを推定する。
+    Fits the effect rate of each memoria subtype from the contents of an observation file.
+    If subtypes is None, the subtypes marked unverified in the game data that have records are fitted.
+    """
+    setups_by_subtype = {}
+    for setup_index, entry in enumerate(observations["setups"]):
+        setup = CalibrationSetup(entry["scenario"], entry["damages"], setup_index)
+        if (setup.subtype not in subtypes) if subtypes is not None else not setup.unverified:
+            continue
+        setups_by_subtype.setdefault(setup.subtype, []).append(setup)
+    return [fit_effect_rate(setups) for setups in setups_by_subtype.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="記録したダメージから未検証の効果値を推定する") # Fit unverified effect rates from recorded damage
+    parser.add_argument("observations", help="記録ファイル (JSON) / observation file (JSON)")
+    parser.add_argument("--subtypes", nargs="+", help="推定するメモリア詳細種別 (既定: 未検証のもの) / subtypes to fit (default: unverified ones)")
+    parser.add_argument("--output", help="結果を書き出すJSONファイル / JSON file to write results to")
+    args = parser.parse_args()
+
+    with open(args.observations, encoding="utf-8") as f:
+        observations = json.load(f)
+    results = calibrate(observations, args.subtypes)
+
+    for result in results:
+        drop = result["current_rate_log_likelihood_drop"]
+        print(f"{result['subtype']}: {result['estimate']:.6f} "
+              f"(95% CI {result['ci95'][0]:.6f} - {result['ci95'][1]:.6f}, {result['num_damages']} hits, "
+              f"current {result['current_rate']}, log-likelihood drop {'impossible' if drop is None else f'{drop:.2f}'})")
+        for record in result["excluded_damages"]:
+            print(f"  excluded: setups[{record['setup']}] damage {record['damage']} x{record['count']}: {record['reason']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, allow_nan=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,563 @@
+import math
+import random
+
+from game_tables import ATTRIBUTES, GAME_TABLE_VERSIONS, DEFAULT_GAME_TABLE_VERSION, get_game_tables
+
+# --- ラスバレの仕様データ ---
+# --- Last Bullet Game Data ---
+# 数値は game_tables.json から読み込む。以下の定数は既定の版の値。
+# Values are loaded from game_tables.json. The constants below hold the default version's values.
+DEFAULT_GAME_TABLES = get_game_tables()
+
+# メモリアスキル効果
+# Memoria Skill Effects
+MEMORIA_SKILL_EFFECT_RATE = DEFAULT_GAME_TABLES.memoria_skill_effect_rate
+
+# 攻撃カテゴリのオプションと詳細
+# Attack Category Options and Details
+ATTACK_CATEGORY_OPTIONS = {
+    "通常単体": {"通特": "通常", "target_range": "単体", "subtypes": ["AⅣ", "AⅤ", "AⅥ"]},
+    "通常範囲": {"通特": "通常", "target_range": "範囲", "subtypes": ["BⅢ", "BⅣ", "BⅤ"]},
+    "特殊単体": {"通特": "特殊", "target_range": "単体", "subtypes": ["AⅣ", "AⅤ", "AⅥ"]},
+    "特殊範囲": {"通特": "特殊", "target_range": "範囲", "subtypes": ["DⅢ", "DⅣ"]}
+}
+
+# 全ての版が攻撃カテゴリのメモリア詳細種別を定義していることを確認
+# Check that every version defines the memoria subtypes of the attack categories
+for game_tables in GAME_TABLE_VERSIONS.values():
+    for category_details in ATTACK_CATEGORY_OPTIONS.values():
+        missing_subtypes = set(category_details["subtypes"]) - set(game_tables.memoria_skill_effect_rate)
+        if missing_subtypes:
+            raise ValueError(f"game table {game_tables.version}: missing memoria skills {sorted(missing_subtypes)}")
+
+# メモリアの凸と倍率
+# Memoria Breakthrough and Multiplier
+BREAKTHROUGH_MULTIPLIER_RATE = DEFAULT_GAME_TABLES.breakthrough_multiplier_rate
+
+# 補助スキルの増幅倍率
+# Support Skill Amplification Rate
+SUPPORTSKILL_DAMAGEUP_RATE = DEFAULT_GAME_TABLES.supportskill_damageup_rate
+
+# 補助スキルの発動確率の倍率 (ダメージUPⅣ+ / Ⅴ+ / Ⅴ++ は基本倍率は同じだが、発動確率が異なる)
+# Support Skill Activation Probability Multiplier (Damage UP IV+ / V+ / V++ have the same base multiplier but a different activation probability)
+SUPPORTSKILL_ACTIVATION_MULTIPLIER = DEFAULT_GAME_TABLES.supportskill_activation_multiplier
+
+# 補助スキルの発動確率
+# Support Skill Activation Probability
+ACTIVATION_PROBABILITY = DEFAULT_GAME_TABLES.activation_probability
+
+# 攻撃の属性オプション
+# Attack Attribute Options
+ATTRIBUTE_OPTIONS = ATTRIBUTES # Fire, Water, Wind, Light, Dark
+
+# 各種補正の定数
+# Various Correction Constants
+CORRECTION_CONSTANTS = DEFAULT_GAME_TABLES.corrections
+LEGION_MATCH_CORRECTION = CORRECTION_CONSTANTS["legion_match"]
+GRACE_CORRECTION = CORRECTION_CONSTANTS["grace"]
+NEUNWELT_CORRECTION = CORRECTION_CONSTANTS["neunwelt"]
+STACK_METEOR_CORRECTION = CORRECTION_CONSTANTS["stack_meteor"]
+STACK_BARRIER_CORRECTION = CORRECTION_CONSTANTS["stack_barrier"]
+MIN_FINAL_DAMAGE = CORRECTION_CONSTANTS["min_final_damage"]
+CRITICAL_MULTIPLIER = CORRECTION_CONSTANTS["critical_multiplier"]
+BUFF_LEVEL_TO_PERCENT_MULTIPLIER = CORRECTION_CONSTANTS["buff_level_to_percent_multiplier"]
+
+# 攻撃バフと防御バフの固定範囲
+# Fixed Ranges for Attack and Defense Buffs
+attack_buff_levels = [25, 20, 15, 10, 5, 0, -5, -10, -15, -20]
+defense_buff_levels = [5, 0, -5, -10, -15, -20]
+
+
+# --- ダメージ計算関数群 ---
+# --- Damage Calculation Functions ---
+
+def calculate_final_stats(base_stat, buff_percent):
+    """
+    ユーザーが入力した基本ステータスとバフパーセンテージから最終攻撃力/防御力を計算する。
+    buff_percent は、例えば -100%, +25% のような実際のパーセンテージ値（例: -100, 25）を想定している。
+    Calculates final attack/defense from user-inputted base stats and buff percentages.
+    buff_percent assumes actual percentage values (e.g., -100, 25).
+    """
+    return math.floor(base_stat * (1 + buff_percent / 100))
+
+def calculate_memoria_multiplier(memoria_skill_effect, skill_lv_effect):
+    """
+    メモリアスキル効果とスキルLv効果を掛け合わせてメモリア倍率を計算する。
+    Calculates the memoria multiplier by multiplying memoria skill effect and skill level effect.
+    """
+    return memoria_skill_effect * skill_lv_effect
+
+def calculate_base_damage(final_atk, final_def, memoria_multiplier):
+    """
+    基礎ダメージを計算する。
+    ([最終攻撃力] - 2/3[最終防御力]) × メモリア倍率（小数点以下切り捨て）。
+    「最終攻撃力 - 2/3最終防御力」が負になる場合は0を最低値とする。
+    Calculates base damage.
+    ([Final ATK] - 2/3[Final DEF]) × Memoria Multiplier (rounded down).
+    If "Final ATK - 2/3 Final DEF" is negative, the minimum value is 0.
+    """
+    base_val = max(0, final_atk - math.floor(2/3 * final_def))
+    return math.floor(base_val * memoria_multiplier)
+
+def calculate_auxiliary_skill_effect(
+    memoria_list, # 25枚の補助スキルデータ (種類, 凸数, 属性) / 25 support skill memoria data (type, breakthrough, attribute)
+    selected_attack_memoria_attribute, # 攻撃メモリアの属性 / Attack memoria attribute
+    legendary_amplification_per_attribute_totals, # 属性ごとのレジェンダリー合計増幅 / Total legendary amplification per attribute
+    lily_aux_prob_amp_value, # リリィの補助スキル確率増幅 / Lily's support skill probability amplification
+    selected_aux_prob_amp_attribute, # リリィの補助スキル確率増幅で選択された属性 / Selected attribute for Lily's support skill probability amplification
+    game_tables=None # ゲームデータ (Noneなら既定の版) / Game tables (default version if None)
+):
+    """
+    補助スキル効果を計算する。
+    25枚のメモリアの発動をシミュレートし、合計増幅倍率を返す。
+    レジェンダリースキルの増幅は属性ごとの合計値として加算される。
+    リリィの補助スキル確率増幅は、対応する属性の補助スキルの発動確率に加算される。
+    Calculates the support skill effect.
+    Simulates the activation of 25 memoria and returns the total amplification multiplier.
+    Legendary skill amplification is added as a total value per attribute.
+    Lily's support skill probability amplification is added to the activation probability of corresponding attribute support skills.
+    """
+    if game_tables is None:
+        game_tables = DEFAULT_GAME_TABLES
+
+    total_raw_amplification_percentage = 0.0 # メインメモリアスキル効果が乗る前の生の値 / Raw value before main memoria skill effect is applied
+
+    # 通常の補助スキル (ダメージUP) の発動判定
+    # Activation judgment for normal support skills (Damage UP)
+    for memoria in memoria_list:
+        skill_type = memoria["種類"] # Type
+        breakthrough = memoria["凸数"] # Breakthrough
+        aux_memoria_attribute = memoria["属性"] # 補助メモリアの属性を取得 / Get support memoria attribute
+
+        if skill_type != "なし": # If not "None"
+            base_activation_probability = game_tables.activation_probability.get(breakthrough, 0.0)
+            adjusted_activation_probability = base_activation_probability
+
+            # ダメージUPⅣ+ / V+ / V++ による発動確率調整
+            # Activation probability adjustment by Damage UP IV+ / V+ / V++
+            if skill_type in game_tables.supportskill_activation_multiplier:
+                adjusted_activation_probability *= game_tables.supportskill_activation_multiplier[skill_type]
+
+            # リリィの補助スキル確率増幅を加算 (補助メモリアの属性と、UIで選択された増幅対象属性が一致する場合)
+            # Add Lily's support skill probability amplification (if support memoria attribute matches selected amplification target attribute in UI)
+            if aux_memoria_attribute == selected_aux_prob_amp_attribute:
+                adjusted_activation_probability += lily_aux_prob_amp_value
+
+            if random.random() < adjusted_activation_probability:
+                # ダメージUPスキルが発動した場合、その凸数に応じた倍率を掛けて生の発動割合を加算
+                # 補助スキルの効果値 (supportskill_damageup_rate) に、凸による倍率 (breakthrough_multiplier_rate) を乗算
+                # If Damage UP skill activates, add raw activation rate by multiplying its breakthrough-dependent multiplier.
+                # Multiply support skill effect value (supportskill_damageup_rate) by breakthrough multiplier (breakthrough_multiplier_rate).
+                breakthrough_multiplier = game_tables.breakthrough_multiplier_rate.get(breakthrough, 1.0)
+                total_raw_amplification_percentage += game_tables.supportskill_damageup_rate.get(skill_type, 0.0) * breakthrough_multiplier
+
+    # レジェンダリースキルによる増幅効果を加算 (攻撃メモリア属性と一致する場合)
+    # ユーザーが属性ごとに合計値を入力するため、それを直接加算する
+    # Add amplification effect from Legendary Skills (if it matches the attack memoria attribute).
+    # Since the user inputs the total value per attribute, add it directly.
+    total_raw_amplification_percentage += legendary_amplification_per_attribute_totals.get(selected_attack_memoria_attribute, 0.0)
+
+    # 最終的な補助スキル効果のファクター
+    # Final support skill effect factor
+    return 1 + total_raw_amplification_percentage
+
+
+def calculate_status_ratio_correction(final_atk, final_def):
+    """
+    ステータス比補正を計算する。
+    【最終攻撃力 / 最終防御力 ≧ 2】を満たした時に発生する補正。
+    指定されたルールに基づき補正率を適用し、最終的な乗算ファクター (1 + 補正率) を返す。
+    防御力が0以下の場合は最大補正を適用。
+    Calculates status ratio correction.
+    Correction occurs when [Final ATK / Final DEF >= 2].
+    Applies correction rate based on specified rules and returns the final multiplication factor (1 + correction rate).
+    If defense is 0 or less, applies maximum correction.
+    """
+    if final_def <= 0:
+        return 1.50 # 最大補正 +50% / Max correction +50%
+
+    ratio = final_atk / final_def
+    correction_rate = 0.0
+
+    if ratio < 2:
+        correction_rate = 0.0 # 補正なし / No correction
+    elif 2 <= ratio < 10:
+        correction_rate = math.floor(ratio) * 0.05
+    else: # ratio >= 10
+        correction_rate = 0.50 # 上限50% / Upper limit 50%
+
+    return 1 + correction_rate
+
+
+def calculate_total_correction_factor(
+    lily_role_correction_factor,    # リリィ役職補正 / Lily Role Correction
+    lily_attribute_correction_factor, # リリィ属性補正 / Lily Attribute Correction
+    charm_rate,                     # CHARM補正 / CHARM Correction
+    order_rate,                     # オーダー効果 (単一値) / Order Effect (single value)
+    auxiliary_skill_factor,         # 補助スキル効果 / Support Skill Effect
+    grace_active,                   # 恩恵 / Grace
+    neunwelt_active,                # ノインヴェルト / Neunwelt
+    status_ratio_correction_factor, # ステータス比補正 / Status Ratio Correction
+    legion_match_active,            # レギマ補正 (常時True) / Legion Match Correction (always True)
+    stack_meteor_active,            # スタック補正 (メテオ) / Stack Correction (Meteor)
+    stack_barrier_active,           # スタック補正 (バリア) / Stack Correction (Barrier)
+    counterattack_correction_rate,  # カウンター補正 / Counterattack Correction
+    theme_correction_rate,          # テーマ補正 / Theme Correction
+    selected_opponent_lily_attribute, # 相手の衣装属性 / Opponent Lily Attribute
+    opponent_lily_reduction_rate, # 相手の衣装ダメージ軽減率 / Opponent Lily Damage Reduction Rate
+    selected_attack_memoria_attribute, # 攻撃メモリアの属性 / Attack Memoria Attribute
+    correction_constants=None # 各種補正の定数 (Noneなら既定の版) / Correction constants (default version if None)
+):
+    """
+    各種補正の合計乗算ファクターを計算する。
+    断り書きがない限り全てかけ合わせ。恩恵+ノインヴェルトは足し合わせる。スタック補正は乗算。
+    レギマ補正は常にTrueとして計算。
+    Calculates the total multiplication factor for various corrections.
+    All are multiplied unless otherwise specified. Grace + Neunwelt are added. Stack correction is multiplied.
+    Legion Match Correction is always calculated as True.
+    """
+    if correction_constants is None:
+        correction_constants = CORRECTION_CONSTANTS
+
+    # 基本の乗算補正 (全てかけ合わせ)
+    # Basic Multiplication Correction (all multiplied)
+    factor = 1.0
+    factor *= lily_role_correction_factor # リリィ役職補正 / Lily role correction
+    factor *= lily_attribute_correction_factor # リリィ属性補正 / Lily Attribute correction
+
+    factor *= charm_rate
+    factor *= order_rate
+    factor *= auxiliary_skill_factor # 補助スキル効果 / Support skill effect
+    factor *= status_ratio_correction_factor
+    factor *= counterattack_correction_rate
+    factor *= theme_correction_rate
+
+    # レギマ補正は常にTrue
+    # Legion Match Correction is always True
+    if legion_match_active: # このパラメータは常にTrueで渡される想定 / This parameter is expected to be always True
+        factor *= correction_constants["legion_match"]
+
+    # スタック補正 (加算・減算してから乗算)
+    # メテオとバリアが同時に発動した場合の計算は (1 + 0.2 - 0.3) となる
+    # Stack Correction (add/subtract then multiply)
+    # If Meteor and Barrier activate simultaneously, the calculation is (1 + 0.2 - 0.3)
+    stack_correction_factor = 1.0
+    if stack_meteor_active:
+        stack_correction_factor += correction_constants["stack_meteor"] # メテオ発動で+20% / Meteor activation +20%
+    if stack_barrier_active:
+        stack_correction_factor -= correction_constants["stack_barrier"] # バリア発動で-30% / Barrier activation -30%
+    factor *= stack_correction_factor
+
+    # 相手の衣装補正
+    # Opponent Costume Correction
+    if selected_opponent_lily_attribute != "なし" and selected_opponent_lily_attribute == selected_attack_memoria_attribute:
+        factor *= (1 - opponent_lily_reduction_rate)
+
+    # 恩恵とノインヴェルトの補正
+    # Grace and Neunwelt Correction
+    grace_neunwelt_correction_total = 0.0
+    if grace_active:
+        grace_neunwelt_correction_total += correction_constants["grace"] # +10%
+    if neunwelt_active:
+        grace_neunwelt_correction_total += correction_constants["neunwelt"] # +100%
+    factor *= (1 + grace_neunwelt_correction_total)
+
+    return factor
+
+
+def simulate_damage(
+    base_atk, base_spattack, base_def, base_spdefence,
+    attack_buff_percent, defense_buff_percent,
+    attribute_atk_buff_value, attribute_def_buff_value, # 属性バフの値を追加 / Add attribute buff values
+    selected_attack_memoria_subtype, selected_breakthrough_multiplier_rate, selected_attack_memoria_attribute,
+    selected_attack_memoria_category, # "通常単体"などのカテゴリラベル (役職補正用) / Category label like "Normal Single" (for role correction)
+    memoria_aux_data_list, # 25枚の補助スキルデータ (種類, 凸数, 属性) / 25 support skill memoria data (type, breakthrough, Attribute)
+    legendary_amplification_per_attribute_totals, # 新しいレジェンダリー合計増幅データ / New legendary total amplification data
+    selected_lily_role, lily_role_correction_rate, # リリィ役職設定 / Lily Role Settings
+    lily_aux_prob_amp_value, selected_aux_prob_amp_attribute, # リリィ補助スキル確率増幅 / Lily Support Skill Probability Amplification
+    lily_attribute_selection, lily_attribute_correction_multiplier, # リリィ属性補正 / Lily Attribute Correction
+    charm_rates, order_rate, counterattack_rate, theme_rates, # オーダー効果 / order rate
+    grace_active, neunwelt_active, # legion_match_active は常にTrue / legion_match_active is always True
+    stack_meteor_active, stack_barrier_active,
+    critical_active,
+    selected_opponent_lily_attribute, # 相手の衣装属性 / opponent lily attribute
+    opponent_lily_reduction_rate, # 相手の衣装ダメージ軽減率 / opponent lily damage reduction rate
+    game_table_version=None # ゲームデータの版 (Noneなら既定の版) / Game table version (default version if None)
+):
+    """
+    ラスバレのダメージ計算を一回分シミュレーションする。
+    全計算ステップを統合し、最終ダメージを返す。
+    実際の計算は damage_table.DamageTable で行い、この関数は同じ乱数で一致することを確かめる逐次版の基準として残す。
+    Simulates a single Last Bullet damage calculation.
+    Integrates all calculation steps and returns the final damage.
+    Actual runs use damage_table.DamageTable; this function is kept as the sequential reference it must match for the same draws.
+    """
+    game_tables = get_game_tables(game_table_version)
+
+    # 攻撃タイプに応じて使用するATKとDEFを選択
+    # Select ATK and DEF to use based on attack type
+    attack_type = ATTACK_CATEGORY_OPTIONS[selected_attack_memoria_category]["通特"]
+
+    current_base_atk = 0
+    current_base_def = 0
+
+    if attack_type == "通常": # Normal
+        current_base_atk = base_atk
+        current_base_def = base_def
+    elif attack_type == "特殊": # Special
+        current_base_atk = base_spattack
+        current_base_def = base_spdefence
+
+    # 1. 最終攻撃力, 最終防御力の計算 (通常バフ適用後)
+    # 1. Calculate Final ATK, Final DEF (after normal buff application)
+    final_atk = calculate_final_stats(current_base_atk, attack_buff_percent)
+    final_def = calculate_final_stats(current_base_def, defense_buff_percent)
+
+    # 属性バフの値を加算
+    # Add attribute buff values
+    final_atk += attribute_atk_buff_value
+    final_def += attribute_def_buff_value
+
+    # 2. メモリア倍率の計算
+    # 2. Calculate Memoria Multiplier
+    memoria_skill_effect = game_tables.memoria_skill_effect_rate.get(selected_attack_memoria_subtype, 0.1)
+    skill_lv_effect = game_tables.breakthrough_multiplier_rate.get(selected_breakthrough_multiplier_rate, 1.35)
+    memoria_multiplier = calculate_memoria_multiplier(memoria_skill_effect, skill_lv_effect)
+
+    # 3. 基礎ダメージの計算
+    # 3. Calculate Base Damage
+    base_damage = calculate_base_damage(final_atk, final_def, memoria_multiplier)
+
+    # 4. 各種補正の計算
+    # 4. Calculate Various Corrections
+    # リリィ役職補正の計算
+    # Calculate Lily Role Correction
+    lily_role_correction_factor = 1.0
+    if selected_lily_role == selected_attack_memoria_category:
+        lily_role_correction_factor = lily_role_correction_rate
+
+    # リリィ属性補正の計算
+    # Calculate Lily Attribute Correction
+    lily_attribute_correction_factor = 1.0
+    if lily_attribute_selection != "なし" and lily_attribute_selection == selected_attack_memoria_attribute:
+        lily_attribute_correction_factor = lily_attribute_correction_multiplier
+
+    # CHARM補正、テーマ補正は、選択された属性に応じた値を辞書から取得
+    # CHARM Correction, Theme Correction: Get values from dictionary based on selected attribute
+    charm_rate = charm_rates.get(selected_attack_memoria_attribute, 1.0)
+    # order_rate は単一値として渡されるため、直接使用
+    # order_rate is passed as a single value, so use it directly
+    theme_current_rate = theme_rates.get(selected_attack_memoria_attribute, 1.0)
+
+    # 補助スキル効果 (シミュレーションごとに25枚のメモリアの発動判定を行い再計算)
+    # Support Skill Effect (recalculate activation judgment for 25 memoria per simulation)
+    auxiliary_skill_factor = calculate_auxiliary_skill_effect(
+        memoria_aux_data_list, selected_attack_memoria_attribute,
+        legendary_amplification_per_attribute_totals, lily_aux_prob_amp_value, selected_aux_prob_amp_attribute,
+        game_tables=game_tables,
+    )
+
+    # ステータス比補正
+    # Status Ratio Correction
+    status_ratio_correction_factor = calculate_status_ratio_correction(final_atk, final_def)
+
+    # 全ての各種補正を合算した乗算ファクター
+    # Total Multiplication Factor for all Corrections
+    total_correction_factor = calculate_total_correction_factor(
+        lily_role_correction_factor=lily_role_correction_factor,
+        lily_attribute_correction_factor=lily_attribute_correction_factor,
+        charm_rate=charm_rate,
+        order_rate=order_rate,
+        auxiliary_skill_factor=auxiliary_skill_factor,
+        grace_active=grace_active,
+        neunwelt_active=neunwelt_active,
+        status_ratio_correction_factor=status_ratio_correction_factor,
+        legion_match_active=True, # レギマ補正は常にTrue / Legion Match Correction is always True
+        stack_meteor_active=stack_meteor_active,
+        stack_barrier_active=stack_barrier_active,
+        counterattack_correction_rate=counterattack_rate,
+        theme_correction_rate=theme_current_rate,
+        selected_opponent_lily_attribute=selected_opponent_lily_attribute,
+        opponent_lily_reduction_rate=opponent_lily_reduction_rate,
+        selected_attack_memoria_attribute=selected_attack_memoria_attribute,
+        correction_constants=game_tables.corrections
+    )
+
+    # 補正後ダメージを計算
+    # Calculate Corrected Damage
+    corrected_damage = math.floor(base_damage * total_correction_factor)
+
+
+    # 5. 乱数処理後ダメージ
+    # 5. Randomized Damage
+    random_factor = random.uniform(0.9, 1.0)
+    randomized_damage = math.floor(corrected_damage * random_factor)
+
+    # 6. クリティカル補正
+    # 6. Critical Correction
+    critical_correction = game_tables.corrections["critical_multiplier"] if critical_active else 1.0
+
+    # 7. 最終ダメージ
+    # 乱数処理後ダメージが負になることを避けるためにmax(0, ...)を追加し、最終ダメージが2より小さくならないようにする
+    # 7. Final Damage
+    # Add max(0, ...) to avoid negative randomized damage, and ensure final damage is not less than 2.
+    final_damage = math.floor(game_tables.corrections["min_final_damage"] + (max(0, randomized_damage) * critical_correction))
+
+    return final_damage
+
+
+# --- シナリオ (UI入力一式) の扱い ---
+# --- Scenario (a full set of UI inputs) Handling ---
+
+# 各キーはStreamlitウィジェットのkeyと同じ名前にしている
+# Each key uses the same name as the corresponding Streamlit widget key
+DEFAULT_SCENARIO = {
+    "base_attack": 700000, "base_spattack": 700000,
+    "base_defence": 500000, "base_spdefence": 500000,
+    "target_hp": 1000000,
+    "selected_attack_memoria_category": "通常単体",
+    "selected_attack_memoria_subtype": "AⅣ",
+    "selected_breakthrough_multiplier_rate": "4凸",
+    "selected_attack_memoria_attribute": ATTRIBUTE_OPTIONS[0],
+    "counterattack_rate": 1.0,
+    "memoria": [{"種類": "なし", "凸数": "4凸", "属性": ATTRIBUTE_OPTIONS[0]} for _ in range(25)],
+    "legendary_amplification_per_attribute_totals": {attribute: 0.0 for attribute in ATTRIBUTE_OPTIONS},
+    "selected_lily_role": "通常単体", "lily_role_correction_rate": 1.15,
+    "selected_lily_attribute": "なし", "lily_attribute_correction_rate": 1.05,
+    "selected_aux_prob_amp_attribute": ATTRIBUTE_OPTIONS[0], "lily_aux_prob_amp_value": 0.0,
+    "order_rate": 1.0,
+    "grace_active": True, "neunwelt_active": False,
+    "stack_meteor_active": False, "stack_barrier_active": False,
+    "charm_rates": {attribute: 1.1 for attribute in ATTRIBUTE_OPTIONS},
+    "selected_opponent_lily_attribute": "なし", "opponent_lily_reduction_rate": 0.05,
+    "theme_rates": {attribute: (1.1 if attribute in ["火", "水", "風"] else 1.0) for attribute in ATTRIBUTE_OPTIONS},
+    "critical_active": False,
+    "num_simulations": 1000,
+    "atk_level": 0, "def_level": 0,
+    "attribute_atk_buff_value": 0, "attribute_def_buff_value": 0,
+    "game_table_version": DEFAULT_GAME_TABLE_VERSION,
+}
+
+# 1シナリオのシミュレーション回数の上限 (1回あたり数百バイトのメモリを使う)
+# Upper bound on simulations per scenario (each uses a few hundred bytes of memory)
+MAX_NUM_SIMULATIONS = 1000000
+
+def _is_integer(value):
+    # bool は int の派生クラスだが、回数やレベルとしては受け付けない
+    # bool is a subclass of int but is not accepted as a count or level
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def default_breakthrough(game_tables):
+    """
+    凸数の初期値 ('4凸'、その版にない場合は最後の凸数) を返す。
+    Returns the default breakthrough ('4凸', or the last breakthrough if the version has none).
+    """
+    breakthroughs = list(game_tables.breakthrough_multiplier_rate)
+    return "4凸" if "4凸" in breakthroughs else breakthroughs[-1]
+
+def build_scenario(payload):
+    """
+    ユーザー入力 (JSONなど) をデフォルト値で補完し、検証済みのシナリオ辞書を返す。
+    不正な値が含まれる場合は ValueError を送出する。
+    Fills user input (e.g. JSON) with default values and returns a validated scenario dict.
+    Raises ValueError if the input contains invalid values.
+    """
+    unknown_keys = set(payload) - set(DEFAULT_SCENARIO) - {"seed"}
+    if unknown_keys:
+        raise ValueError(f"unknown scenario keys: {sorted(unknown_keys)}")
+
+    scenario = dict(DEFAULT_SCENARIO)
+    scenario.update(payload)
+
+    # 属性ごとの辞書は部分指定を許す
+    # Per-attribute dicts may be partially specified
+    for key in ["legendary_amplification_per_attribute_totals", "charm_rates", "theme_rates"]:
+        scenario[key] = {**DEFAULT_SCENARIO[key], **payload.get(key, {})}
+
+    game_tables = get_game_tables(scenario["game_table_version"])
+
+    # 凸数の初期値は版ごとに異なりうるため、指定がなければ選んだ版の初期値で補完する
+    # The default breakthrough may differ per version, so unspecified breakthroughs use the selected version's default
+    breakthrough = default_breakthrough(game_tables)
+    if "selected_breakthrough_multiplier_rate" not in payload:
+        scenario["selected_breakthrough_multiplier_rate"] = breakthrough
+    if "memoria" not in payload:
+        scenario["memoria"] = [{**memoria, "凸数": breakthrough} for memoria in DEFAULT_SCENARIO["memoria"]]
+
+    category = scenario["selected_attack_memoria_category"]
+    if category not in ATTACK_CATEGORY_OPTIONS:
+        raise ValueError(f"unknown memoria category: {category}")
+    if scenario["selected_attack_memoria_subtype"] not in ATTACK_CATEGORY_OPTIONS[category]["subtypes"]:
+        raise ValueError(f"subtype {scenario['selected_attack_memoria_subtype']} is not valid for {category}")
+    if scenario["selected_breakthrough_multiplier_rate"] not in game_tables.breakthrough_multiplier_rate:
+        raise ValueError(f"unknown breakthrough: {scenario['selected_breakthrough_multiplier_rate']}")
+    if scenario["selected_attack_memoria_attribute"] not in ATTRIBUTE_OPTIONS:
+        raise ValueError(f"unknown attribute: {scenario['selected_attack_memoria_attribute']}")
+    if scenario["selected_lily_role"] not in ATTACK_CATEGORY_OPTIONS:
+        raise ValueError(f"unknown lily role: {scenario['selected_lily_role']}")
+    for key in ["selected_lily_attribute", "selected_opponent_lily_attribute"]:
+        if scenario[key] not in ATTRIBUTE_OPTIONS + ["なし"]:
+            raise ValueError(f"unknown attribute for {key}: {scenario[key]}")
+    if scenario["selected_aux_prob_amp_attribute"] not in ATTRIBUTE_OPTIONS:
+        raise ValueError(f"unknown attribute: {scenario['selected_aux_prob_amp_attribute']}")
+
+    if not isinstance(scenario["memoria"], list) or len(scenario["memoria"]) != 25:
+        raise ValueError("memoria must be a list of exactly 25 rows")
+    for memoria in scenario["memoria"]:
+        if not isinstance(memoria, dict) or not {"種類", "凸数", "属性"} <= set(memoria):
+            raise ValueError("each memoria row must be an object with 種類, 凸数 and 属性")
+        if memoria.get("種類") not in game_tables.supportskill_damageup_rate:
+            raise ValueError(f"unknown support skill: {memoria.get('種類')}")
+        if memoria.get("凸数") not in game_tables.activation_probability:
+            raise ValueError(f"unknown breakthrough: {memoria.get('凸数')}")
+        if memoria.get("属性") not in ATTRIBUTE_OPTIONS:
+            raise ValueError(f"unknown attribute: {memoria.get('属性')}")
+
+    for key in ["atk_level", "def_level", "num_simulations"]:
+        if not _is_integer(scenario[key]):
+            raise ValueError(f"{key} must be an integer")
+    if scenario.get("seed") is not None and not _is_integer(scenario["seed"]):
+        raise ValueError("seed must be an integer")
+    for key in ["atk_level", "def_level"]:
+        if not -20 <= scenario[key] <= 25:
+            raise ValueError(f"{key} must be between -20 and 25")
+    if not 1 <= scenario["num_simulations"] <= MAX_NUM_SIMULATIONS:
+        raise ValueError(f"num_simulations must be between 1 and {MAX_NUM_SIMULATIONS}")
+    if scenario["target_hp"] < 1:
+        raise ValueError("target_hp must be at least 1")
+
+    return scenario
+
+def run_scenario(scenario):
+    """
+    シナリオ辞書の条件でシミュレーションを num_simulations 回実行し、ダメージのリストを返す。
+    シナリオの game_table_version の値を使うため、事前計算テーブル (damage_table) で計算する。
+    Runs the simulation num_simulations times under the scenario's conditions and returns the list of damages.
+    Computed with the precomputed table (damage_table) so that the scenario's game_table_version values are used.
+    """
+    # damage_table はこのモジュールを読み込むため、循環参照を避けてここで読み込む
+    # damage_table imports this module, so import it here to avoid a circular import
+    import numpy as np
+    from damage_table import DamageTable
+
+    rng = np.random.default_rng(scenario.get("seed"))
+    damages = DamageTable(scenario).simulate(
+        scenario["atk_level"], scenario["def_level"], scenario["num_simulations"], rng,
+        scenario["attribute_atk_buff_value"], scenario["attribute_def_buff_value"])
+    return damages.tolist()
+
+def summarize_damages(damages, target_hp):
+    """
+    ダメージのリストから平均・最大・最小・削ったHPの割合・ワンパン率を計算する。
+    Calculates mean, max, min, HP shaved percentage and one-shot rate from a list of damages.
+    """
+    num_damages = len(damages)
+    average_damage = sum(damages) / num_damages
+    one_shot_count = sum(1 for d in damages if d >= target_hp)
+    return {
+        "average_damage": average_damage,
+        "max_damage": max(damages),
+        "min_damage": min(damages),
+        "hp_shaved_percentage": min(100.0, max(0.0, (average_damage / target_hp) * 100)),
+        "one_shot_rate_percentage": (one_shot_count / num_damages) * 100,
+    }
@@ -0,0 +1,304 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from damage_calc import (
+    ATTACK_CATEGORY_OPTIONS, MIN_FINAL_DAMAGE, CRITICAL_MULTIPLIER,
+    calculate_memoria_multiplier, calculate_total_correction_factor,
+)
+from game_tables import get_game_tables
+
+# --- 確定的なダメージ計算の事前計算テーブル ---
+# --- Precomputed Tables for the Deterministic Damage Stages ---
+#
+# 最終ATK/DEF・基礎ダメージ・ステータス比補正はステータスとバフレベルだけで決まるため、
+# ステータス設定ごとに一度だけ計算し、乱数処理 (補助スキル発動と乱数) だけを後から適用する。
+# 演算の順序は damage_calc の関数と同じにしているため、同じ乱数に対して同じ結果になる。
+# Final ATK/DEF, base damage and status ratio correction depend only on stats and buff levels,
+# so they are computed once per stat configuration and only the random stage
+# (support skill activation and the random factor) is applied afterwards.
+# The order of operations matches the functions in damage_calc, so the same draws give the same results.
+
+# テーブルに含めるバフレベル (スライダーの -20..+20 と簡易計算の +25 を含む)
+# Buff levels covered by the table (includes the slider's -20..+20 and +25 used by the simple grid)
+BUFF_LEVELS = np.arange(-20, 26)
+
+# テーブルの内容に影響しないシナリオのキー
+# Scenario keys that do not affect the table contents
+TABLE_INDEPENDENT_KEYS = ["num_simulations", "atk_level", "def_level",
+                          "attribute_atk_buff_value", "attribute_def_buff_value", "target_hp", "seed"]
+
+# 基礎ダメージ・ステータス比補正の面に影響するシナリオのキー (これ以外は補正の再計算だけで済む)
+# Scenario keys that affect the base damage / status ratio planes (anything else only needs the corrections recomputed)
+PLANE_KEYS = ["base_attack", "base_spattack", "base_defence", "base_spdefence",
+              "selected_attack_memoria_category", "selected_attack_memoria_subtype", "selected_breakthrough_multiplier_rate",
+              "game_table_version"]
+
+# 保持する属性バフの組の面の数 (最近使ったものから残す)
+# Number of attribute buff pair planes kept (the most recently used ones are kept)
+MAX_CACHED_PLANES = 64
+
+
+def buff_level_index(level):
+    """
+    バフレベルを BUFF_LEVELS の番号に変換する。範囲外や整数でない場合は ValueError を送出する。
+    Converts a buff level into an index into BUFF_LEVELS. Raises ValueError for non-integer or out-of-range levels.
+    """
+    if isinstance(level, (bool, np.bool_)) or not isinstance(level, (int, np.integer)):
+        raise ValueError(f"buff level must be an integer: {level!r}")
+    if not BUFF_LEVELS[0] <= level <= BUFF_LEVELS[-1]:
+        raise ValueError(f"buff level must be between {BUFF_LEVELS[0]} and {BUFF_LEVELS[-1]}: {level}")
+    return int(level - BUFF_LEVELS[0])
+
+
+def final_stats_array(base_stat, buff_percents):
+    """
+    calculate_final_stats のベクトル版。
+    Vectorized version of calculate_final_stats.
+    """
+    return np.floor(base_stat * (1 + np.asarray(buff_percents) / 100)).astype(np.int64)
+
+def base_damage_array(final_atk, final_def, memoria_multiplier):
+    """
+    calculate_base_damage のベクトル版。
+    Vectorized version of calculate_base_damage.
+    """
+    base_val = np.maximum(0, final_atk - np.floor(2/3 * final_def).astype(np.int64))
+    return np.floor(base_val * memoria_multiplier).astype(np.int64)
+
+def status_ratio_correction_array(final_atk, final_def):
+    """
+    calculate_status_ratio_correction のベクトル版。
+    Vectorized version of calculate_status_ratio_correction.
+    """
+    final_atk, final_def = np.broadcast_arrays(final_atk, final_def)
+    safe_def = np.where(final_def <= 0, 1, final_def)
+    ratio = final_atk / safe_def
+    correction_rate = np.where(ratio < 2, 0.0, np.where(ratio < 10, np.floor(ratio) * 0.05, 0.50))
+    return np.where(final_def <= 0, 1.50, 1 + correction_rate)
+
+
+def auxiliary_skill_arrays(game_tables, memoria_list, lily_aux_prob_amp_value, selected_aux_prob_amp_attribute):
+    """
+    25枚の補助スキルの発動確率と、発動時に加算される増幅値を配列で返す。
+    メモリアを整数コードに変換し、ゲームデータの配列を添字で参照する。「なし」のメモリアは発動確率0とする。
+    Returns arrays of activation probabilities and the amplification added on activation for the 25 support skills.
+    Memoria are converted to integer codes and index the game data arrays. Memoria set to "None" get an activation probability of 0.
+    """
+    skill_type_codes, breakthrough_codes, attribute_codes = game_tables.encode_memoria(memoria_list)
+    active = skill_type_codes != game_tables.no_support_skill_code
+
+    # ダメージUPⅣ+ / Ⅴ+ / Ⅴ++ 以外の倍率は1.0のため、逐次計算と同じ値になる
+    # Multipliers other than Damage UP IV+ / V+ / V++ are 1.0, so the values match the sequential code
+    probabilities = (game_tables.activation_probability_by_breakthrough[breakthrough_codes]
+                     * game_tables.activation_multiplier_by_skill_type[skill_type_codes])
+    amp_attribute_code = game_tables.attribute_codes.get(selected_aux_prob_amp_attribute, -1)
+    probabilities = np.where(attribute_codes == amp_attribute_code, probabilities + lily_aux_prob_amp_value, probabilities)
+
+    amplifications = (game_tables.damageup_rate_by_skill_type[skill_type_codes]
+                      * game_tables.breakthrough_multiplier_by_breakthrough[breakthrough_codes])
+    return np.where(active, probabilities, 0.0), np.where(active, amplifications, 0.0)
+
+def sample_auxiliary_factors(probabilities, amplifications, legendary_amplification_total, uniforms):
+    """
+    calculate_auxiliary_skill_effect のベクトル版。
+    uniforms は (サンプル数, 25) の [0, 1) 一様乱数。メモリアの順に加算するため、逐次計算と同じ値になる。
+    Vectorized version of calculate_auxiliary_skill_effect.
+    uniforms are [0, 1) uniforms of shape (samples, 25). Adding in memoria order gives the same values as the sequential code.
+    """
+    total_raw_amplification_percentage = np.zeros(uniforms.shape[0])
+    for i in range(len(probabilities)):
+        total_raw_amplification_percentage = total_raw_amplification_percentage + np.where(
+            uniforms[:, i] < probabilities[i], amplifications[i], 0.0)
+    total_raw_amplification_percentage = total_raw_amplification_percentage + legendary_amplification_total
+    return 1 + total_raw_amplification_percentage
+
+def random_factors_from_uniforms(uniforms):
+    """
+    random.uniform(0.9, 1.0) と同じ式で [0, 1) 一様乱数を乱数係数に変換する。
+    Converts [0, 1) uniforms to random factors with the same formula as random.uniform(0.9, 1.0).
+    """
+    return 0.9 + (1.0 - 0.9) * uniforms
+
+def apply_random_stage(base_damage, total_correction_factor, random_factors, critical_active,
+                       min_final_damage=MIN_FINAL_DAMAGE, critical_multiplier=CRITICAL_MULTIPLIER):
+    """
+    補正後ダメージ以降 (乱数処理・クリティカル・最低ダメージ) をベクトルで計算する。
+    Computes the stages from corrected damage onwards (random factor, critical, minimum damage) as vectors.
+    """
+    corrected_damage = np.floor(base_damage * total_correction_factor)
+    randomized_damage = np.floor(corrected_damage * random_factors)
+    critical_correction = critical_multiplier if critical_active else 1.0
+    return np.floor(min_final_damage + (np.maximum(0, randomized_damage) * critical_correction)).astype(np.int64)
+
+
+class DamageTable:
+    """
+    一つのシナリオ (ステータス・スキル・補正設定) に対する事前計算テーブル。
+    全バフレベルの組 (BUFF_LEVELS × BUFF_LEVELS) の基礎ダメージとステータス比補正を保持し、
+    属性バフの組ごとの面は初回参照時に計算し、最近使った MAX_CACHED_PLANES 個まで保持する。
+    A precomputed table for one scenario (stats, skills and correction settings).
+    Holds base damage and status ratio correction for every buff level pair (BUFF_LEVELS x BUFF_LEVELS);
+    the plane for each attribute buff pair is computed on first access, and the MAX_CACHED_PLANES most recently used are kept.
+    """
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.game_tables = get_game_tables(scenario.get("game_table_version"))
+        attack_type = ATTACK_CATEGORY_OPTIONS[scenario["selected_attack_memoria_category"]]["通特"]
+        if attack_type == "通常": # Normal
+            base_atk, base_def = scenario["base_attack"], scenario["base_defence"]
+        else: # "特殊" / Special
+            base_atk, base_def = scenario["base_spattack"], scenario["base_spdefence"]
+
+        self.memoria_multiplier = calculate_memoria_multiplier(
+            self.game_tables.memoria_skill_effect_rate.get(scenario["selected_attack_memoria_subtype"], 0.1),
+            self.game_tables.breakthrough_multiplier_rate.get(scenario["selected_breakthrough_multiplier_rate"], 1.35),
+        )
+
+        # 通常バフのみ適用した最終ATK/DEF (属性バフは後から加算)
+        # Final ATK/DEF with only normal buffs applied (attribute buffs are added later)
+        buff_percents = BUFF_LEVELS * self.game_tables.corrections["buff_level_to_percent_multiplier"]
+        self.final_atk_by_level = final_stats_array(base_atk, buff_percents)
+        self.final_def_by_level = final_stats_array(base_def, buff_percents)
+
+        self._init_corrections()
+        # with_corrections の複製と共有し、Streamlitのセッション間でも共有されるためロックで守る
+        # Shared with the with_corrections copies and across Streamlit sessions, so guarded by a lock
+        self.planes = OrderedDict()
+        self.planes_lock = threading.Lock()
+        self.plane(0, 0)
+
+    def _init_corrections(self):
+        """
+        乱数処理の前に決まる補正 (リリィ補正・補助スキルの確率と増幅値・レジェンダリー増幅) を計算する。
+        Computes the corrections fixed before the random stage (Lily corrections, support skill probabilities and amplifications, legendary amplification).
+        """
+        scenario = self.scenario
+        attack_attribute = scenario["selected_attack_memoria_attribute"]
+        self.lily_role_correction_factor = 1.0
+        if scenario["selected_lily_role"] == scenario["selected_attack_memoria_category"]:
+            self.lily_role_correction_factor = scenario["lily_role_correction_rate"]
+        self.lily_attribute_correction_factor = 1.0
+        if scenario["selected_lily_attribute"] != "なし" and scenario["selected_lily_attribute"] == attack_attribute:
+            self.lily_attribute_correction_factor = scenario["lily_attribute_correction_rate"]
+
+        self.aux_probabilities, self.aux_amplifications = auxiliary_skill_arrays(
+            self.game_tables, scenario["memoria"], scenario["lily_aux_prob_amp_value"], scenario["selected_aux_prob_amp_attribute"])
+        self.legendary_amplification_total = scenario["legendary_amplification_per_attribute_totals"].get(attack_attribute, 0.0)
+
+    def with_corrections(self, **overrides):
+        """
+        補正の設定だけを変えたテーブルを返す。基礎ダメージの面はこのテーブルと共有する。
+        Returns a table with only the correction settings changed. Base damage planes are shared with this table.
+        """
+        plane_overrides = set(overrides) & set(PLANE_KEYS)
+        if plane_overrides:
+            raise ValueError(f"with_corrections cannot change plane keys: {sorted(plane_overrides)}")
+
+        table = copy.copy(self)
+        table.scenario = {**self.scenario, **overrides}
+        table._init_corrections()
+        return table
+
+    def plane(self, attribute_atk_buff_value, attribute_def_buff_value):
+        """
+        指定した属性バフの組における (攻撃バフレベル, 防御バフレベル) の基礎ダメージとステータス比補正を返す。
+        Returns base damage and status ratio correction over (attack level, defense level) for the given attribute buff pair.
+        """
+        key = (attribute_atk_buff_value, attribute_def_buff_value)
+        with self.planes_lock:
+            if key in self.planes:
+                self.planes.move_to_end(key)
+                return self.planes[key]
+
+        final_atk = (self.final_atk_by_level + attribute_atk_buff_value)[:, None]
+        final_def = (self.final_def_by_level + attribute_def_buff_value)[None, :]
+        plane = (
+            base_damage_array(final_atk, final_def, self.memoria_multiplier),
+            status_ratio_correction_array(final_atk, final_def),
+        )
+        with self.planes_lock:
+            self.planes[key] = plane
+            while len(self.planes) > MAX_CACHED_PLANES:
+                self.planes.popitem(last=False)
+        return plane
+
+    def lookup(self, atk_level, def_level, attribute_atk_buff_value=0, attribute_def_buff_value=0):
+        """
+        一つのセルの基礎ダメージとステータス比補正を返す。バフレベルが BUFF_LEVELS の範囲外なら ValueError を送出する。
+        Returns base damage and status ratio correction for one cell. Raises ValueError if a buff level is outside BUFF_LEVELS.
+        """
+        atk_index, def_index = buff_level_index(atk_level), buff_level_index(def_level)
+        base_damage, status_ratio_correction = self.plane(attribute_atk_buff_value, attribute_def_buff_value)
+        return base_damage[atk_index, def_index], status_ratio_correction[atk_index, def_index]
+
+    def total_correction_factors(self, auxiliary_skill_factors, status_ratio_correction_factor):
+        """
+        calculate_total_correction_factor を配列のまま呼び出し、サンプルごとの補正ファクターを返す。
+        Calls calculate_total_correction_factor with arrays and returns per-sample correction factors.
+        """
+        scenario = self.scenario
+        attack_attribute = scenario["selected_attack_memoria_attribute"]
+        return calculate_total_correction_factor(
+            lily_role_correction_factor=self.lily_role_correction_factor,
+            lily_attribute_correction_factor=self.lily_attribute_correction_factor,
+            charm_rate=scenario["charm_rates"].get(attack_attribute, 1.0),
+            order_rate=scenario["order_rate"],
+            auxiliary_skill_factor=auxiliary_skill_factors,
+            grace_active=scenario["grace_active"],
+            neunwelt_active=scenario["neunwelt_active"],
+            status_ratio_correction_factor=status_ratio_correction_factor,
+            legion_match_active=True, # レギマ補正は常にTrue / Legion Match Correction is always True
+            stack_meteor_active=scenario["stack_meteor_active"],
+            stack_barrier_active=scenario["stack_barrier_active"],
+            counterattack_correction_rate=scenario["counterattack_rate"],
+            theme_correction_rate=scenario["theme_rates"].get(attack_attribute, 1.0),
+            selected_opponent_lily_attribute=scenario["selected_opponent_lily_attribute"],
+            opponent_lily_reduction_rate=scenario["opponent_lily_reduction_rate"],
+            selected_attack_memoria_attribute=attack_attribute,
+            correction_constants=self.game_tables.corrections,
+        )
+
+    def random_inputs_from_uniforms(self, aux_uniforms, random_uniforms):
+        """
+        与えられた一様乱数から補助スキル効果と乱数係数を計算する。
+        同じ一様乱数を複数のテーブルに渡すと、共通乱数による比較ができる。
+        Computes support skill factors and random factors from the given uniforms.
+        Passing the same uniforms to several tables gives a comparison with common random numbers.
+        """
+        auxiliary_skill_factors = sample_auxiliary_factors(
+            self.aux_probabilities, self.aux_amplifications, self.legendary_amplification_total, aux_uniforms)
+        return auxiliary_skill_factors, random_factors_from_uniforms(random_uniforms)
+
+    def draw_random_inputs(self, num_samples, rng):
+        """
+        補助スキル効果と乱数係数をサンプル数分引く。
+        Draws support skill factors and random factors for the given number of samples.
+        """
+        return self.random_inputs_from_uniforms(
+            rng.random((num_samples, len(self.aux_probabilities))), rng.random(num_samples))
+
+    def damages(self, atk_level, def_level, auxiliary_skill_factors, random_factors,
+                attribute_atk_buff_value=0, attribute_def_buff_value=0):
+        """
+        テーブルを参照し、引いた乱数に対する最終ダメージの配列を返す。
+        Looks up the table and returns an array of final damages for the drawn random inputs.
+        """
+        base_damage, status_ratio_correction = self.lookup(atk_level, def_level, attribute_atk_buff_value, attribute_def_buff_value)
+        total_correction_factor = self.total_correction_factors(auxiliary_skill_factors, status_ratio_correction)
+        corrections = self.game_tables.corrections
+        return apply_random_stage(base_damage, total_correction_factor, random_factors, self.scenario["critical_active"],
+                                  corrections["min_final_damage"], corrections["critical_multiplier"])
+
+    def simulate(self, atk_level, def_level, num_samples, rng,
+                 attribute_atk_buff_value=0, attribute_def_buff_value=0):
+        """
+        乱数を引いてダメージを num_samples 回シミュレーションする。
+        Draws random inputs and simulates damage num_samples times.
+        """
+        auxiliary_skill_factors, random_factors = self.draw_random_inputs(num_samples, rng)
+        return self.damages(atk_level, def_level, auxiliary_skill_factors, random_factors,
+                            attribute_atk_buff_value, attribute_def_buff_value)
@@ -0,0 +1,155 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+# --- ゲームデータ (game_tables.json) の読み込み ---
+# --- Loading Game Data (game_tables.json) ---
+#
+# ゲームのアップデートで値が変わった場合はコードではなく game_tables.json を編集する。
+# 複数の版 (検証済みの値・仮の値など) を並べて持つことができ、シナリオの "game_table_version" で選ぶ。
+# 読み込み時に検証し、文字列キーを整数コードに変換した配列を作成しておく。
+# When a game update changes values, edit game_tables.json instead of the code.
+# Several versions (verified values, provisional values, etc.) can be kept side by side and are
+# selected with the scenario's "game_table_version".
+# Tables are validated on load and compiled into arrays indexed by integer codes.
+
+GAME_TABLES_PATH = Path(__file__).resolve().parent / "game_tables.json"
+
+# 対応しているデータファイルの形式
+# Supported data file format
+SUPPORTED_FORMAT_VERSION = 1
+
+# 各種補正の定数として必要なキー
+# Keys required for the correction constants
+REQUIRED_CORRECTION_KEYS = [
+    "legion_match", "grace", "neunwelt", "stack_meteor", "stack_barrier",
+    "min_final_damage", "critical_multiplier", "buff_level_to_percent_multiplier",
+]
+
+# 各版に必要な数値テーブル
+# Numeric tables required in each version
+REQUIRED_RATE_TABLES = [
+    "memoria_skill_effect_rate", "breakthrough_multiplier_rate", "activation_probability",
+    "supportskill_damageup_rate", "supportskill_activation_multiplier",
+]
+
+# 補助スキルなしを表す種類
+# Support skill type meaning "none"
+NO_SUPPORT_SKILL = "なし"
+
+
+def _validate_rate_table(version, name, table):
+    if not isinstance(table, dict) or not table:
+        raise ValueError(f"game table {version}: {name} must be a non-empty object")
+    for key, value in table.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"game table {version}: {name}[{key}] must be a non-negative number")
+
+
+class GameTables:
+    """
+    一つの版のゲームデータ。文字列キーの辞書と、整数コードで参照する配列の両方を持つ。
+    Game data for one version. Holds both the string-keyed dicts and arrays indexed by integer codes.
+    """
+
+    def __init__(self, version, data, attributes):
+        missing_keys = [key for key in REQUIRED_RATE_TABLES + ["corrections"] if key not in data]
+        if missing_keys:
+            raise ValueError(f"game table {version}: missing keys {missing_keys}")
+        for name in REQUIRED_RATE_TABLES:
+            _validate_rate_table(version, name, data[name])
+        _validate_rate_table(version, "corrections", data["corrections"])
+
+        missing_corrections = [key for key in REQUIRED_CORRECTION_KEYS if key not in data["corrections"]]
+        if missing_corrections:
+            raise ValueError(f"game table {version}: missing corrections {missing_corrections}")
+        if set(data["breakthrough_multiplier_rate"]) != set(data["activation_probability"]):
+            raise ValueError(f"game table {version}: breakthrough_multiplier_rate and activation_probability must have the same breakthroughs")
+        if any(probability > 1 for probability in data["activation_probability"].values()):
+            raise ValueError(f"game table {version}: activation_probability values must be at most 1")
+        if data["supportskill_damageup_rate"].get(NO_SUPPORT_SKILL) != 0:
+            raise ValueError(f"game table {version}: supportskill_damageup_rate must contain {NO_SUPPORT_SKILL} with 0")
+        unknown_multipliers = set(data["supportskill_activation_multiplier"]) - set(data["supportskill_damageup_rate"])
+        if unknown_multipliers:
+            raise ValueError(f"game table {version}: unknown support skills in supportskill_activation_multiplier: {sorted(unknown_multipliers)}")
+        unknown_unverified = set(data.get("unverified_memoria_skills", [])) - set(data["memoria_skill_effect_rate"])
+        if unknown_unverified:
+            raise ValueError(f"game table {version}: unknown memoria skills in unverified_memoria_skills: {sorted(unknown_unverified)}")
+
+        self.version = version
+        self.description = data.get("description", "")
+        self.memoria_skill_effect_rate = dict(data["memoria_skill_effect_rate"])
+        self.unverified_memoria_skills = list(data.get("unverified_memoria_skills", []))
+        self.breakthrough_multiplier_rate = dict(data["breakthrough_multiplier_rate"])
+        self.activation_probability = dict(data["activation_probability"])
+        self.supportskill_damageup_rate = dict(data["supportskill_damageup_rate"])
+        self.supportskill_activation_multiplier = dict(data["supportskill_activation_multiplier"])
+        self.corrections = dict(data["corrections"])
+
+        # 整数コード (辞書の並び順)
+        # Integer codes (in dict order)
+        self.skill_type_codes = {name: code for code, name in enumerate(self.supportskill_damageup_rate)}
+        self.breakthrough_codes = {name: code for code, name in enumerate(self.activation_probability)}
+        self.attribute_codes = {name: code for code, name in enumerate(attributes)}
+
+        # コードで参照する配列
+        # Arrays indexed by code
+        self.damageup_rate_by_skill_type = np.array(list(self.supportskill_damageup_rate.values()), dtype=np.float64)
+        self.activation_multiplier_by_skill_type = np.array(
+            [self.supportskill_activation_multiplier.get(name, 1.0) for name in self.supportskill_damageup_rate], dtype=np.float64)
+        self.activation_probability_by_breakthrough = np.array(list(self.activation_probability.values()), dtype=np.float64)
+        self.breakthrough_multiplier_by_breakthrough = np.array(
+            [self.breakthrough_multiplier_rate[name] for name in self.activation_probability], dtype=np.float64)
+        self.no_support_skill_code = self.skill_type_codes[NO_SUPPORT_SKILL]
+
+    def encode_memoria(self, memoria_list):
+        """
+        補助メモリアの一覧を (種類, 凸数, 属性) の整数コード配列に変換する。
+        Converts a support memoria list into integer code arrays of (type, breakthrough, attribute).
+        """
+        try:
+            skill_type_codes = np.array([self.skill_type_codes[memoria["種類"]] for memoria in memoria_list], dtype=np.int32)
+            breakthrough_codes = np.array([self.breakthrough_codes[memoria["凸数"]] for memoria in memoria_list], dtype=np.int32)
+            attribute_codes = np.array([self.attribute_codes[memoria["属性"]] for memoria in memoria_list], dtype=np.int32)
+        except KeyError as e:
+            raise ValueError(f"game table {self.version}: unknown memoria value {e}") from None
+        return skill_type_codes, breakthrough_codes, attribute_codes
+
+
+def load_game_tables(path=GAME_TABLES_PATH):
+    """
+    データファイルを読み込み、(属性の一覧, 版名 -> GameTables の辞書, 既定の版名) を返す。
+    Loads the data file and returns (attribute list, dict of version name -> GameTables, default version name).
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    if data.get("format_version") != SUPPORTED_FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported format_version {data.get('format_version')}")
+    attributes = data.get("attributes")
+    if not isinstance(attributes, list) or not attributes:
+        raise ValueError(f"{path}: attributes must be a non-empty list")
+    if not data.get("versions"):
+        raise ValueError(f"{path}: at least one version is required")
+
+    versions = {version: GameTables(version, version_data, attributes) for version, version_data in data["versions"].items()}
+    default_version = data.get("default_version")
+    if default_version not in versions:
+        raise ValueError(f"{path}: default_version {default_version} is not defined")
+    return attributes, versions, default_version
+
+
+ATTRIBUTES, GAME_TABLE_VERSIONS, DEFAULT_GAME_TABLE_VERSION = load_game_tables()
+
+
+def get_game_tables(version=None):
+    """
+    指定した版のゲームデータを返す (None なら既定の版)。
+    Returns the game data for the given version (the default version if None).
+    """
+    if version is None:
+        version = DEFAULT_GAME_TABLE_VERSION
+    if version not in GAME_TABLE_VERSIONS:
+        raise ValueError(f"unknown game table version: {version}")
+    return GAME_TABLE_VERSIONS[version]
@@ -0,0 +1,70 @@
+import numpy as np
+
+from damage_table import BUFF_LEVELS, buff_level_index, base_damage_array, status_ratio_correction_array, apply_random_stage
+
+# --- バフ平面のヒートマップ ---
+# --- Buff Plane Heatmap ---
+#
+# 攻撃バフ × 属性攻撃バフ (または 防御バフ × 属性防御バフ) の全ての点で、平均HP割合とワンパン率を計算する。
+# 一組の乱数を全ての点で共通に使い、サンプルを塊ごとにまとめてベクトル計算する。
+# Computes the mean HP percentage and one-shot rate at every point of the attack buff x attribute attack buff plane
+# (or defense buff x attribute defense buff). One set of random draws is shared by every point and samples
+# are processed in vectorized chunks.
+
+# スライダーと同じバフレベルの範囲
+# Buff level range of the sliders
+HEATMAP_BUFF_LEVELS = np.arange(-20, 21)
+
+# 一度にまとめて計算するサンプル数 (メモリ使用量の上限)
+# Number of samples computed at once (bounds memory usage)
+HEATMAP_CHUNK_SIZE = 256
+
+
+def buff_plane_heatmap(table, side, attribute_buff_values, num_samples, rng, chunk_size=HEATMAP_CHUNK_SIZE):
+    """
+    side が "attack" なら攻撃バフ × 属性攻撃バフ、"defense" なら防御バフ × 属性防御バフの平面で評価する。
+    もう一方のバフは table のシナリオ (atk_level / def_level / 属性バフ) の値に固定する。
+    (バフレベル数, 属性バフ数) の平均HP割合 (%) とワンパン率 (%) の配列を返す。
+    Evaluates the attack buff x attribute attack buff plane when side is "attack",
+    or the defense buff x attribute defense buff plane when side is "defense".
+    The other buffs are fixed to the table scenario's values (atk_level / def_level / attribute buffs).
+    Returns arrays of mean HP percentage (%) and one-shot rate (%) with shape (buff levels, attribute buff values).
+    """
+    scenario = table.scenario
+    attribute_buff_values = np.asarray(attribute_buff_values)
+    level_indices = HEATMAP_BUFF_LEVELS - BUFF_LEVELS[0]
+
+    if side == "attack":
+        final_atk = table.final_atk_by_level[level_indices][:, None] + attribute_buff_values[None, :]
+        final_def = table.final_def_by_level[buff_level_index(scenario["def_level"])] + scenario["attribute_def_buff_value"]
+    elif side == "defense":
+        final_atk = table.final_atk_by_level[buff_level_index(scenario["atk_level"])] + scenario["attribute_atk_buff_value"]
+        final_def = table.final_def_by_level[level_indices][:, None] + attribute_buff_values[None, :]
+    else:
+        raise ValueError(f"side must be 'attack' or 'defense': {side}")
+
+    base_damage = base_damage_array(final_atk, final_def, table.memoria_multiplier)
+    status_ratio_correction = status_ratio_correction_array(final_atk, final_def)
+    plane_shape = base_damage.shape
+
+    auxiliary_skill_factors, random_factors = table.draw_random_inputs(num_samples, rng)
+    corrections = table.game_tables.corrections
+    target_hp = scenario["target_hp"]
+
+    damage_sums = np.zeros(plane_shape)
+    one_shot_counts = np.zeros(plane_shape, dtype=np.int64)
+    for start in range(0, num_samples, chunk_size):
+        chunk_aux = auxiliary_skill_factors[start:start + chunk_size]
+        chunk_random = random_factors[start:start + chunk_size]
+        # 補正の計算は *= で行うため、先に (サンプル数, バフレベル数, 属性バフ数) の形に揃えておく
+        # The corrections are computed with *=, so broadcast to (samples, buff levels, attribute buffs) beforehand
+        chunk_aux = np.broadcast_to(chunk_aux[:, None, None], (len(chunk_aux),) + plane_shape)
+        total_correction_factor = table.total_correction_factors(chunk_aux, status_ratio_correction[None, :, :])
+        damages = apply_random_stage(base_damage[None, :, :], total_correction_factor, chunk_random[:, None, None],
+                                     scenario["critical_active"], corrections["min_final_damage"], corrections["critical_multiplier"])
+        damage_sums += damages.sum(axis=0)
+        one_shot_counts += np.count_nonzero(damages >= target_hp, axis=0)
+
+    mean_hp_percentage = np.clip(damage_sums / num_samples / target_hp * 100, 0.0, 100.0)
+    one_shot_rate_percentage = one_shot_counts / num_samples * 100
+    return mean_hp_percentage, one_shot_rate_percentage
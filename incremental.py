@@ -0,0 +1,130 @@
+import numpy as np
+
+from damage_table import random_factors_from_uniforms
+from qmc import draw_uniforms
+
+# --- 補助メモリアの編集に対する差分再計算 ---
+# --- Incremental Recomputation for Support Memoria Edits ---
+#
+# 一回分の一様乱数と、補助スキルの行ごとの発動状態 (加算される増幅値)、計算済みのセルのダメージを保持する。
+# 補助メモリアの行を編集したときは、編集した行の発動状態だけを引き直し、補助スキル効果が変わったサンプルだけを
+# 全てのセルで再計算する。メモリアの順に加算し直すため、同じ一様乱数で最初から計算した場合と同じ結果になる。
+# Keeps one set of uniforms, the per-row support skill activation state (the amplification each row adds)
+# and the damages of the cells computed so far.
+# When support memoria rows are edited, only the edited rows' activations are redrawn, and only the samples whose
+# support skill factor changed are recomputed in every cell. The sum is rebuilt in memoria order, so the results
+# match a full computation with the same uniforms.
+
+# 差分で更新できるシナリオのキー (これ以外が変わった場合は引き直す)
+# Scenario keys that can be updated incrementally (anything else requires a new run)
+INCREMENTAL_KEYS = ["memoria"]
+
+# 変わったサンプルの割合がこれを超える場合は、添字で選ぶより全てのサンプルを計算し直すほうが速い
+# Above this fraction of changed samples, recomputing every sample is faster than selecting them by index
+FULL_RECOMPUTE_FRACTION = 0.5
+
+
+# 行ごとの一様乱数と発動状態は (行数, サンプル数) の形で持ち、一つの行を連続したメモリとして読み書きする
+# Per-row uniforms and activation state are kept with shape (rows, samples), so one row is contiguous in memory
+
+def _row_contributions(row_uniforms, probabilities, amplifications):
+    return np.where(row_uniforms < probabilities[:, None], amplifications[:, None], 0.0)
+
+
+def _auxiliary_factors(contributions, legendary_amplification_total):
+    # sample_auxiliary_factors と同じ順序で加算する
+    # Added in the same order as sample_auxiliary_factors
+    total_raw_amplification_percentage = np.zeros(contributions.shape[1])
+    for i in range(contributions.shape[0]):
+        total_raw_amplification_percentage = total_raw_amplification_percentage + contributions[i]
+    total_raw_amplification_percentage = total_raw_amplification_percentage + legendary_amplification_total
+    return 1 + total_raw_amplification_percentage
+
+
+class IncrementalRun:
+    """
+    一つのテーブルと一組の一様乱数に対する計算結果。セルのダメージは初回参照時に計算して保持する。
+    保持したセルは update のたびに再計算されるため、一度しか使わないセルは cache=False で参照する。
+    Results for one table and one set of uniforms. The damages of each cell are computed on first access and kept.
+    Kept cells are recomputed on every update, so cells used only once should be requested with cache=False.
+    """
+
+    def __init__(self, table, aux_uniforms, random_uniforms, sampling_method="random"):
+        self.table = table
+        self.sampling_method = sampling_method
+        self.row_uniforms = np.ascontiguousarray(aux_uniforms.T)
+        self.random_factors = random_factors_from_uniforms(random_uniforms)
+        self.contributions = _row_contributions(self.row_uniforms, table.aux_probabilities, table.aux_amplifications)
+        self.auxiliary_skill_factors = _auxiliary_factors(self.contributions, table.legendary_amplification_total)
+        self.cells = {}
+
+    @classmethod
+    def draw(cls, table, num_samples, rng, sampling_method="random"):
+        """
+        一様乱数を引いて新しい計算を始める。
+        Draws uniforms and starts a new run.
+        """
+        aux_uniforms, random_uniforms = draw_uniforms(num_samples, len(table.aux_probabilities), rng, sampling_method)
+        return cls(table, aux_uniforms, random_uniforms, sampling_method)
+
+    def accepts(self, table, sampling_method="random"):
+        """
+        table が INCREMENTAL_KEYS 以外でこの計算と同じ設定なら True (update で差分更新できる)。
+        True if table has the same settings as this run apart from INCREMENTAL_KEYS (so update can apply the difference).
+        """
+        if sampling_method != self.sampling_method:
+            return False
+        keys = set(self.table.scenario) | set(table.scenario)
+        return all(self.table.scenario.get(key) == table.scenario.get(key) for key in keys - set(INCREMENTAL_KEYS))
+
+    def update(self, table):
+        """
+        table の補助メモリアに合わせて、発動確率か増幅値が変わった行と、補助スキル効果が変わったサンプルだけを再計算する。
+        再計算したサンプル数を返す。
+        Recomputes only the rows whose activation probability or amplification changed for table's support memoria,
+        and only the samples whose support skill factor changed. Returns the number of recomputed samples.
+        """
+        if not self.accepts(table, self.sampling_method):
+            raise ValueError("update only supports changes to " + ", ".join(INCREMENTAL_KEYS))
+
+        changed_rows = np.flatnonzero((table.aux_probabilities != self.table.aux_probabilities)
+                                      | (table.aux_amplifications != self.table.aux_amplifications))
+        self.table = table
+        if len(changed_rows) == 0:
+            return 0
+
+        row_contributions = _row_contributions(
+            self.row_uniforms[changed_rows], table.aux_probabilities[changed_rows], table.aux_amplifications[changed_rows])
+        changed_samples = np.flatnonzero((row_contributions != self.contributions[changed_rows]).any(axis=0))
+        self.contributions[changed_rows] = row_contributions
+        if len(changed_samples) == 0:
+            return 0
+
+        if len(changed_samples) > FULL_RECOMPUTE_FRACTION * len(self.random_factors):
+            changed_samples = slice(None)
+            num_changed_samples = len(self.random_factors)
+        else:
+            num_changed_samples = len(changed_samples)
+        self.auxiliary_skill_factors[changed_samples] = _auxiliary_factors(
+            self.contributions[:, changed_samples], table.legendary_amplification_total)
+
+        auxiliary_skill_factors = self.auxiliary_skill_factors[changed_samples]
+        random_factors = self.random_factors[changed_samples]
+        for cell, damages in self.cells.items():
+            damages[changed_samples] = table.damages(*cell[:2], auxiliary_skill_factors, random_factors, *cell[2:])
+        return num_changed_samples
+
+    def damages(self, atk_level, def_level, attribute_atk_buff_value=0, attribute_def_buff_value=0, cache=True):
+        """
+        一つのセルのダメージの配列を返す。cache が True なら初回だけ計算して保持し、False なら保持せずに計算する。
+        Returns the damage array of one cell. With cache True it is computed only on first access and kept;
+        with cache False it is computed without being kept.
+        """
+        cell = (atk_level, def_level, attribute_atk_buff_value, attribute_def_buff_value)
+        if cell in self.cells:
+            return self.cells[cell]
+        damages = self.table.damages(
+            atk_level, def_level, self.auxiliary_skill_factors, self.random_factors, attribute_atk_buff_value, attribute_def_buff_value)
+        if cache:
+            self.cells[cell] = damages
+        return damages
@@ -2,446 +2,105 @@ import streamlit as st
 import math
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import random
-import matplotlib_fontja
 import json
+import os
+from pathlib import Path
+from damage_calc import (
+    ATTACK_CATEGORY_OPTIONS, ATTRIBUTE_OPTIONS,
+    MAX_NUM_SIMULATIONS, attack_buff_levels, defense_buff_levels, build_scenario, default_breakthrough,
+)
+from damage_table import DamageTable, PLANE_KEYS
+from game_tables import GAME_TABLE_VERSIONS, DEFAULT_GAME_TABLE_VERSION, NO_SUPPORT_SKILL
+from compare import compare_scenarios
+from sensitivity import sensitivity_report
+from roster import ROSTER_COLUMNS, evaluate_roster
+from heatmap import HEATMAP_BUFF_LEVELS, buff_plane_heatmap
+from result_cube import ResultCube
+from qmc import SAMPLING_METHODS, mean_interval
+from incremental import IncrementalRun
+from simple_grid import GRID_DISPLAYS, GRID_STATISTICS, HIGHLIGHT_STYLE, grid_statistics, format_grid_cells, highlight_mask
 
 # --- バージョン情報 ---
 # --- Version Information ---
 __version__ = "1.0.0"
 
-# --- ラスバレの仕様データ ---
-# --- Last Bullet Game Data ---
 
-# メモリアスキル効果
-# Memoria Skill Effects
-MEMORIA_SKILL_EFFECT_RATE = {
-    "AⅣ": 0.15, "AⅤ": 0.165, "AⅥ": 0.18, # AⅤ,AⅥは未検証 / AⅤ,AⅥ unverified
-    "BⅢ": 0.10, "BⅣ": 0.11, "BⅤ": 0.12, # BⅤは未検証 / BⅤ unverified
-    "DⅢ": 0.085, "DⅣ": 0.10
-}
-
-# 攻撃カテゴリのオプションと詳細
-# Attack Category Options and Details
-ATTACK_CATEGORY_OPTIONS = {
-    "通常単体": {"通特": "通常", "target_range": "単体", "subtypes": ["AⅣ", "AⅤ", "AⅥ"]},
-    "通常範囲": {"通特": "通常", "target_range": "範囲", "subtypes": ["BⅢ", "BⅣ", "BⅤ"]},
-    "特殊単体": {"通特": "特殊", "target_range": "単体", "subtypes": ["AⅣ", "AⅤ", "AⅥ"]},
-    "特殊範囲": {"通特": "特殊", "target_range": "範囲", "subtypes": ["DⅢ", "DⅣ"]}
-}
-
-# メモリアの凸と倍率
-# Memoria Breakthrough and Multiplier
-BREAKTHROUGH_MULTIPLIER_RATE = {
-    "0凸": 1.35, "1凸": 1.375, "2凸": 1.4, "3凸": 1.425, "4凸": 1.5
-}
-
-# 補助スキルの増幅倍率
-# Support Skill Amplification Rate
-SUPPORTSKILL_DAMAGEUP_RATE = {
-    "なし": 0.0, # None
-    "ダメージUPⅠ": 0.10, "ダメージUPⅡ": 0.15, "ダメージUPⅢ": 0.18, "ダメージUPⅣ": 0.21, "ダメージUPⅤ": 0.24,
-    "ダメージUPⅣ+": 0.21, # 基本倍率は同じだが、発動確率が異なる / Same base multiplier, but different activation probability
-    "ダメージUPⅤ+": 0.24, # 基本倍率は同じだが、発動確率が異なる / Same base multiplier, but different activation probability
-    "ダメージUPⅤ++": 0.24 # 基本倍率は同じだが、発動確率が異なる / Same base multiplier, but different activation probability
-}
-
-# 補助スキルの発動確率
-# Support Skill Activation Probability
-ACTIVATION_PROBABILITY = {
-    "0凸": 0.12, "1凸": 0.125, "2凸": 0.13, "3凸": 0.135, "4凸": 0.15
-}
-
-# 攻撃の属性オプション
-# Attack Attribute Options
-ATTRIBUTE_OPTIONS = ["火", "水", "風", "光", "闇"] # Fire, Water, Wind, Light, Dark
-
-# 各種補正の定数
-# Various Correction Constants
-LEGION_MATCH_CORRECTION = 1.28
-GRACE_CORRECTION = 0.10
-NEUNWELT_CORRECTION = 1.00
-STACK_METEOR_CORRECTION = 0.2
-STACK_BARRIER_CORRECTION = 0.3
-MIN_FINAL_DAMAGE = 2
-CRITICAL_MULTIPLIER = 1.3
-BUFF_LEVEL_TO_PERCENT_MULTIPLIER = 5
-
-# 攻撃バフと防御バフの固定範囲
-# Fixed Ranges for Attack and Defense Buffs
-attack_buff_levels = [25, 20, 15, 10, 5, 0, -5, -10, -15, -20]
-defense_buff_levels = [5, 0, -5, -10, -15, -20]
-
-
-# --- ダメージ計算関数群 ---
-# --- Damage Calculation Functions ---
-
-def calculate_final_stats(base_stat, buff_percent):
-    """
-    ユーザーが入力した基本ステータスとバフパーセンテージから最終攻撃力/防御力を計算する。
-    buff_percent は、例えば -100%, +25% のような実際のパーセンテージ値（例: -100, 25）を想定している。
-    Calculates final attack/defense from user-inputted base stats and buff percentages.
-    buff_percent assumes actual percentage values (e.g., -100, 25).
-    """
-    return math.floor(base_stat * (1 + buff_percent / 100))
-
-def calculate_memoria_multiplier(memoria_skill_effect, skill_lv_effect):
-    """
-    メモリアスキル効果とスキルLv効果を掛け合わせてメモリア倍率を計算する。
-    Calculates the memoria multiplier by multiplying memoria skill effect and skill level effect.
-    """
-    return memoria_skill_effect * skill_lv_effect
-
-def calculate_base_damage(final_atk, final_def, memoria_multiplier):
-    """
-    基礎ダメージを計算する。
-    ([最終攻撃力] - 2/3[最終防御力]) × メモリア倍率（小数点以下切り捨て）。
-    「最終攻撃力 - 2/3最終防御力」が負になる場合は0を最低値とする。
-    Calculates base damage.
-    ([Final ATK] - 2/3[Final DEF]) × Memoria Multiplier (rounded down).
-    If "Final ATK - 2/3 Final DEF" is negative, the minimum value is 0.
-    """
-    base_val = max(0, final_atk - math.floor(2/3 * final_def))
-    return math.floor(base_val * memoria_multiplier)
-
-def calculate_auxiliary_skill_effect(
-    memoria_list, # 25枚の補助スキルデータ (種類, 凸数, 属性) / 25 support skill memoria data (type, breakthrough, attribute)
-    selected_attack_memoria_attribute, # 攻撃メモリアの属性 / Attack memoria attribute
-    legendary_amplification_per_attribute_totals, # 属性ごとのレジェンダリー合計増幅 / Total legendary amplification per attribute
-    lily_aux_prob_amp_value, # リリィの補助スキル確率増幅 / Lily's support skill probability amplification
-    selected_aux_prob_amp_attribute # リリィの補助スキル確率増幅で選択された属性 / Selected attribute for Lily's support skill probability amplification
-):
-    """
-    補助スキル効果を計算する。
-    25枚のメモリアの発動をシミュレートし、合計増幅倍率を返す。
-    レジェンダリースキルの増幅は属性ごとの合計値として加算される。
-    リリィの補助スキル確率増幅は、対応する属性の補助スキルの発動確率に加算される。
-    Calculates the support skill effect.
-    Simulates the activation of 25 memoria and returns the total amplification multiplier.
-    Legendary skill amplification is added as a total value per attribute.
-    Lily's support skill probability amplification is added to the activation probability of corresponding attribute support skills.
-    """
-    total_raw_amplification_percentage = 0.0 # メインメモリアスキル効果が乗る前の生の値 / Raw value before main memoria skill effect is applied
-
-    # 通常の補助スキル (ダメージUP) の発動判定
-    # Activation judgment for normal support skills (Damage UP)
-    for memoria in memoria_list:
-        skill_type = memoria["種類"] # Type
-        breakthrough = memoria["凸数"] # Breakthrough
-        aux_memoria_attribute = memoria["属性"] # 補助メモリアの属性を取得 / Get support memoria attribute
-
-        if skill_type != "なし": # If not "None"
-            base_activation_probability = ACTIVATION_PROBABILITY.get(breakthrough, 0.0)
-            adjusted_activation_probability = base_activation_probability
-
-            # ダメージUPⅣ+ / V+ / V++ による発動確率調整
-            # Activation probability adjustment by Damage UP IV+ / V+ / V++
-            if skill_type == "ダメージUPⅣ+":
-                adjusted_activation_probability *= 1.5
-            elif skill_type == "ダメージUPⅤ+":
-                adjusted_activation_probability *= 1.5
-            elif skill_type == "ダメージUPⅤ++":
-                adjusted_activation_probability *= 2.0
-
-            # リリィの補助スキル確率増幅を加算 (補助メモリアの属性と、UIで選択された増幅対象属性が一致する場合)
-            # Add Lily's support skill probability amplification (if support memoria attribute matches selected amplification target attribute in UI)
-            if aux_memoria_attribute == selected_aux_prob_amp_attribute:
-                adjusted_activation_probability += lily_aux_prob_amp_value
-
-            if random.random() < adjusted_activation_probability:
-                # ダメージUPスキルが発動した場合、その凸数に応じた倍率を掛けて生の発動割合を加算
-                # 補助スキルの効果値 (SUPPORTSKILL_DAMAGEUP_RATE) に、凸による倍率 (BREAKTHROUGH_MULTIPLIER_RATE) を乗算
-                # If Damage UP skill activates, add raw activation rate by multiplying its breakthrough-dependent multiplier.
-                # Multiply support skill effect value (SUPPORTSKILL_DAMAGEUP_RATE) by breakthrough multiplier (BREAKTHROUGH_MULTIPLIER_RATE).
-                breakthrough_multiplier = BREAKTHROUGH_MULTIPLIER_RATE.get(breakthrough, 1.0)
-                total_raw_amplification_percentage += SUPPORTSKILL_DAMAGEUP_RATE.get(skill_type, 0.0) * breakthrough_multiplier
-
-    # レジェンダリースキルによる増幅効果を加算 (攻撃メモリア属性と一致する場合)
-    # ユーザーが属性ごとに合計値を入力するため、それを直接加算する
-    # Add amplification effect from Legendary Skills (if it matches the attack memoria attribute).
-    # Since the user inputs the total value per attribute, add it directly.
-    total_raw_amplification_percentage += legendary_amplification_per_attribute_totals.get(selected_attack_memoria_attribute, 0.0)
-
-    # 最終的な補助スキル効果のファクター
-    # Final support skill effect factor
-    return 1 + total_raw_amplification_percentage
-
-
-def calculate_status_ratio_correction(final_atk, final_def):
-    """
-    ステータス比補正を計算する。
-    【最終攻撃力 / 最終防御力 ≧ 2】を満たした時に発生する補正。
-    指定されたルールに基づき補正率を適用し、最終的な乗算ファクター (1 + 補正率) を返す。
-    防御力が0以下の場合は最大補正を適用。
-    Calculates status ratio correction.
-    Correction occurs when [Final ATK / Final DEF >= 2].
-    Applies correction rate based on specified rules and returns the final multiplication factor (1 + correction rate).
-    If defense is 0 or less, applies maximum correction.
-    """
-    if final_def <= 0:
-        return 1.50 # 最大補正 +50% / Max correction +50%
-
-    ratio = final_atk / final_def
-    correction_rate = 0.0
-
-    if ratio < 2:
-        correction_rate = 0.0 # 補正なし / No correction
-    elif 2 <= ratio < 10:
-        correction_rate = math.floor(ratio) * 0.05
-    else: # ratio >= 10
-        correction_rate = 0.50 # 上限50% / Upper limit 50%
-
-    return 1 + correction_rate
-
-
-def calculate_total_correction_factor(
-    lily_role_correction_factor,    # リリィ役職補正 / Lily Role Correction
-    lily_attribute_correction_factor, # リリィ属性補正 / Lily Attribute Correction
-    charm_rate,                     # CHARM補正 / CHARM Correction
-    order_rate,                     # オーダー効果 (単一値) / Order Effect (single value)
-    auxiliary_skill_factor,         # 補助スキル効果 / Support Skill Effect
-    grace_active,                   # 恩恵 / Grace
-    neunwelt_active,                # ノインヴェルト / Neunwelt
-    status_ratio_correction_factor, # ステータス比補正 / Status Ratio Correction
-    legion_match_active,            # レギマ補正 (常時True) / Legion Match Correction (always True)
-    stack_meteor_active,            # スタック補正 (メテオ) / Stack Correction (Meteor)
-    stack_barrier_active,           # スタック補正 (バリア) / Stack Correction (Barrier)
-    counterattack_correction_rate,  # カウンター補正 / Counterattack Correction
-    theme_correction_rate,          # テーマ補正 / Theme Correction
-    selected_opponent_lily_attribute, # 相手の衣装属性 / Opponent Lily Attribute
-    opponent_lily_reduction_rate, # 相手の衣装ダメージ軽減率 / Opponent Lily Damage Reduction Rate
-    selected_attack_memoria_attribute # 攻撃メモリアの属性 / Attack Memoria Attribute
-):
-    """
-    各種補正の合計乗算ファクターを計算する。
-    断り書きがない限り全てかけ合わせ。恩恵+ノインヴェルトは足し合わせる。スタック補正は乗算。
-    レギマ補正は常にTrueとして計算。
-    Calculates the total multiplication factor for various corrections.
-    All are multiplied unless otherwise specified. Grace + Neunwelt are added. Stack correction is multiplied.
-    Legion Match Correction is always calculated as True.
-    """
-
-    # 基本の乗算補正 (全てかけ合わせ)
-    # Basic Multiplication Correction (all multiplied)
-    factor = 1.0
-    factor *= lily_role_correction_factor # リリィ役職補正 / Lily role correction
-    factor *= lily_attribute_correction_factor # リリィ属性補正 / Lily Attribute correction
-
-    factor *= charm_rate
-    factor *= order_rate
-    factor *= auxiliary_skill_factor # 補助スキル効果 / Support skill effect
-    factor *= status_ratio_correction_factor
-    factor *= counterattack_correction_rate
-    factor *= theme_correction_rate
-
-    # レギマ補正は常にTrue
-    # Legion Match Correction is always True
-    if legion_match_active: # このパラメータは常にTrueで渡される想定 / This parameter is expected to be always True
-        factor *= LEGION_MATCH_CORRECTION
-
-    # スタック補正 (加算・減算してから乗算)
-    # メテオとバリアが同時に発動した場合の計算は (1 + 0.2 - 0.3) となる
-    # Stack Correction (add/subtract then multiply)
-    # If Meteor and Barrier activate simultaneously, the calculation is (1 + 0.2 - 0.3)
-    stack_correction_factor = 1.0
-    if stack_meteor_active:
-        stack_correction_factor += STACK_METEOR_CORRECTION # メテオ発動で+20% / Meteor activation +20%
-    if stack_barrier_active:
-        stack_correction_factor -= STACK_BARRIER_CORRECTION # バリア発動で-30% / Barrier activation -30%
-    factor *= stack_correction_factor
-
-    # 相手の衣装補正
-    # Opponent Costume Correction
-    if selected_opponent_lily_attribute != "なし" and selected_opponent_lily_attribute == selected_attack_memoria_attribute:
-        factor *= (1 - opponent_lily_reduction_rate)
-
-    # 恩恵とノインヴェルトの補正
-    # Grace and Neunwelt Correction
-    grace_neunwelt_correction_total = 0.0
-    if grace_active:
-        grace_neunwelt_correction_total += GRACE_CORRECTION # +10%
-    if neunwelt_active:
-        grace_neunwelt_correction_total += NEUNWELT_CORRECTION # +100%
-    factor *= (1 + grace_neunwelt_correction_total)
-
-    return factor
-
-
-def simulate_damage(
-    base_atk, base_spattack, base_def, base_spdefence,
-    attack_buff_percent, defense_buff_percent,
-    attribute_atk_buff_value, attribute_def_buff_value, # 属性バフの値を追加 / Add attribute buff values
-    selected_attack_memoria_subtype, selected_breakthrough_multiplier_rate, selected_attack_memoria_attribute,
-    selected_attack_memoria_category, # "通常単体"などのカテゴリラベル (役職補正用) / Category label like "Normal Single" (for role correction)
-    memoria_aux_data_list, # 25枚の補助スキルデータ (種類, 凸数, 属性) / 25 support skill memoria data (type, breakthrough, Attribute)
-    legendary_amplification_per_attribute_totals, # 新しいレジェンダリー合計増幅データ / New legendary total amplification data
-    selected_lily_role, lily_role_correction_rate, # リリィ役職設定 / Lily Role Settings
-    lily_aux_prob_amp_value, selected_aux_prob_amp_attribute, # リリィ補助スキル確率増幅 / Lily Support Skill Probability Amplification
-    lily_attribute_selection, lily_attribute_correction_multiplier, # リリィ属性補正 / Lily Attribute Correction
-    charm_rates, order_rate, counterattack_rate, theme_rates, # オーダー効果 / order rate
-    grace_active, neunwelt_active, # legion_match_active は常にTrue / legion_match_active is always True
-    stack_meteor_active, stack_barrier_active,
-    critical_active,
-    selected_opponent_lily_attribute, # 相手の衣装属性 / opponent lily attribute
-    opponent_lily_reduction_rate # 相手の衣装ダメージ軽減率 / opponent lily damage reduction rate
-):
+# 事前計算テーブルはステータス設定 (PLANE_KEYS) ごとに一度だけ作成する (補正の設定は with_corrections で差し替える)
+# The precomputed table is built only once per stat configuration (PLANE_KEYS); correction settings are swapped in with with_corrections
+@st.cache_resource(max_entries=16)
+def get_damage_table(table_key):
+    return DamageTable(build_scenario(json.loads(table_key)))
+
+# 補助スキル入力欄の初期値と列設定はゲームデータの版ごとに一度だけ作成する
+# The default rows and column settings of the support skill editor are built only once per game data version
+@st.cache_resource
+def get_default_memoria_dataframe(game_table_version):
+    breakthrough = default_breakthrough(GAME_TABLE_VERSIONS[game_table_version])
+    return pd.DataFrame([
+        {'No.': i + 1, '種類': NO_SUPPORT_SKILL, '凸数': breakthrough, '属性': ATTRIBUTE_OPTIONS[0]} #初期値を'4凸'に設定 / set initial value to '4凸'
+        for i in range(25)])
+
+@st.cache_resource
+def get_memoria_column_config(game_table_version):
+    game_tables = GAME_TABLE_VERSIONS[game_table_version]
+    return {
+        "No.": st.column_config.NumberColumn("No.", help="メモリアの番号", disabled=True), # Memoria Number
+        "種類": st.column_config.SelectboxColumn(
+            "種類", # Type
+            options=list(game_tables.supportskill_damageup_rate.keys()),
+            required=True,
+        ),
+        "凸数": st.column_config.SelectboxColumn(
+            "凸数", # Breakthrough Count
+            options=list(game_tables.breakthrough_multiplier_rate.keys()),
+            required=True,
+        ),
+        "属性": st.column_config.SelectboxColumn(
+            "属性", # attribute
+            options=ATTRIBUTE_OPTIONS,
+            required=True,
+        )
+    }
+
+@st.cache_resource
+def get_default_roster_dataframe():
+    return pd.DataFrame([
+        {"名前": f"相手{i + 1}", "DEF": 500000, "Sp.DEF": 500000, "HP": 1000000, "衣装属性": "なし", "軽減率": 0.05} # Opponent i
+        for i in range(3)], columns=ROSTER_COLUMNS)
+
+# スイープの結果キューブは 一覧・ファイル・集計結果 をキャッシュし、ウィジェットの操作のたびにディスクから読み直さない
+# (ファイルの更新時刻をキーに含めるため、書き込み中のスイープの結果は更新されたときに読み直す)
+# Sweep result cubes cache the file list, the opened files and the summaries, so widget changes do not re-read the disk
+# (the file modification time is part of the key, so a sweep still being written is re-read when it changes)
+@st.cache_data(ttl=60)
+def get_sweep_cube_paths(directory):
+    return sorted(Path(directory).glob("**/*.cube"))
+
+@st.cache_resource(max_entries=4)
+def get_result_cube(path, modified_time):
+    return ResultCube(path)
+
+@st.cache_data(max_entries=32)
+def summarize_sweep_cube(path, modified_time, target_hp, fixed_key):
+    return get_result_cube(path, modified_time).summarize(target_hp, **json.loads(fixed_key))
+
+# Matplotlibはグラフを作成するときだけ読み込む (起動時間の短縮)
+# Load Matplotlib only when a chart is requested (faster startup)
+def get_pyplot():
+    import matplotlib.pyplot as plt
+    import matplotlib_fontja # noqa: F401 日本語フォントを登録する (読み込むだけでよい) / registers the Japanese font on import
+    return plt
+
+def highlight_first_column(s):
     """
-    ラスバレのダメージ計算を一回分シミュレーションする。
-    全計算ステップを統合し、最終ダメージを返す。
-    Simulates a single Last Bullet damage calculation.
-    Integrates all calculation steps and returns the final damage.
+    簡易計算の結果表の先頭列 (攻撃バフの見出し) を灰色で表示するスタイル関数。
+    Styling function that greys out the first column (attack buff labels) of the simple calculation table.
     """
-
-    # 攻撃タイプに応じて使用するATKとDEFを選択
-    # Select ATK and DEF to use based on attack type
-    attack_type = ATTACK_CATEGORY_OPTIONS[selected_attack_memoria_category]["通特"]
-
-    current_base_atk = 0
-    current_base_def = 0
-
-    if attack_type == "通常": # Normal
-        current_base_atk = base_atk
-        current_base_def = base_def
-    elif attack_type == "特殊": # Special
-        current_base_atk = base_spattack
-        current_base_def = base_spdefence
-
-    # 1. 最終攻撃力, 最終防御力の計算 (通常バフ適用後)
-    # 1. Calculate Final ATK, Final DEF (after normal buff application)
-    final_atk = calculate_final_stats(current_base_atk, attack_buff_percent)
-    final_def = calculate_final_stats(current_base_def, defense_buff_percent)
-
-    # 属性バフの値を加算
-    # Add attribute buff values
-    final_atk += attribute_atk_buff_value
-    final_def += attribute_def_buff_value
-
-    # 2. メモリア倍率の計算
-    # 2. Calculate Memoria Multiplier
-    memoria_skill_effect = MEMORIA_SKILL_EFFECT_RATE.get(selected_attack_memoria_subtype, 0.1)
-    skill_lv_effect = BREAKTHROUGH_MULTIPLIER_RATE.get(selected_breakthrough_multiplier_rate, 1.35)
-    memoria_multiplier = calculate_memoria_multiplier(memoria_skill_effect, skill_lv_effect)
-
-    # 3. 基礎ダメージの計算
-    # 3. Calculate Base Damage
-    base_damage = calculate_base_damage(final_atk, final_def, memoria_multiplier)
-
-    # 4. 各種補正の計算
-    # 4. Calculate Various Corrections
-    # リリィ役職補正の計算
-    # Calculate Lily Role Correction
-    lily_role_correction_factor = 1.0
-    if selected_lily_role == selected_attack_memoria_category:
-        lily_role_correction_factor = lily_role_correction_rate
-
-    # リリィ属性補正の計算
-    # Calculate Lily Attribute Correction
-    lily_attribute_correction_factor = 1.0
-    if lily_attribute_selection != "なし" and lily_attribute_selection == selected_attack_memoria_attribute:
-        lily_attribute_correction_factor = lily_attribute_correction_multiplier
-
-    # CHARM補正、テーマ補正は、選択された属性に応じた値を辞書から取得
-    # CHARM Correction, Theme Correction: Get values from dictionary based on selected attribute
-    charm_rate = charm_rates.get(selected_attack_memoria_attribute, 1.0)
-    # order_rate は単一値として渡されるため、直接使用
-    # order_rate is passed as a single value, so use it directly
-    theme_current_rate = theme_rates.get(selected_attack_memoria_attribute, 1.0)
-
-    # 補助スキル効果 (シミュレーションごとに25枚のメモリアの発動判定を行い再計算)
-    # Support Skill Effect (recalculate activation judgment for 25 memoria per simulation)
-    auxiliary_skill_factor = calculate_auxiliary_skill_effect(
-        memoria_aux_data_list, selected_attack_memoria_attribute,
-        legendary_amplification_per_attribute_totals, lily_aux_prob_amp_value, selected_aux_prob_amp_attribute
-    )
-
-    # ステータス比補正
-    # Status Ratio Correction
-    status_ratio_correction_factor = calculate_status_ratio_correction(final_atk, final_def)
-
-    # 全ての各種補正を合算した乗算ファクター
-    # Total Multiplication Factor for all Corrections
-    total_correction_factor = calculate_total_correction_factor(
-        lily_role_correction_factor=lily_role_correction_factor,
-        lily_attribute_correction_factor=lily_attribute_correction_factor,
-        charm_rate=charm_rate,
-        order_rate=order_rate,
-        auxiliary_skill_factor=auxiliary_skill_factor,
-        grace_active=grace_active,
-        neunwelt_active=neunwelt_active,
-        status_ratio_correction_factor=status_ratio_correction_factor,
-        legion_match_active=True, # レギマ補正は常にTrue / Legion Match Correction is always True
-        stack_meteor_active=stack_meteor_active,
-        stack_barrier_active=stack_barrier_active,
-        counterattack_correction_rate=counterattack_rate,
-        theme_correction_rate=theme_current_rate,
-        selected_opponent_lily_attribute=selected_opponent_lily_attribute,
-        opponent_lily_reduction_rate=opponent_lily_reduction_rate,
-        selected_attack_memoria_attribute=selected_attack_memoria_attribute
-    )
-
-    # 補正後ダメージを計算
-    # Calculate Corrected Damage
-    corrected_damage = math.floor(base_damage * total_correction_factor)
-
-
-    # 5. 乱数処理後ダメージ
-    # 5. Randomized Damage
-    random_factor = random.uniform(0.9, 1.0)
-    randomized_damage = math.floor(corrected_damage * random_factor)
-
-    # 6. クリティカル補正
-    # 6. Critical Correction
-    critical_correction = CRITICAL_MULTIPLIER if critical_active else 1.0
-
-    # 7. 最終ダメージ
-    # 乱数処理後ダメージが負になることを避けるためにmax(0, ...)を追加し、最終ダメージが2より小さくならないようにする
-    # 7. Final Damage
-    # Add max(0, ...) to avoid negative randomized damage, and ensure final damage is not less than 2.
-    final_damage = math.floor(MIN_FINAL_DAMAGE + (max(0, randomized_damage) * critical_correction))
-
-    return final_damage
-
-# ヘルパー関数: 指定されたパラメータで複数回シミュレーションを実行
-# Helper function: Run multiple simulations with specified parameters
-def run_multiple_simulations_for_params(
-    num_sims, base_atk, base_spattack, base_def, base_spdefence,
-    actual_atk_buff_percent, actual_def_buff_percent,
-    attribute_atk_buff_value, attribute_def_buff_value,
-    selected_attack_memoria_subtype, selected_breakthrough_multiplier_rate, selected_attack_memoria_attribute,
-    selected_attack_memoria_category, memoria_aux_data_list,
-    legendary_amplification_per_attribute_totals,
-    selected_lily_role, lily_role_correction_rate, # リリィ役職設定 / Lily Role Settings
-    lily_aux_prob_amp_value, selected_aux_prob_amp_attribute, # リリィ補助スキル確率増幅 / Lily Support Skill Probability Amplification
-    lily_attribute_selection, lily_attribute_correction_multiplier, # リリィ属性補正 / Lily Attribute Correction
-    charm_rates, order_rate, counterattack_rate, theme_rates, # オーダー効果 / order rate
-    grace_active, neunwelt_active,
-    stack_meteor_active, stack_barrier_active,
-    critical_active, selected_opponent_lily_attribute, opponent_lily_reduction_rate
-):
-    damages = []
-    for _ in range(num_sims):
-        damage = simulate_damage(
-            base_atk, base_spattack, base_def, base_spdefence,
-            actual_atk_buff_percent, actual_def_buff_percent,
-            attribute_atk_buff_value, attribute_def_buff_value, # 属性バフ / attribute buff values
-            selected_attack_memoria_subtype, selected_breakthrough_multiplier_rate, selected_attack_memoria_attribute,
-            selected_attack_memoria_category,
-            memoria_aux_data_list, # 補助スキルデータ / Support skill data
-            legendary_amplification_per_attribute_totals, # レジェンダリー合計増幅データ / Legendary total amplification data
-            selected_lily_role, lily_role_correction_rate, # リリィ役職設定 / Lily role settings
-            lily_aux_prob_amp_value, # リリィ補助スキル確率増幅 / Lily support skill probability amplification
-            selected_aux_prob_amp_attribute, # リリィ補助スキル確率増幅で選択された属性 / selected attribute for Lily support skill probability amplification
-            selected_lily_attribute, lily_attribute_correction_rate, # リリィ属性補正 / Lily attribute correction
-            charm_rates, order_rate, counterattack_rate, theme_rates, # オーダー効果 / order rate
-            grace_active, neunwelt_active, # legion_match_active は True で固定 / legion_match_active is fixed to True
-            stack_meteor_active, stack_barrier_active,
-            critical_active,
-            selected_opponent_lily_attribute, # 相手の衣装属性 / opponent lily attribute
-            opponent_lily_reduction_rate # 相手の衣装ダメージ軽減率 / opponent lily damage reduction rate
-        )
-        damages.append(damage)
-    return damages
+    # Check if s is a pandas Series and its name is the column header of one of the display modes
+    if isinstance(s, pd.Series) and s.name in GRID_DISPLAYS.values():
+        # Apply background color #f8f9fb and text color #888888 (light grey)
+        return ['background-color: #f8f9fb; color: #888888'] * len(s)
+    return [''] * len(s)
 
 
 # --- Streamlit アプリケーションの構築 ---
@@ -459,6 +118,18 @@ st.caption(f"v{__version__}")
 with st.sidebar:
     st.header("シミュレーション条件設定") # Simulation Condition Settings
 
+    # 0. ゲームデータの版
+    # 0. Game Data Version
+    game_table_version = st.selectbox(
+        "ゲームデータの版", # Game Data Version
+        list(GAME_TABLE_VERSIONS.keys()),
+        key="game_table_version",
+        index=list(GAME_TABLE_VERSIONS.keys()).index(DEFAULT_GAME_TABLE_VERSION),
+    )
+    selected_game_tables = GAME_TABLE_VERSIONS[game_table_version]
+    if selected_game_tables.description:
+        st.caption(selected_game_tables.description)
+
     # 1. キャラステータス
     # 1. Character Stats
     st.subheader("キャラステータス") # Character Stats
@@ -484,14 +155,14 @@ with st.sidebar:
             "メモリア詳細種別", # Memoria Subtype
             selected_category_dict["subtypes"],
             key="selected_attack_memoria_subtype",
-            help="BⅤ,DⅢ,DⅣは検証データがないため、仮の値での実装です。", # BⅤ,DⅢ,DⅣ are implemented with provisional values as there is no verification data.
+            help=f"{','.join(selected_game_tables.unverified_memoria_skills)}は検証データがないため、仮の値での実装です。", # These are implemented with provisional values as there is no verification data.
         )
 
         selected_breakthrough_multiplier_rate = st.selectbox(
             "凸数", # Breakthrough Count
-            list(BREAKTHROUGH_MULTIPLIER_RATE.keys()),
+            list(selected_game_tables.breakthrough_multiplier_rate.keys()),
             key="selected_breakthrough_multiplier_rate",
-            index=list(BREAKTHROUGH_MULTIPLIER_RATE.keys()).index("4凸") # 初期値を"4凸"に設定 / Set initial value to "4凸"
+            index=list(selected_game_tables.breakthrough_multiplier_rate.keys()).index(default_breakthrough(selected_game_tables)) # 初期値を"4凸"に設定 / Set initial value to "4凸"
         )
 
         selected_attack_memoria_attribute = st.radio(
@@ -512,32 +183,15 @@ with st.sidebar:
     with st.expander("補助スキル", expanded=True): # Support Skill
 
         # `st.data_editor` を使用して、25枚のメモリアの詳細を設定
+        # 選択肢は版ごとに異なるため、入力欄も版ごとに分ける (他の版で選んだ値が残らないようにする)
         # Use `st.data_editor` to set details for 25 memoria
+        # The choices differ per version, so each version gets its own editor (values chosen for another version do not carry over)
         edited_memoria_data = st.data_editor(
-            pd.DataFrame([
-                 {'No.': i + 1, '種類': 'なし', '凸数': '4凸', '属性': ATTRIBUTE_OPTIONS[0]} #初期値を'4凸'に設定 / set initial value to '4凸'
-                 for i in range(25)]),
-            column_config={
-                "No.": st.column_config.NumberColumn("No.", help="メモリアの番号", disabled=True), # Memoria Number
-                "種類": st.column_config.SelectboxColumn(
-                    "種類", # Type
-                    options=list(SUPPORTSKILL_DAMAGEUP_RATE.keys()),
-                    required=True,
-                ),
-                "凸数": st.column_config.SelectboxColumn(
-                    "凸数", # Breakthrough Count
-                    options=list(BREAKTHROUGH_MULTIPLIER_RATE.keys()),
-                    required=True,
-                ),
-                "属性": st.column_config.SelectboxColumn(
-                    "属性", # attribute
-                    options=ATTRIBUTE_OPTIONS,
-                    required=True,
-                )
-            },
+            get_default_memoria_dataframe(game_table_version),
+            column_config=get_memoria_column_config(game_table_version),
             num_rows="fixed",
             hide_index=True,
-            key="edited_memoria_data"
+            key=f"edited_memoria_data_{game_table_version}"
         )
 
     # 4. レジェンダリーメモリア設定
@@ -681,10 +335,60 @@ with st.sidebar:
     st.subheader("シミュレーション実行設定") # Simulation Execution Settings
     num_simulations = st.number_input(
         "シミュレーション回数 (N)", # Number of Simulations (N)
-        min_value=1, value=1000, step=100,
+        min_value=1, max_value=MAX_NUM_SIMULATIONS, value=1000, step=100,
         key="num_simulations",
         help="最低でも1000回以上にすることを推奨します。" # It is recommended to set it to at least 1000 times or more.
     )
+    sampling_method = st.selectbox(
+        "サンプリング方式", # Sampling Method
+        SAMPLING_METHODS,
+        format_func=lambda method: {"random": "疑似乱数", "rqmc": "準モンテカルロ (RQMC)"}[method], # Pseudo-random / Quasi-Monte Carlo (RQMC)
+        key="sampling_method",
+        help="準モンテカルロはスクランブルしたHalton列を使い、少ない回数で平均ダメージが収束します。" # RQMC uses a scrambled Halton sequence; mean damage converges in fewer runs.
+             "回数は16の倍数に切り上げます。" # The run count is rounded up to a multiple of 16.
+    )
+
+
+# 現在の入力をシナリオ辞書にまとめ、対応する事前計算テーブルを取得
+# Collect the current inputs into a scenario dict and get the matching precomputed table
+scenario = {
+    "base_attack": base_attack, "base_spattack": base_spattack,
+    "base_defence": base_defence, "base_spdefence": base_spdefence,
+    "target_hp": target_hp,
+    "selected_attack_memoria_category": selected_attack_memoria_category,
+    "selected_attack_memoria_subtype": selected_attack_memoria_subtype,
+    "selected_breakthrough_multiplier_rate": selected_breakthrough_multiplier_rate,
+    "selected_attack_memoria_attribute": selected_attack_memoria_attribute,
+    "counterattack_rate": counterattack_rate,
+    "memoria": [{"種類": row["種類"], "凸数": row["凸数"], "属性": row["属性"]} for row in edited_memoria_data.to_dict('records')],
+    "legendary_amplification_per_attribute_totals": legendary_amplification_per_attribute_totals,
+    "selected_lily_role": selected_lily_role, "lily_role_correction_rate": lily_role_correction_rate,
+    "selected_lily_attribute": selected_lily_attribute, "lily_attribute_correction_rate": lily_attribute_correction_rate,
+    "selected_aux_prob_amp_attribute": selected_aux_prob_amp_attribute, "lily_aux_prob_amp_value": lily_aux_prob_amp_value,
+    "order_rate": order_rate,
+    "grace_active": grace_active, "neunwelt_active": neunwelt_active,
+    "stack_meteor_active": stack_meteor_active, "stack_barrier_active": stack_barrier_active,
+    "charm_rates": charm_rates,
+    "selected_opponent_lily_attribute": selected_opponent_lily_attribute, "opponent_lily_reduction_rate": opponent_lily_reduction_rate,
+    "theme_rates": theme_rates,
+    "critical_active": critical_active,
+    "num_simulations": num_simulations,
+    "game_table_version": game_table_version,
+}
+damage_table = get_damage_table(json.dumps(
+    {key: scenario[key] for key in PLANE_KEYS}, sort_keys=True, ensure_ascii=False)
+).with_corrections(**{key: value for key, value in scenario.items() if key not in PLANE_KEYS})
+
+# 乱数と計算済みのセルはセッションに保持し、補助メモリアの編集だけなら変わったサンプルだけを再計算する
+# The random draws and computed cells are kept in the session; support memoria edits only recompute the changed samples
+incremental_run = st.session_state.get("incremental_run")
+if incremental_run is not None and incremental_run.accepts(damage_table, sampling_method):
+    if incremental_run.update(damage_table):
+        st.session_state.pop("simple_grid_statistics", None)
+else:
+    incremental_run = None
+    for key in ["incremental_run", "simple_grid_visible", "simple_grid_statistics"]:
+        st.session_state.pop(key, None)
 
 
 # --- シミュレーション実行ボタン (メインエリア) ---
@@ -699,100 +403,84 @@ st.subheader("簡易ダメージ計算") # Simple Damage Calculation
 st.write("様々な攻撃バフと防御バフでのダメージを調べたい場合はこちら") # If you want to check damage with various attack and defense buffs, click here.
 
 if st.button("簡易シミュレーション実行"): # Execute Simulation
-
-    with st.spinner("シミュレーションを実行中..."): # Running simulation...
-        memoria_aux_data_list = edited_memoria_data.to_dict('records')
-
-        results_data = [] # 結果を格納するリスト / List to store results
-
-        # 各攻撃バフと防御バフの組み合わせについてシミュレーションを実行
-        # Run simulations for each combination of attack and defense buffs
-        for atk_level in attack_buff_levels:
-            # バフレベルを実際のパーセンテージに変換 (例: -20 -> -100%)
-            # Convert buff level to actual percentage (e.g., -20 -> -100%)
-            actual_atk_buff_percent = atk_level * BUFF_LEVEL_TO_PERCENT_MULTIPLIER
-            # 一番左上のセルに表示するテキストを直接指定
-            # Directly specify the text to display in the top-left cell
-            row_data = {"平均ダメ (HP割合)":f"攻撃バフ {atk_level}"} # Avg Damage (HP %): Attack Buff {atk_level}
-
-            for def_level in defense_buff_levels:
-                # バフレベルを実際のパーセンテージに変換 (例: +5 -> +25%)
-                # Convert buff level to actual percentage (e.g., +5 -> +25%)
-                actual_def_buff_percent = def_level * BUFF_LEVEL_TO_PERCENT_MULTIPLIER
-
-                # シミュレーション実行時には属性バフは0として渡す (表計算用)
-                # Pass attribute buffs as 0 during simulation execution (for table calculation)
-                damages = run_multiple_simulations_for_params(
-                    num_simulations, base_attack, base_spattack, base_defence, base_spdefence,
-                    actual_atk_buff_percent, actual_def_buff_percent,
-                    0, 0, # 属性バフは0として渡す / Pass attribute buffs as 0
-                    selected_attack_memoria_subtype, selected_breakthrough_multiplier_rate, selected_attack_memoria_attribute,
-                    selected_attack_memoria_category,
-                    memoria_aux_data_list, # 補助スキルデータ / Support skill data
-                    legendary_amplification_per_attribute_totals, # レジェンダリー合計増幅データ / Legendary total amplification data
-                    selected_lily_role, lily_role_correction_rate, # リリィ役職設定 / Lily role settings
-                    lily_aux_prob_amp_value, # リリィ補助スキル確率増幅 / Lily aux skill probability amplification
-                    selected_aux_prob_amp_attribute, # リリィ補助スキル確率増幅で選択された属性 / selected attribute for Lily support skill probability amplification
-                    selected_lily_attribute, lily_attribute_correction_rate, # リリィ属性補正 / Lily attribute correction
-                    charm_rates, order_rate, counterattack_rate, theme_rates, # オーダー効果 / order rate
-                    grace_active, neunwelt_active, # legion_match_active は True で固定 / legion_match_active is fixed to True
-                    stack_meteor_active, stack_barrier_active,
-                    critical_active,
-                    selected_opponent_lily_attribute, # 相手の衣装属性 / opponent lily attribute
-                    opponent_lily_reduction_rate # 相手の衣装ダメージ軽減率 / opponent lily damage reduction rate
-                )
-
-                # 平均ダメージを計算
-                # Calculate average damage
-                average_damage = np.mean(damages)
-
-                # 削ったHPの割合を計算
-                # Calculate HP shaved percentage
-                hp_shaved_percentage = min(100.0, max(0.0, (average_damage / target_hp) * 100))
-
-                # 結果を辞書に格納 (一つのセルにまとめる)
-                # Store results in a dictionary (combine into one cell)
-                col_header_suffix = f" {def_level:+d}"
-                row_data[f"防御バフ{col_header_suffix}"] = f"{int(round(average_damage)):,} ({hp_shaved_percentage:.1f}%)" # 四捨五入 / Round
-            results_data.append(row_data)
-
-        # 結果DataFrameを作成し表示
-        # Create and display results DataFrame
-        results_df = pd.DataFrame(results_data)
-
-        # --- Styling modification starts here ---
-        # Define a styling function for the first column
-        def highlight_first_column(s):
-            # Check if s is a pandas Series and its name is the new column header
-            if isinstance(s, pd.Series) and s.name == "平均ダメ (HP割合)":
-                # Apply background color #f8f9fb and text color #888888 (light grey)
-                return ['background-color: #f8f9fb; color: #888888'] * len(s)
-            return [''] * len(s)
-
-        # Apply the styling to the DataFrame
-        styled_results_df = results_df.style.apply(highlight_first_column, axis=0)
-        st.dataframe(styled_results_df, use_container_width=True, hide_index=True)
-        # --- Styling modification ends here ---
-
-        # --- 属性バフの相当値を表示 ---
-        # --- Display equivalent value of attribute buffs ---
-        # Get the category details for the selected attack category
-        selected_category_details_for_display = ATTACK_CATEGORY_OPTIONS[selected_attack_memoria_category]
-        attack_type_label_for_display = selected_category_details_for_display["通特"]
-
-        # Determine the selected attack value (ATK or Sp.ATK) based on the category
-        if attack_type_label_for_display == "通常":
-            selected_attack_value_for_display = base_attack
-            selected_defence_value_for_display = base_defence
-        else: # "特殊"
-            selected_attack_value_for_display = base_spattack
-            selected_defence_value_for_display = base_spdefence
-
-        equivalent_attack_buff_value = ((base_attack + base_spattack) / 4 / 3 / selected_attack_value_for_display / 0.05)
-        equivalent_defence_buff_value = ((base_defence + base_spdefence) / 4 / 3 / selected_defence_value_for_display / 0.05)
-        st.info(f"属性攻撃バフ1は{attack_type_label_for_display}攻撃バフ{equivalent_attack_buff_value:.1f}相当  \n" +# Attribute attack buff
-                f"属性防御バフ1は{attack_type_label_for_display}防御バフ{equivalent_defence_buff_value:.1f}相当" # Attribute defence buff
+    # 乱数 (補助スキル効果と乱数係数) は一度だけ引き、全てのセルで共通に使う
+    # Random inputs (support skill factors and random factors) are drawn once and shared by every cell
+    incremental_run = IncrementalRun.draw(damage_table, num_simulations, np.random.default_rng(), sampling_method)
+    st.session_state["incremental_run"] = incremental_run
+    st.session_state["simple_grid_visible"] = True
+    st.session_state.pop("simple_grid_statistics", None)
+
+# 一度実行した後は、補助メモリアを編集しても表を表示したまま更新する
+# Once run, the table stays visible and is refreshed when support memoria are edited
+if st.session_state.get("simple_grid_visible"):
+
+    # 数値の結果はセッションに保持し、表示の切り替えでは文字列への変換と強調表示だけをやり直す
+    # The numeric results are kept in the session; display toggles only redo the formatting and highlighting
+    if "simple_grid_statistics" not in st.session_state:
+        with st.spinner("シミュレーションを実行中..."): # Running simulation...
+            # 各攻撃バフと防御バフの組み合わせについて、テーブルを参照し乱数処理だけを適用する (属性バフは0)
+            # For each attack and defense buff combination, look up the table and apply only the random stage (attribute buffs are 0)
+            st.session_state["simple_grid_statistics"] = grid_statistics(
+                incremental_run, attack_buff_levels, defense_buff_levels, target_hp)
+    grid_stats = st.session_state["simple_grid_statistics"]
+
+    col_grid1, col_grid2 = st.columns(2)
+    with col_grid1:
+        grid_display = st.selectbox(
+            "表示", # Display
+            list(GRID_DISPLAYS),
+            format_func=GRID_DISPLAYS.get,
+            key="simple_grid_display",
         )
+    with col_grid2:
+        highlight_active = st.checkbox("ワンパン率で強調", key="simple_grid_highlight") # Highlight by one-shot rate
+        highlight_threshold = st.slider(
+            "ワンパン率がこの値以上のセルを強調 (%)", # Highlight cells with a one-shot rate at or above this value (%)
+            min_value=0, max_value=100, value=100, step=1,
+            key="simple_grid_highlight_threshold",
+            disabled=not highlight_active,
+        )
+
+    # 結果DataFrameを作成し表示 (一番左の列は攻撃バフの見出し)
+    # Create and display results DataFrame (the leftmost column holds the attack buff labels)
+    grid_cells = format_grid_cells(grid_stats, grid_display)
+    grid_columns = [f"防御バフ {def_level:+d}" for def_level in defense_buff_levels]
+    results_df = pd.DataFrame(grid_cells, columns=grid_columns)
+    results_df.insert(0, GRID_DISPLAYS[grid_display], [f"攻撃バフ {atk_level}" for atk_level in attack_buff_levels]) # Attack Buff {atk_level}
+
+    # しきい値以上のセルを強調する
+    # Highlight the cells at or above the threshold
+    grid_styles = pd.DataFrame("", index=results_df.index, columns=results_df.columns)
+    if highlight_active:
+        grid_styles[grid_columns] = np.where(highlight_mask(grid_stats, highlight_threshold), HIGHLIGHT_STYLE, "")
+
+    # --- Styling modification starts here ---
+    # Apply the styling to the DataFrame
+    styled_results_df = results_df.style.apply(highlight_first_column, axis=0).apply(lambda _: grid_styles, axis=None)
+    st.dataframe(styled_results_df, width="stretch", hide_index=True)
+    # --- Styling modification ends here ---
+    max_half_width = float(grid_stats[..., GRID_STATISTICS.index("average_damage_half_width")].max())
+    st.caption(f"平均ダメージの誤差 (95%信頼区間の半幅): 最大 ±{max_half_width:,.0f}") # Mean damage error (95% CI half-width): max
+
+    # --- 属性バフの相当値を表示 ---
+    # --- Display equivalent value of attribute buffs ---
+    # Get the category details for the selected attack category
+    selected_category_details_for_display = ATTACK_CATEGORY_OPTIONS[selected_attack_memoria_category]
+    attack_type_label_for_display = selected_category_details_for_display["通特"]
+
+    # Determine the selected attack value (ATK or Sp.ATK) based on the category
+    if attack_type_label_for_display == "通常":
+        selected_attack_value_for_display = base_attack
+        selected_defence_value_for_display = base_defence
+    else: # "特殊"
+        selected_attack_value_for_display = base_spattack
+        selected_defence_value_for_display = base_spdefence
+
+    equivalent_attack_buff_value = ((base_attack + base_spattack) / 4 / 3 / selected_attack_value_for_display / 0.05)
+    equivalent_defence_buff_value = ((base_defence + base_spdefence) / 4 / 3 / selected_defence_value_for_display / 0.05)
+    st.info(f"属性攻撃バフ1は{attack_type_label_for_display}攻撃バフ{equivalent_attack_buff_value:.1f}相当  \n" +# Attribute attack buff
+            f"属性防御バフ1は{attack_type_label_for_display}防御バフ{equivalent_defence_buff_value:.1f}相当" # Attribute defence buff
+    )
 
 
 # --- 詳細ダメージ計算 ---
@@ -836,38 +524,31 @@ with col_hist4:
         key="hist_attr_def_buff_slider"
     )
 
+# スライダーのバフを適用した現在の設定 (ヒートマップ・比較・感度分析・防御側一覧でも使う)
+# Current settings with the slider buffs applied (also used by the heatmap, comparison, sensitivity and roster)
+slider_buffs = {
+    "atk_level": hist_atk_level, "def_level": hist_def_level,
+    "attribute_atk_buff_value": hist_attribute_atk_buff_value, "attribute_def_buff_value": hist_attribute_def_buff_value,
+}
+slider_scenario = {**scenario, **slider_buffs}
+slider_table = damage_table.with_corrections(**slider_buffs, target_hp=target_hp)
+
 # ヒストグラム生成ボタン
 # Histogram Generation Button
 if st.button("詳細シミュレーション実行", key="generate_histogram_button"): # Execute Simulation
-    #memoria_aux_data_list の定義を追加
-    # Add definition for memoria_aux_data_list
-    memoria_aux_data_list = edited_memoria_data.to_dict('records')
-
-    # 実際のパーセンテージに変換
-    # Convert to actual percentage
-    hist_actual_atk_buff_percent = hist_atk_level * BUFF_LEVEL_TO_PERCENT_MULTIPLIER
-    hist_actual_def_buff_percent = hist_def_level * BUFF_LEVEL_TO_PERCENT_MULTIPLIER
-
-    # 指定されたバフで再度シミュレーションを実行してデータを取得
-    # Run simulation again with specified buffs to get data
-    hist_damages = run_multiple_simulations_for_params(
-        num_simulations, base_attack, base_spattack, base_defence, base_spdefence,
-        hist_actual_atk_buff_percent, hist_actual_def_buff_percent,
+    # 指定されたバフのセルをテーブルから参照し、乱数処理を適用してデータを取得
+    # Look up the cell for the specified buffs and apply the random stage to get data
+    # 簡易計算と同じ乱数を使う (まだ引いていなければ引く)
+    # Uses the same random draws as the simple calculation (drawn here if there are none yet)
+    if incremental_run is None:
+        incremental_run = IncrementalRun.draw(damage_table, num_simulations, np.random.default_rng(), sampling_method)
+        st.session_state["incremental_run"] = incremental_run
+    # ヒストグラムのセルは保持しない (保持したセルは補助メモリアの編集のたびに再計算される)
+    # The histogram cell is not kept (kept cells are recomputed on every support memoria edit)
+    hist_damages = incremental_run.damages(
+        hist_atk_level, hist_def_level,
         hist_attribute_atk_buff_value, hist_attribute_def_buff_value, # 属性バフ / attribute buff values
-        selected_attack_memoria_subtype, selected_breakthrough_multiplier_rate, selected_attack_memoria_attribute,
-        selected_attack_memoria_category,
-        memoria_aux_data_list, # 補助スキルデータ / Support skill data
-        legendary_amplification_per_attribute_totals, # レジェンダリー合計増幅データ / Legendary total amplification data
-        selected_lily_role, lily_role_correction_rate, # リリィ役職設定 / Lily role settings
-        lily_aux_prob_amp_value, # リリィ補助スキル確率増幅 / Lily aux skill probability amplification
-        selected_aux_prob_amp_attribute, # リリィ補助スキル確率増幅で選択された属性 / selected attribute for Lily support skill probability amplification
-        selected_lily_attribute, lily_attribute_correction_rate, # リリィ属性補正 / Lily attribute correction
-        charm_rates, order_rate, counterattack_rate, theme_rates, # オーダー効果 / order rate
-        grace_active, neunwelt_active, # legion_match_active は True で固定 / legion_match_active is fixed to True
-        stack_meteor_active, stack_barrier_active,
-        critical_active,
-        selected_opponent_lily_attribute, # 相手の衣装属性 / opponent lily attribute
-        opponent_lily_reduction_rate # 相手の衣装ダメージ軽減率 / opponent lily damage reduction rate
+        cache=False,
     )
 
     # Calculate standard bin width
@@ -887,6 +568,8 @@ if st.button("詳細シミュレーション実行", key="generate_histogram_but
     if bins[0] != 0:
         bins = np.insert(bins, 0, 0)
 
+    plt = get_pyplot()
+
     # Matplotlibでヒストグラムを作成
     # Create histogram with Matplotlib
     fig, ax = plt.subplots(figsize=(12, 7))
@@ -935,6 +618,7 @@ if st.button("詳細シミュレーション実行", key="generate_histogram_but
     plt.tight_layout() # レイアウトを調整 / Adjust layout
 
     st.pyplot(fig) # Streamlitでヒストグラムを表示 / Display histogram in Streamlit
+    plt.close(fig) # 再実行ごとに図が溜まらないように閉じる / Close the figure so figures do not pile up across reruns
 
     # 削ったHPの割合を計算
     # Calculate HP shaved percentage
@@ -942,24 +626,245 @@ if st.button("詳細シミュレーション実行", key="generate_histogram_but
 
     # ワンパン率を計算
     # Calculate one-shot kill rate
-    one_shot_count = sum(1 for d in hist_damages if d >= target_hp)
-    one_shot_rate_percentage = (one_shot_count / num_simulations) * 100 if num_simulations > 0 else 0.0
+    one_shot_rate, one_shot_half_width = mean_interval(hist_damages >= target_hp, sampling_method)
+    one_shot_rate_percentage = one_shot_rate * 100
+    hist_average_damage, hist_half_width = mean_interval(hist_damages, sampling_method)
 
     # ヒストグラム表示条件での統計情報を出力
     # Output statistics for histogram display conditions
 
     stats_message = f"""
 ### 統計情報 (攻撃バフ: {hist_atk_level}, 属性攻撃バフ: {hist_attribute_atk_buff_value:,},防御バフ: {hist_def_level}, 属性防御バフ: {hist_attribute_def_buff_value:,})
-* **平均ダメージ:** {round(np.mean(hist_damages)):,}
+* **平均ダメージ:** {round(hist_average_damage):,} (±{hist_half_width:,.0f})
 * **最大ダメージ:** {np.max(hist_damages):,}
 * **最小ダメージ:** {np.min(hist_damages):,}
 * **削ったHPの平均(%):** {hist_hp_shaved_percentage:.1f}%
-* **ワンパン率:** {one_shot_rate_percentage:.1f}%
+* **ワンパン率:** {one_shot_rate_percentage:.1f}% (±{one_shot_half_width * 100:.1f}%)
 """ # --- Statistics (Attack Buff: ..., Attribute Attack Buff: ..., Defense Buff: ..., Attribute Defense Buff: ...) --- Max Damage: ... Min Damage: ... Average Damage: ...
 
     st.info(stats_message)
 
 
+# --- バフ平面のヒートマップ ---
+# --- Buff Plane Heatmap ---
+st.subheader("ヒートマップ") # Heatmap
+st.write("バフと属性バフの全ての組み合わせでのワンパン率と削ったHPの割合を調べたい場合はこちら。" # To check one-shot rate and HP shaved over every combination of buff and attribute buff.
+         "もう一方のバフは詳細ダメージ計算のスライダーの値を使います。") # The other buffs use the values of the detailed calculation sliders.
+
+col_heatmap1, col_heatmap2 = st.columns(2)
+with col_heatmap1:
+    heatmap_side = st.radio(
+        "対象", # Target
+        ["攻撃バフ × 属性攻撃バフ", "防御バフ × 属性防御バフ"], # Attack buff x attribute attack buff / Defense buff x attribute defense buff
+        key="heatmap_side", horizontal=True,
+    )
+with col_heatmap2:
+    heatmap_attribute_step = st.selectbox(
+        "属性バフの刻み", # Attribute buff resolution
+        [10000, 5000, 2000],
+        index=1, key="heatmap_attribute_step",
+    )
+
+if st.button("ヒートマップ作成", key="generate_heatmap_button"): # Generate heatmap
+    if heatmap_side == "攻撃バフ × 属性攻撃バフ":
+        heatmap_side_key, heatmap_max_attribute, heatmap_level_label, heatmap_attribute_label = "attack", max_attr_atk_buff, "攻撃バフ", "属性攻撃バフ"
+        current_heatmap_point = (hist_attribute_atk_buff_value, hist_atk_level)
+    else:
+        heatmap_side_key, heatmap_max_attribute, heatmap_level_label, heatmap_attribute_label = "defense", max_attr_def_buff, "防御バフ", "属性防御バフ"
+        current_heatmap_point = (hist_attribute_def_buff_value, hist_def_level)
+
+    heatmap_attribute_values = np.arange(-(heatmap_max_attribute // heatmap_attribute_step) * heatmap_attribute_step,
+                                         heatmap_max_attribute + 1, heatmap_attribute_step)
+    with st.spinner("シミュレーションを実行中..."): # Running simulation...
+        heatmap_hp_percentage, heatmap_one_shot_rate = buff_plane_heatmap(
+            slider_table, heatmap_side_key, heatmap_attribute_values, num_simulations, np.random.default_rng())
+
+    plt = get_pyplot()
+
+    fig, axes = plt.subplots(1, 2, figsize=(16, 7))
+    for ax, values, title, contour_levels in [
+        (axes[0], heatmap_one_shot_rate, "ワンパン率 (%)", [10, 50, 90]), # One-shot rate (%)
+        (axes[1], heatmap_hp_percentage, "削ったHPの平均 (%)", [25, 50, 75, 100]), # Average HP shaved (%)
+    ]:
+        mesh = ax.pcolormesh(heatmap_attribute_values, HEATMAP_BUFF_LEVELS, values, shading="nearest", cmap="viridis", vmin=0, vmax=100)
+        fig.colorbar(mesh, ax=ax)
+        # 等確率線 (値が範囲内にある線だけ描く)
+        # Iso-probability contours (only levels within the value range are drawn)
+        drawn_levels = [level for level in contour_levels if values.min() < level < values.max()]
+        if drawn_levels:
+            contours = ax.contour(heatmap_attribute_values, HEATMAP_BUFF_LEVELS, values, levels=drawn_levels, colors="white", linewidths=1.5)
+            ax.clabel(contours, fmt="%d%%")
+        ax.plot(*current_heatmap_point, marker="x", color="red", markersize=12, label="現在のスライダー") # Current sliders
+        ax.set_title(title)
+        ax.set_xlabel(heatmap_attribute_label)
+        ax.set_ylabel(heatmap_level_label)
+        ax.legend(loc="lower right")
+    plt.tight_layout()
+
+    st.pyplot(fig)
+    plt.close(fig)
+
+
+# --- A/B比較 ---
+# --- A/B Comparison ---
+st.subheader("A/B比較") # A/B Comparison
+st.write("デッキや衣装の違いを比べたい場合はこちら。保存した設定と現在の設定を同じ乱数で比較します。" # To compare decks or costumes. Compares saved settings and the current settings on the same random draws.
+         "バフは詳細ダメージ計算のスライダーの値を使います。") # Buffs use the values of the detailed calculation sliders.
+
+if "comparison_scenarios" not in st.session_state:
+    st.session_state["comparison_scenarios"] = []
+
+col_compare1, col_compare2 = st.columns(2)
+with col_compare1:
+    if st.button("現在の設定を比較用に保存", key="save_comparison_scenario_button"): # Save current settings for comparison
+        st.session_state["comparison_scenarios"].append(slider_scenario)
+with col_compare2:
+    if st.button("保存した設定をクリア", key="clear_comparison_scenarios_button"): # Clear saved settings
+        st.session_state["comparison_scenarios"] = []
+
+saved_comparison_scenarios = st.session_state["comparison_scenarios"]
+st.caption(f"保存済みの設定: {len(saved_comparison_scenarios)}件 (先頭が基準、現在の設定が最後に加わります)") # Saved settings: N (the first is the baseline; the current settings are added last)
+
+if st.button("比較シミュレーション実行", key="compare_button", disabled=not saved_comparison_scenarios): # Execute comparison
+    comparison_labels = [f"保存{i + 1}" for i in range(len(saved_comparison_scenarios))] + ["現在"] # Saved i / Current
+    comparison_results = compare_scenarios(
+        saved_comparison_scenarios + [slider_scenario], num_simulations, np.random.default_rng(), comparison_labels)
+
+    comparison_df = pd.DataFrame([
+        {
+            "設定": result["label"], # Settings
+            "平均ダメージ": f"{round(result['average_damage']):,}", # Average damage
+            "ワンパン率": f"{result['one_shot_rate_percentage']:.1f}%", # One-shot rate
+            "平均ダメージ差 (95%CI)": f"{result['damage_difference']:+,.0f} ± {result['damage_difference_ci95']:,.0f}", # Damage difference
+            "ワンパン率差 (95%CI)": f"{result['one_shot_rate_difference_percentage']:+.1f}% ± {result['one_shot_rate_difference_ci95_percentage']:.1f}%", # One-shot rate difference
+        }
+        for result in comparison_results
+    ])
+    st.dataframe(comparison_df, width="stretch", hide_index=True)
+    st.caption("差は先頭の設定 (基準) に対する値です。信頼区間が0を含まなければ差があると判断できます。") # Differences are relative to the first (baseline) settings. If the interval excludes 0, the difference is significant.
+
+
+# --- 感度分析 ---
+# --- Sensitivity Report ---
+st.subheader("感度分析") # Sensitivity Report
+st.write("どの補正を上げるのが効果的か調べたい場合はこちら。各補正を入力欄の1ステップ分動かしたときの変化を表示します。" # To find which correction is most effective. Shows the change when each correction is moved by one input step.
+         "バフは詳細ダメージ計算のスライダーの値を使います。") # Buffs use the values of the detailed calculation sliders.
+
+if st.button("感度分析実行", key="sensitivity_button"): # Execute sensitivity report
+    sensitivity_rows = sensitivity_report(slider_table, num_simulations, np.random.default_rng())
+
+    sensitivity_df = pd.DataFrame([
+        {
+            "補正": row["input"], # Correction
+            "現在値": f"{row['current_value']:.2f}", # Current value
+            "1ステップ": f"{row['step']:+.2f}", # One step
+            "平均ダメージ変化": f"{row['damage_change_per_step']:+,.0f} ± {row['damage_change_ci95']:,.0f} ({row['damage_change_percentage']:+.2f}%)", # Mean damage change
+            "ワンパン率変化": f"{row['one_shot_rate_change_per_step_percentage']:+.1f}% ± {row['one_shot_rate_change_ci95_percentage']:.1f}%", # One-shot rate change
+        }
+        for row in sensitivity_rows
+    ])
+    st.dataframe(sensitivity_df, width="stretch", hide_index=True)
+
+
+# --- 防御側一覧 ---
+# --- Defender Roster ---
+st.subheader("防御側一覧") # Defender Roster
+st.write("複数の相手をまとめて評価し、ワンパンできる相手を調べたい場合はこちら。" # To evaluate many opponents at once and find who can be one-shot.
+         "攻撃側の設定とバフは現在の設定と詳細ダメージ計算のスライダーの値を使います。") # Attacker settings and buffs use the current settings and the detailed calculation sliders.
+
+edited_roster_data = st.data_editor(
+    get_default_roster_dataframe(),
+    column_config={
+        "名前": st.column_config.TextColumn("名前", required=True), # Name
+        "DEF": st.column_config.NumberColumn("DEF", min_value=1, step=10000, required=True),
+        "Sp.DEF": st.column_config.NumberColumn("Sp.DEF", min_value=1, step=10000, required=True),
+        "HP": st.column_config.NumberColumn("HP", min_value=1, step=10000, required=True),
+        "衣装属性": st.column_config.SelectboxColumn("衣装属性", options=ATTRIBUTE_OPTIONS + ["なし"], required=True), # Costume Attribute
+        "軽減率": st.column_config.NumberColumn("軽減率", min_value=0.0, max_value=1.0, step=0.01, format="%.2f", required=True), # Reduction Rate
+    },
+    num_rows="dynamic",
+    hide_index=True,
+    key="edited_roster_data"
+)
+
+if st.button("防御側一覧シミュレーション実行", key="roster_button"): # Execute roster simulation
+    roster_rows = evaluate_roster(slider_table, edited_roster_data.dropna().to_dict('records'), num_simulations, np.random.default_rng())
+
+    roster_df = pd.DataFrame([
+        {
+            "名前": row["name"], # Name
+            "平均ダメージ": round(row["average_damage"]), # Average damage
+            "削ったHPの平均(%)": row["hp_shaved_percentage"], # Average HP shaved (%)
+            "ワンパン率(%)": row["one_shot_rate_percentage"], # One-shot rate (%)
+        }
+        for row in roster_rows
+    ])
+    st.dataframe(
+        roster_df,
+        column_config={
+            "平均ダメージ": st.column_config.NumberColumn(format="%d"),
+            "削ったHPの平均(%)": st.column_config.NumberColumn(format="%.1f"),
+            "ワンパン率(%)": st.column_config.NumberColumn(format="%.1f"),
+        },
+        width="stretch", hide_index=True)
+
+
+# --- スイープ結果の閲覧 ---
+# --- Sweep Result Viewer ---
+# サーバー側で環境変数 SWEEP_RESULTS_DIRECTORY を設定した場合だけ表示し、その中の結果キューブだけを開く
+# Shown only when the server sets the SWEEP_RESULTS_DIRECTORY environment variable; only result cubes inside it are opened
+sweep_results_directory = os.environ.get("SWEEP_RESULTS_DIRECTORY")
+sweep_cube_paths = get_sweep_cube_paths(sweep_results_directory) if sweep_results_directory else []
+if sweep_cube_paths:
+    st.subheader("スイープ結果") # Sweep Results
+    st.write("sweep.py で保存した全サンプルから、一つの軸に沿った平均ダメージとワンパン率を表示します。" # Shows mean damage and one-shot rate along one axis from all samples saved by sweep.py.
+             "必要な部分だけを読み込むため、大きな結果でもメモリをほとんど使いません。") # Only the needed slice is read, so even large results use little memory.
+
+    sweep_cube_path = st.selectbox(
+        "結果ファイル", sweep_cube_paths, # Result file
+        format_func=lambda path: str(path.relative_to(sweep_results_directory)), key="sweep_cube_path")
+    sweep_cube_modified_time = sweep_cube_path.stat().st_mtime_ns
+    sweep_cube = get_result_cube(sweep_cube_path, sweep_cube_modified_time)
+
+    def sweep_axis_label(values, index):
+        # メモリア一覧など、値が長い軸は番号で表示する
+        # Axes with long values (such as memoria lists) are shown by number
+        return f"#{index}" if isinstance(values[index], (list, dict)) else str(values[index])
+
+    col_sweep1, col_sweep2 = st.columns(2)
+    with col_sweep1:
+        sweep_axis = st.selectbox("横軸", list(sweep_cube.axes), key="sweep_axis") # Axis to show
+    with col_sweep2:
+        sweep_target_hp = st.number_input(
+            "防御側 HP", value=sweep_cube.metadata.get("base", {}).get("target_hp", target_hp), # Defender HP
+            min_value=1, step=10000, key="sweep_target_hp")
+
+    sweep_fixed = {}
+    for sweep_axis_name, sweep_axis_values in sweep_cube.axes.items():
+        if sweep_axis_name != sweep_axis:
+            sweep_value_index = st.selectbox(
+                sweep_axis_name, range(len(sweep_axis_values)),
+                format_func=lambda index, values=sweep_axis_values: sweep_axis_label(values, index),
+                key=f"sweep_fixed_{sweep_axis_name}")
+            sweep_fixed[sweep_axis_name] = sweep_axis_values[sweep_value_index]
+
+    sweep_summary = summarize_sweep_cube(
+        sweep_cube_path, sweep_cube_modified_time, sweep_target_hp, json.dumps(sweep_fixed, sort_keys=True, ensure_ascii=False))
+    sweep_axis_values = sweep_cube.remaining_axes(**sweep_fixed)[sweep_axis]
+    st.dataframe(
+        pd.DataFrame({
+            sweep_axis: [sweep_axis_label(sweep_axis_values, index) for index in range(len(sweep_axis_values))],
+            "サンプル数": sweep_summary["count"], # Samples
+            "平均ダメージ": sweep_summary["average_damage"], # Average damage
+            "ワンパン率(%)": sweep_summary["one_shot_rate_percentage"], # One-shot rate (%)
+        }),
+        column_config={
+            "平均ダメージ": st.column_config.NumberColumn(format="%d"),
+            "ワンパン率(%)": st.column_config.NumberColumn(format="%.1f"),
+        },
+        width="stretch", hide_index=True)
+
+
 with st.expander("更新履歴・ダメージ計算式・要望,バグ報告", expanded=False): # Update History / Damage Calculation Formula / Requests, Bug Reports
 
     st.subheader("更新履歴") # Update History
@@ -0,0 +1,106 @@
+import numpy as np
+
+from compare import CONFIDENCE_Z
+
+# --- 準モンテカルロ (RQMC) サンプリング ---
+# --- Randomized Quasi-Monte Carlo Sampling ---
+#
+# 乱数の入力は 乱数係数1つ + 補助スキルの発動判定25個 の26次元の一様乱数だけなので、
+# 疑似乱数の代わりにスクランブルしたHalton列を使うと、平均の推定が少ないサンプル数で収束する。
+# 独立にスクランブルした複数の組 (レプリケート) の平均のばらつきから誤差を推定する。
+# 次元の順序は 乱数係数 (基数2)、メモリア1〜25枚目 (基数3, 5, 7, ...) とし、滑らかな乱数係数に最も均一な次元を割り当てる。
+# The random inputs are just 26 uniforms (one random factor plus 25 support skill activations),
+# so a scrambled Halton sequence in place of pseudo-random numbers makes the mean estimates converge with fewer samples.
+# The error is estimated from the spread of the means of several independently scrambled sets (replicates).
+# Dimensions are ordered random factor (base 2), then memoria 1-25 (bases 3, 5, 7, ...),
+# giving the most uniform dimension to the smooth random factor.
+
+# サンプリング方式 / Sampling methods
+SAMPLING_METHODS = ["random", "rqmc"]
+
+# レプリケート数と、その自由度 (15) のt分布の97.5%点
+# Number of replicates and the 97.5% point of the t distribution with its degrees of freedom (15)
+NUM_REPLICATES = 16
+CONFIDENCE_T = 2.131
+
+
+def first_primes(count):
+    """
+    小さい順に count 個の素数を返す。
+    Returns the first count primes.
+    """
+    primes = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % prime for prime in primes if prime * prime <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def scrambled_halton(num_points, dimension, rng):
+    """
+    桁ごとにランダムな置換でスクランブルしたHalton列の先頭 num_points 点を (点数, 次元) の配列で返す。
+    各次元・各桁の置換は独立に引くため、各点は [0, 1) 上で一様に分布する (倍精度の分解能まで)。
+    Returns the first num_points points of a Halton sequence scrambled with random digit permutations, shape (points, dimension).
+    Every digit position of every dimension gets an independent permutation, so each point is uniform on [0, 1)
+    (down to double precision resolution).
+    """
+    points = np.empty((num_points, dimension))
+    indices = np.arange(num_points, dtype=np.int64)
+    for d, base in enumerate(first_primes(dimension)):
+        # base ** -num_digits が倍精度の分解能を下回るまで桁を取る (上位の桁が0でも置換で値が入る)
+        # Take digits until base ** -num_digits is below double precision (higher zero digits still get permuted values)
+        num_digits = int(np.ceil(53 * np.log(2) / np.log(base)))
+        permutations = np.argsort(rng.random((num_digits, base)), axis=1)
+        scales = float(base) ** -np.arange(1, num_digits + 1)
+
+        # 番号を表すのに必要な桁だけを点ごとに計算し、それより上の桁 (全ての点で0) は定数としてまとめて足す
+        # Only the digits needed to write the indices are computed per point; higher digits (0 for every point) add one constant
+        num_varying_digits = 1
+        while base ** num_varying_digits < num_points:
+            num_varying_digits += 1
+        remaining = indices.copy()
+        values = np.full(num_points, np.dot(permutations[num_varying_digits:, 0], scales[num_varying_digits:]))
+        for digit_position in range(num_varying_digits):
+            remaining, digits = np.divmod(remaining, base)
+            values += permutations[digit_position, digits] * scales[digit_position]
+        points[:, d] = values
+    # 丸めで1.0になった点を [0, 1) に戻す
+    # Bring points rounded up to 1.0 back into [0, 1)
+    return np.minimum(points, np.nextafter(1.0, 0.0))
+
+
+def draw_uniforms(num_samples, num_memoria, rng, method="random"):
+    """
+    method に応じて、補助スキルの発動判定 (サンプル数, num_memoria) と乱数係数 (サンプル数) の一様乱数を引く。
+    "rqmc" では NUM_REPLICATES 組のスクランブルHalton列を連結し、num_samples を組の数の倍数に切り上げる。
+    Draws the uniforms for support skill activations (samples, num_memoria) and the random factor (samples) according to method.
+    With "rqmc", NUM_REPLICATES scrambled Halton sets are concatenated and num_samples is rounded up to a multiple of the set count.
+    """
+    if method == "random":
+        # DamageTable.draw_random_inputs と同じ順に引く
+        # Drawn in the same order as DamageTable.draw_random_inputs
+        return rng.random((num_samples, num_memoria)), rng.random(num_samples)
+    if method != "rqmc":
+        raise ValueError(f"unknown sampling method: {method}")
+
+    points_per_replicate = -(-num_samples // NUM_REPLICATES)
+    uniforms = np.concatenate([scrambled_halton(points_per_replicate, 1 + num_memoria, rng) for _ in range(NUM_REPLICATES)])
+    return uniforms[:, 1:], uniforms[:, 0]
+
+
+def mean_interval(values, method="random"):
+    """
+    サンプルの平均と95%信頼区間の半幅を返す (values の先頭の軸がサンプル)。
+    "rqmc" では draw_uniforms の組ごとの平均のばらつきから、"random" では標本分散から求める。
+    Returns the sample mean and the half-width of its 95% confidence interval (the first axis of values is the samples).
+    With "rqmc" it comes from the spread of the per-set means from draw_uniforms; with "random" from the sample variance.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if method == "rqmc":
+        replicate_means = values.reshape((NUM_REPLICATES, -1) + values.shape[1:]).mean(axis=1)
+        return replicate_means.mean(axis=0), CONFIDENCE_T * replicate_means.std(axis=0, ddof=1) / np.sqrt(NUM_REPLICATES)
+    if len(values) < 2:
+        return values.mean(axis=0), np.full(values.shape[1:], np.nan)
+    return values.mean(axis=0), CONFIDENCE_Z * values.std(axis=0, ddof=1) / np.sqrt(len(values))
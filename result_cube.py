@@ -0,0 +1,204 @@
+import json
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+# --- メモリマップの結果キューブ ---
+# --- Memory-Mapped Result Cube ---
+#
+# スイープの全サンプル (軸1 × 軸2 × ... × サンプル) を一つのファイルにメモリマップで保存する。
+# ファイルは 先頭の識別子・ヘッダー (JSON)・ダメージの配列・書き込み済みの印 の順に並ぶ。
+# 書き込みは塊ごとに行い、読み出しは必要な部分だけをディスクから読むため、全体がメモリより大きくても扱える。
+# Stores every sweep sample (axis 1 x axis 2 x ... x samples) in one memory-mapped file.
+# The file holds a magic string, a JSON header, the damage array and the written flags, in that order.
+# Writes happen per chunk and reads only touch the slices that are needed, so the cube can be larger than memory.
+#
+# 使い方 / Usage:
+#   cube = ResultCube("sweep_out/samples.cube")
+#   damages = cube.select(atk_level=10)   # def_level × ... × サンプル のメモリマップ / memmap over def_level x ... x samples
+#   summary = cube.summarize(target_hp=250000, atk_level=10)
+
+MAGIC = b"LBCUBE1\n"
+SUPPORTED_FORMAT_VERSION = 1
+
+# ヘッダーの後ろの配列をこの境界に揃える
+# Arrays after the header are aligned to this boundary
+HEADER_ALIGNMENT = 4096
+
+# ダメージは int32 で保存する (int64 の半分のサイズ)
+# Damages are stored as int32 (half the size of int64)
+DAMAGE_DTYPE = np.dtype("<i4")
+
+
+def _aligned(offset):
+    return -(-offset // HEADER_ALIGNMENT) * HEADER_ALIGNMENT
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a result cube")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length).decode("utf-8"))
+    if header.get("format_version") != SUPPORTED_FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported format_version {header.get('format_version')}")
+    return header
+
+
+def create_result_cube(path, axes, num_samples, chunk_size, metadata=None):
+    """
+    軸 (軸名 -> 値の一覧) とサンプル数から空の結果キューブを作成して開く。
+    同じファイルが既にあればそれを開き、軸やサンプル数が異なる場合は ValueError を送出する。
+    複数のプロセスが同時に呼んでも、作成されるファイルは一つだけになる。
+    Creates an empty result cube from the axes (dict of axis name -> values) and the number of samples, and opens it.
+    If the file already exists it is opened instead; raises ValueError if its axes or sample count differ.
+    Safe to call from several processes at once: only one file is created.
+    """
+    path = Path(path)
+    header = {
+        "format_version": SUPPORTED_FORMAT_VERSION,
+        "axes": [{"name": name, "values": list(values)} for name, values in axes.items()],
+        "num_samples": int(num_samples),
+        "chunk_size": int(chunk_size),
+        "dtype": DAMAGE_DTYPE.str,
+        "metadata": metadata or {},
+    }
+
+    if not path.exists():
+        shape = tuple(len(values) for values in axes.values()) + (header["num_samples"],)
+        num_points = int(np.prod(shape[:-1]))
+        num_chunks = -(-header["num_samples"] // header["chunk_size"])
+
+        # ヘッダーに配列の位置を書くため、位置を含めた長さで揃える
+        # The header records the array offsets, so align using the length including the offsets
+        header["damages_offset"] = header["written_offset"] = 0
+        header_length = len(json.dumps(header, ensure_ascii=False).encode("utf-8")) + 64
+        header["damages_offset"] = _aligned(len(MAGIC) + 8 + header_length)
+        header["written_offset"] = _aligned(header["damages_offset"] + int(np.prod(shape)) * DAMAGE_DTYPE.itemsize)
+        encoded = json.dumps(header, ensure_ascii=False).encode("utf-8").ljust(header_length)
+
+        # 一時ファイルに書いてからリンクする (既にあれば他のプロセスが作成済み)
+        # Write a temporary file, then link it into place (if it already exists another process created it)
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temporary_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", header_length) + encoded)
+            f.truncate(header["written_offset"] + num_points * num_chunks)
+        try:
+            os.link(temporary_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temporary_path)
+
+    cube = ResultCube(path, mode="r+")
+    if (cube.header["axes"], cube.num_samples, cube.chunk_size) != (header["axes"], header["num_samples"], header["chunk_size"]):
+        raise ValueError(f"{path} was created with different axes or sample counts; use a new file")
+    return cube
+
+
+class ResultCube:
+    """
+    結果キューブのファイルを開いたもの。配列はメモリマップで、参照した部分だけがディスクから読まれる。
+    An opened result cube file. The arrays are memory maps; only the parts that are accessed are read from disk.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = Path(path)
+        self.header = _read_header(self.path)
+        self.axes = {axis["name"]: axis["values"] for axis in self.header["axes"]}
+        self.num_samples = self.header["num_samples"]
+        self.chunk_size = self.header["chunk_size"]
+        self.num_chunks = -(-self.num_samples // self.chunk_size)
+        self.metadata = self.header["metadata"]
+        self.axis_shape = tuple(len(values) for values in self.axes.values())
+
+        self.damages = np.memmap(self.path, dtype=np.dtype(self.header["dtype"]), mode=mode,
+                                 offset=self.header["damages_offset"], shape=self.axis_shape + (self.num_samples,))
+        self.written = np.memmap(self.path, dtype=np.uint8, mode=mode,
+                                 offset=self.header["written_offset"], shape=self.axis_shape + (self.num_chunks,))
+
+    def point_index(self, point_index):
+        """
+        パラメータ点の通し番号を軸ごとの番号に変換する (sweep.parameter_point と同じ並び順)。
+        Converts a flat parameter point number into per-axis indices (same order as sweep.parameter_point).
+        """
+        return np.unravel_index(point_index, self.axis_shape)
+
+    def write_chunk(self, point_index, chunk_index, damages):
+        """
+        一つのパラメータ点の一つの塊のダメージを書き込み、書き込み済みの印を付ける。
+        Writes the damages of one chunk of one parameter point and marks it as written.
+        """
+        if len(damages) and (np.max(damages) > np.iinfo(DAMAGE_DTYPE).max or np.min(damages) < 0):
+            raise ValueError(f"damage out of range for {DAMAGE_DTYPE}")
+        index = self.point_index(point_index)
+        start = chunk_index * self.chunk_size
+        self.damages[index][start:start + len(damages)] = damages
+        self.damages.flush()
+        # ダメージを書き終えてから印を付ける
+        # Mark only after the damages have been written
+        self.written[index][chunk_index] = 1
+        self.written.flush()
+
+    def _axis_indices(self, fixed):
+        unknown_axes = set(fixed) - set(self.axes)
+        if unknown_axes:
+            raise ValueError(f"unknown axes: {sorted(unknown_axes)}")
+        indices = []
+        for name, values in self.axes.items():
+            if name not in fixed:
+                indices.append(slice(None))
+            elif fixed[name] in values:
+                indices.append(values.index(fixed[name]))
+            else:
+                raise ValueError(f"{fixed[name]!r} is not a value of axis {name}")
+        return tuple(indices)
+
+    def remaining_axes(self, **fixed):
+        """
+        fixed で固定しなかった軸 (軸名 -> 値の一覧) を返す。
+        Returns the axes not fixed by fixed (dict of axis name -> values).
+        """
+        self._axis_indices(fixed)
+        return {name: values for name, values in self.axes.items() if name not in fixed}
+
+    def select(self, **fixed):
+        """
+        軸の値を固定した部分 (残りの軸 × サンプル) をメモリマップのまま返す。例: select(atk_level=10)
+        書き込まれていない塊は0のままなので、集計には summarize を使う。
+        Returns the slice with the given axis values fixed (remaining axes x samples), still as a memory map.
+        Example: select(atk_level=10). Unwritten chunks are still 0, so use summarize for statistics.
+        """
+        return self.damages[self._axis_indices(fixed)]
+
+    def summarize(self, target_hp, **fixed):
+        """
+        軸の値を固定した部分について、残りの軸の各点の 書き込み済みサンプル数・平均ダメージ・ワンパン率(%) を返す。
+        塊ごとに読むため、一度にメモリに載るのは (残りの軸 × 塊の大きさ) だけ。
+        For the slice with the given axis values fixed, returns the written sample count, mean damage
+        and one-shot rate (%) at each point of the remaining axes.
+        Reads chunk by chunk, so only (remaining axes x chunk size) is in memory at a time.
+        """
+        indices = self._axis_indices(fixed)
+        damages = self.damages[indices]
+        written = self.written[indices]
+
+        counts = np.zeros(written.shape[:-1], dtype=np.int64)
+        damage_sums = np.zeros(written.shape[:-1])
+        one_shot_counts = np.zeros(written.shape[:-1], dtype=np.int64)
+        for chunk_index in range(self.num_chunks):
+            start = chunk_index * self.chunk_size
+            chunk = np.asarray(damages[..., start:start + self.chunk_size])
+            chunk_written = written[..., chunk_index].astype(bool)
+            counts += chunk_written * chunk.shape[-1]
+            damage_sums += np.where(chunk_written, chunk.sum(axis=-1, dtype=np.int64), 0)
+            one_shot_counts += np.where(chunk_written, np.count_nonzero(chunk >= target_hp, axis=-1), 0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return {
+                "count": counts,
+                "average_damage": damage_sums / counts,
+                "one_shot_rate_percentage": one_shot_counts / counts * 100,
+            }
@@ -0,0 +1,77 @@
+import numpy as np
+
+from damage_calc import ATTACK_CATEGORY_OPTIONS
+from damage_table import (
+    buff_level_index, final_stats_array, base_damage_array, status_ratio_correction_array, apply_random_stage,
+)
+
+# --- 防御側一覧モード ---
+# --- Defender Roster Mode ---
+#
+# 一人の攻撃側に対して複数の防御側を、防御側の軸でベクトル化して一度に評価する。
+# 乱数 (補助スキルの発動判定・乱数係数) は全ての防御側で共通にする。
+# Evaluates many defenders against one attacker at once, vectorized over the defender axis.
+# The random draws (support skill activations and random factor) are shared across all defenders.
+
+# 防御側一覧の列 (data_editor の列名と同じ)
+# Defender roster columns (same as the data_editor column names)
+ROSTER_COLUMNS = ["名前", "DEF", "Sp.DEF", "HP", "衣装属性", "軽減率"] # Name, DEF, Sp.DEF, HP, Costume Attribute, Reduction Rate
+
+
+def evaluate_roster(table, defenders, num_samples, rng):
+    """
+    防御側一覧の各防御側について、平均ダメージ・削ったHPの割合・ワンパン率を計算し、ワンパン率の高い順に返す。
+    攻撃側の設定とバフは table のシナリオ (atk_level / def_level / 属性バフ) を使い、防御バフは全員に同じ値を適用する。
+    For each defender in the roster, computes mean damage, HP shaved percentage and one-shot rate, sorted by one-shot rate.
+    Attacker settings and buffs come from the table's scenario (atk_level / def_level / attribute buffs);
+    the same defense buffs are applied to every defender.
+    """
+    if not defenders:
+        return []
+
+    scenario = table.scenario
+    attack_attribute = scenario["selected_attack_memoria_attribute"]
+    defence_key = "DEF" if ATTACK_CATEGORY_OPTIONS[scenario["selected_attack_memoria_category"]]["通特"] == "通常" else "Sp.DEF"
+
+    # 攻撃側の最終攻撃力 (スカラー) と防御側ごとの最終防御力 (防御側の軸)
+    # Attacker's final ATK (scalar) and each defender's final DEF (defender axis)
+    final_atk = table.final_atk_by_level[buff_level_index(scenario["atk_level"])] + scenario["attribute_atk_buff_value"]
+    buff_percent = scenario["def_level"] * table.game_tables.corrections["buff_level_to_percent_multiplier"]
+    base_defences = np.array([defender[defence_key] for defender in defenders], dtype=np.int64)
+    final_def = final_stats_array(base_defences, buff_percent) + scenario["attribute_def_buff_value"]
+
+    base_damage = base_damage_array(final_atk, final_def, table.memoria_multiplier)
+    status_ratio_correction = status_ratio_correction_array(final_atk, final_def)
+
+    # 衣装属性が攻撃メモリアの属性と一致しない防御側は軽減率0 (1倍を掛けるため、補正しない場合と同じ値になる)
+    # Defenders whose costume attribute does not match the attack memoria attribute get reduction 0
+    # (multiplying by 1 gives the same value as skipping the correction)
+    effective_reduction_rates = np.array([
+        defender["軽減率"] if defender["衣装属性"] == attack_attribute else 0.0 for defender in defenders])
+    roster_table = table.with_corrections(
+        selected_opponent_lily_attribute=attack_attribute, opponent_lily_reduction_rate=effective_reduction_rates[None, :])
+
+    auxiliary_skill_factors, random_factors = roster_table.draw_random_inputs(num_samples, rng)
+    # 補正の計算は *= で行うため、先に (サンプル数, 防御側数) の形に揃えておく
+    # The corrections are computed with *=, so broadcast to (samples, defenders) beforehand
+    auxiliary_skill_factors = np.broadcast_to(auxiliary_skill_factors[:, None], (num_samples, len(defenders)))
+    total_correction_factor = roster_table.total_correction_factors(auxiliary_skill_factors, status_ratio_correction[None, :])
+    corrections = table.game_tables.corrections
+    damages = apply_random_stage(base_damage[None, :], total_correction_factor, random_factors[:, None], scenario["critical_active"],
+                                 corrections["min_final_damage"], corrections["critical_multiplier"])
+
+    target_hps = np.array([defender["HP"] for defender in defenders], dtype=np.float64)
+    average_damages = damages.mean(axis=0)
+    one_shot_rates = (damages >= target_hps[None, :]).mean(axis=0)
+
+    rows = [
+        {
+            "name": defender["名前"],
+            "average_damage": float(average_damage),
+            "hp_shaved_percentage": min(100.0, max(0.0, average_damage / target_hp * 100)),
+            "one_shot_rate_percentage": float(one_shot_rate) * 100,
+        }
+        for defender, average_damage, target_hp, one_shot_rate in zip(defenders, average_damages, target_hps, one_shot_rates)
+    ]
+    rows.sort(key=lambda row: (row["one_shot_rate_percentage"], row["hp_shaved_percentage"]), reverse=True)
+    return rows
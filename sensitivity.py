@@ -0,0 +1,84 @@
+import numpy as np
+
+from compare import paired_interval
+
+# --- 補正入力ごとの感度分析 ---
+# --- Sensitivity Report for Each Correction Input ---
+#
+# 一様乱数を一度だけ引き、各入力を±1ステップ動かしたときの補正だけを再計算する。
+# 基礎ダメージの面は共有し、同じ乱数で比較するため、差の推定はほとんどぶれない。
+# Uniforms are drawn once and only the corrections are recomputed with each input moved by ±1 step.
+# Base damage planes are shared and the same draws are compared, so the estimated differences are very stable.
+
+# (表示名, シナリオのキー, 属性ごとの辞書か, 1ステップ, 最小値)
+# ステップ幅はサイドバーの入力欄と同じにしている
+# (display name, scenario key, whether it is a per-attribute dict, one step, minimum value)
+# Step sizes match the sidebar inputs
+SENSITIVITY_INPUTS = [
+    ("CHARM補正", "charm_rates", True, 0.05, 0.0), # CHARM Correction
+    ("テーマ補正", "theme_rates", True, 0.05, 0.0), # Theme Correction
+    ("オーダー効果", "order_rate", False, 0.05, 0.0), # Order Effect
+    ("役職一致補正倍率", "lily_role_correction_rate", False, 0.01, 1.0), # Role Match Correction Multiplier
+    ("属性一致補正倍率", "lily_attribute_correction_rate", False, 0.01, 1.0), # Attribute Match Correction Multiplier
+    ("レジェンダリー合計増幅", "legendary_amplification_per_attribute_totals", True, 0.01, 0.0), # Legendary Total Amplification
+    ("補助スキル確率増幅", "lily_aux_prob_amp_value", False, 0.01, 0.0), # Support Skill Probability Amplification
+]
+
+
+def shifted_overrides(scenario, key, per_attribute, value):
+    """
+    入力を value に変更するためのシナリオの上書き内容を返す。属性ごとの辞書は攻撃メモリアの属性だけを変える。
+    Returns scenario overrides that set the input to value. Per-attribute dicts change only the attack memoria attribute.
+    """
+    if per_attribute:
+        return {key: {**scenario[key], scenario["selected_attack_memoria_attribute"]: value}}
+    return {key: value}
+
+
+def sensitivity_report(table, num_samples, rng):
+    """
+    各補正入力を±1ステップ動かしたときの平均ダメージとワンパン率の変化を、影響の大きい順に返す。
+    変化量は1ステップあたりの中心差分 (下限に当たる場合は片側差分)。
+    table のシナリオの atk_level / def_level / 属性バフ / target_hp で評価する。
+    Returns the change in mean damage and one-shot rate when each correction input is moved by ±1 step, largest impact first.
+    Changes are central differences per step (one-sided when the lower bound is hit).
+    Evaluated at the atk_level / def_level / attribute buffs / target_hp of the table's scenario.
+    """
+    scenario = table.scenario
+    aux_uniforms = rng.random((num_samples, len(table.aux_probabilities)))
+    random_uniforms = rng.random(num_samples)
+
+    def evaluate(variant_table):
+        auxiliary_skill_factors, random_factors = variant_table.random_inputs_from_uniforms(aux_uniforms, random_uniforms)
+        damages = variant_table.damages(scenario["atk_level"], scenario["def_level"], auxiliary_skill_factors, random_factors,
+                                        scenario["attribute_atk_buff_value"], scenario["attribute_def_buff_value"])
+        return damages, (damages >= scenario["target_hp"]).astype(np.float64)
+
+    base_damages, _ = evaluate(table)
+    base_average_damage = float(np.mean(base_damages))
+
+    rows = []
+    for label, key, per_attribute, step, min_value in SENSITIVITY_INPUTS:
+        current_value = scenario[key].get(scenario["selected_attack_memoria_attribute"], 0.0) if per_attribute else scenario[key]
+        lower_value = max(min_value, current_value - step)
+        upper_value = current_value + step
+
+        lower_damages, lower_one_shots = evaluate(table.with_corrections(**shifted_overrides(scenario, key, per_attribute, lower_value)))
+        upper_damages, upper_one_shots = evaluate(table.with_corrections(**shifted_overrides(scenario, key, per_attribute, upper_value)))
+
+        num_steps = (upper_value - lower_value) / step
+        damage_change, damage_interval = paired_interval((upper_damages - lower_damages) / num_steps)
+        one_shot_change, one_shot_interval = paired_interval((upper_one_shots - lower_one_shots) / num_steps)
+        rows.append({
+            "input": label,
+            "current_value": current_value,
+            "step": step,
+            "damage_change_per_step": damage_change,
+            "damage_change_ci95": damage_interval,
+            "damage_change_percentage": damage_change / base_average_damage * 100 if base_average_damage else 0.0,
+            "one_shot_rate_change_per_step_percentage": one_shot_change * 100,
+            "one_shot_rate_change_ci95_percentage": one_shot_interval * 100,
+        })
+
+    rows.sort(key=lambda row: abs(row["damage_change_per_step"]), reverse=True)
+    return rows
@@ -0,0 +1,241 @@
+import argparse
+import json
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from damage_calc import build_scenario, run_scenario, summarize_damages
+
+# --- ローカルHTTPシミュレーションサービス ---
+# --- Local HTTP Simulation Service ---
+#
+# 使い方 / Usage:
+#   python server.py --port 8765 --workers 4
+#   curl -X POST localhost:8765/simulate -d '{"atk_level": 10, "def_level": -5}'
+#   curl localhost:8765/metrics
+
+# レイテンシ統計に使う直近のリクエスト数
+# Number of recent requests kept for latency statistics
+LATENCY_WINDOW_SIZE = 1000
+
+
+def simulate_payload(scenario):
+    """
+    ワーカープロセス上でシナリオを実行し、統計情報を返す。
+    Runs a scenario on a worker process and returns its statistics.
+    """
+    damages = run_scenario(scenario)
+    return summarize_damages(damages, scenario["target_hp"])
+
+
+class SimulationService:
+    """
+    ワーカープールでシナリオを実行するサービス。
+    同一シナリオへの同時リクエストは一回の計算にまとめる (リクエスト合体)。
+    A service that runs scenarios on a worker pool.
+    Concurrent requests for an identical scenario are coalesced into one computation.
+    """
+
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self.executor = ProcessPoolExecutor(max_workers=num_workers)
+        self.lock = threading.Lock()
+        self.in_flight = {} # シナリオキー -> (Future, 実行したプール) / scenario key -> (Future, executor running it)
+        self.latencies = deque(maxlen=LATENCY_WINDOW_SIZE)
+        self.total_requests = 0
+        self.coalesced_requests = 0
+        self.computations = 0
+        self.failed_requests = 0
+        self.pool_restarts = 0
+        self.last_pool_failure = None
+
+    def simulate(self, payload):
+        scenario = build_scenario(payload)
+        # キーの順序に依存しない正規化されたキー
+        # Canonical key independent of key order
+        scenario_key = json.dumps(scenario, sort_keys=True, ensure_ascii=False)
+
+        start_time = time.perf_counter()
+        submitted = False
+        with self.lock:
+            self.total_requests += 1
+            if scenario_key in self.in_flight:
+                future, executor = self.in_flight[scenario_key]
+                self.coalesced_requests += 1
+            else:
+                try:
+                    future = self.executor.submit(simulate_payload, scenario)
+                except BrokenProcessPool:
+                    self._replace_executor(self.executor)
+                    future = self.executor.submit(simulate_payload, scenario)
+                executor = self.executor
+                self.in_flight[scenario_key] = (future, executor)
+                self.computations += 1
+                submitted = True
+
+        if submitted:
+            # 計算が既に終わっていればコールバックはこのスレッドで即座に呼ばれ、_forget が self.lock を取るので、ロックの外で登録する
+            # If the computation has already finished the callback runs immediately on this thread, and _forget takes
+            # self.lock, so register it outside the lock
+            future.add_done_callback(lambda done_future: self._forget(scenario_key, done_future))
+
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            # ワーカーが異常終了した。そのプールで待っていた計算だけを失敗させ、以降のリクエストは新しいプールで実行する
+            # A worker died. Only the computations pending on that pool fail; later requests run on a new pool
+            with self.lock:
+                self.failed_requests += 1
+                self._replace_executor(executor)
+            raise
+        except Exception:
+            with self.lock:
+                self.failed_requests += 1
+            raise
+
+        with self.lock:
+            self.latencies.append(time.perf_counter() - start_time)
+        return result
+
+    def _replace_executor(self, broken_executor):
+        # 同じプールの失敗を複数のスレッドが検出しても、作り直すのは一度だけ (self.lock を保持して呼ぶ)
+        # Several threads may detect the same broken pool; it is replaced only once (call with self.lock held)
+        if self.executor is not broken_executor:
+            return
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = ProcessPoolExecutor(max_workers=self.num_workers)
+        self.pool_restarts += 1
+        self.last_pool_failure = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    def _forget(self, scenario_key, future):
+        with self.lock:
+            # 同じキーで後から登録された計算は残す / Keep a computation registered later under the same key
+            if scenario_key in self.in_flight and self.in_flight[scenario_key][0] is future:
+                del self.in_flight[scenario_key]
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            in_flight = len(self.in_flight)
+            metrics = {
+                "workers": self.num_workers,
+                "in_flight": in_flight,
+                # ワーカー数を超えた分が待ち行列に並んでいる
+                # Computations beyond the worker count are waiting in the queue
+                "queue_depth": max(0, in_flight - self.num_workers),
+                "total_requests": self.total_requests,
+                "coalesced_requests": self.coalesced_requests,
+                "computations": self.computations,
+                "failed_requests": self.failed_requests,
+                # ワーカーの異常終了でプールを作り直した回数と最後の時刻
+                # Number of times the pool was replaced after a worker died, and when it last happened
+                "pool_restarts": self.pool_restarts,
+                "last_pool_failure": self.last_pool_failure,
+            }
+
+        if latencies:
+            metrics["latency_seconds"] = {
+                "mean": sum(latencies) / len(latencies),
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "max": latencies[-1],
+            }
+        return metrics
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class SimulationRequestHandler(BaseHTTPRequestHandler):
+    # サービスは make_server で差し込まれる
+    # The service is injected by make_server
+    service = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, self.service.metrics())
+        else:
+            self._send_json(404, {"error": f"unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/simulate":
+            self._send_json(404, {"error": f"unknown path: {self.path}"})
+            return
+
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(content_length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("payload must be a JSON object")
+            result = self.service.simulate(payload)
+        except (ValueError, TypeError, KeyError) as e: # json.JSONDecodeError は ValueError / json.JSONDecodeError is a ValueError
+            self._send_json(400, {"error": str(e)})
+            return
+        except BrokenProcessPool:
+            self._send_json(503, {"error": "worker process terminated; retry the request"})
+            return
+        except Exception:
+            # 詳細はサーバー側にだけ出力し、応答には含めない
+            # Details are printed on the server side only, not included in the response
+            traceback.print_exc()
+            self._send_json(500, {"error": "internal server error"})
+            return
+
+        self._send_json(200, result)
+
+    def _send_json(self, status, body):
+        encoded = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        # リクエストごとのログは出さない (メトリクスで確認する)
+        # Do not log each request (check metrics instead)
+        pass
+
+
+class SimulationHTTPServer(ThreadingHTTPServer):
+    # 既定の待ち行列 (5) では同時接続が多いと接続がリセットされる
+    # The default listen backlog (5) resets connections under bursts of concurrent clients
+    request_queue_size = 1024
+
+
+def make_server(host, port, num_workers):
+    """
+    シミュレーションサービスとHTTPサーバーを作成する。
+    Creates the simulation service and the HTTP server.
+    """
+    service = SimulationService(num_workers)
+    handler = type("BoundSimulationRequestHandler", (SimulationRequestHandler,), {"service": service})
+    return SimulationHTTPServer((host, port), handler), service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ラスバレ ダメージシミュレーター HTTPサービス") # Last Bullet Damage Simulator HTTP service
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    httpd, service = make_server(args.host, args.port, args.workers)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
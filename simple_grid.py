@@ -0,0 +1,81 @@
+import numpy as np
+
+from qmc import mean_interval
+
+# --- 簡易ダメージ計算の結果表 ---
+# --- Simple Damage Calculation Result Grid ---
+#
+# 結果は (攻撃バフ, 防御バフ, 統計量) の float32 配列として持ち、文字列への変換と強調表示は表示するときに行う。
+# 表示の切り替え (ダメージ / HP割合 / ワンパン率、強調するワンパン率のしきい値) はシミュレーションを再実行しない。
+# Results are kept as a float32 array over (attack buff, defense buff, statistic); conversion to strings and
+# highlighting happen at display time. Switching the display (damage / HP % / one-shot rate, the one-shot rate
+# threshold for highlighting) does not rerun the simulation.
+
+# 統計量の軸の並び / Order of the statistic axis
+GRID_STATISTICS = ["average_damage", "hp_percentage", "one_shot_rate_percentage", "average_damage_half_width"]
+
+# 表示方式 -> 表示名 / Display mode -> label
+GRID_DISPLAYS = {
+    "damage_and_hp": "平均ダメ (HP割合)", # Avg Damage (HP %)
+    "damage": "平均ダメ", # Avg Damage
+    "hp_percentage": "HP割合", # HP %
+    "one_shot_rate": "ワンパン率", # One-shot rate
+}
+
+# しきい値以上のセルの強調表示 / Highlight for cells at or above the threshold
+HIGHLIGHT_STYLE = "background-color: #ffe3e3; color: #c92a2a"
+
+
+def grid_statistics(run, atk_levels, def_levels, target_hp):
+    """
+    incremental.IncrementalRun の各セル (攻撃バフ × 防御バフ、属性バフは0) について統計量を計算する。
+    (攻撃バフ数, 防御バフ数, len(GRID_STATISTICS)) の float32 配列を返す。
+    Computes the statistics for each cell (attack buff x defense buff, attribute buffs 0) of an incremental.IncrementalRun.
+    Returns a float32 array of shape (attack buffs, defense buffs, len(GRID_STATISTICS)).
+    """
+    statistics = np.empty((len(atk_levels), len(def_levels), len(GRID_STATISTICS)), dtype=np.float32)
+    for i, atk_level in enumerate(atk_levels):
+        for j, def_level in enumerate(def_levels):
+            damages = run.damages(atk_level, def_level)
+            average_damage, half_width = mean_interval(damages, run.sampling_method)
+            statistics[i, j] = [
+                average_damage,
+                min(100.0, max(0.0, (average_damage / target_hp) * 100)),
+                np.count_nonzero(damages >= target_hp) / len(damages) * 100,
+                half_width,
+            ]
+    return statistics
+
+
+def format_grid_cells(statistics, display="damage_and_hp"):
+    """
+    grid_statistics の配列を display の表示方式で文字列にした (攻撃バフ数, 防御バフ数) の配列を返す。
+    Returns a (attack buffs, defense buffs) array of strings for the grid_statistics array in the display mode.
+    """
+    average_damage = statistics[..., GRID_STATISTICS.index("average_damage")]
+    hp_percentage = statistics[..., GRID_STATISTICS.index("hp_percentage")]
+    one_shot_rate_percentage = statistics[..., GRID_STATISTICS.index("one_shot_rate_percentage")]
+
+    if display == "damage_and_hp":
+        formatter = lambda i: f"{int(round(float(average_damage[i]))):,} ({hp_percentage[i]:.1f}%)" # 四捨五入 / Round
+    elif display == "damage":
+        formatter = lambda i: f"{int(round(float(average_damage[i]))):,}"
+    elif display == "hp_percentage":
+        formatter = lambda i: f"{hp_percentage[i]:.1f}%"
+    elif display == "one_shot_rate":
+        formatter = lambda i: f"{one_shot_rate_percentage[i]:.1f}%"
+    else:
+        raise ValueError(f"unknown grid display: {display}")
+
+    cells = np.empty(statistics.shape[:-1], dtype=object)
+    for index in np.ndindex(cells.shape):
+        cells[index] = formatter(index)
+    return cells
+
+
+def highlight_mask(statistics, one_shot_rate_threshold):
+    """
+    ワンパン率がしきい値 (%) 以上のセルを True とした (攻撃バフ数, 防御バフ数) の配列を返す。
+    Returns a (attack buffs, defense buffs) boolean array that is True where the one-shot rate is at or above the threshold (%).
+    """
+    return statistics[..., GRID_STATISTICS.index("one_shot_rate_percentage")] >= one_shot_rate_threshold
@@ -0,0 +1,399 @@
+import argparse
+import itertools
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from damage_calc import build_scenario
+from damage_table import DamageTable, PLANE_KEYS
+from result_cube import create_result_cube
+
+# --- 再開可能なパラメータスイープ ---
+# --- Resumable Parameter Sweeps ---
+#
+# パラメータ空間 (軸の直積) を「パラメータ点 × サンプルの塊」の作業単位に分け、
+# 作業単位が終わるたびに合算可能な要約 (件数・合計・ビン) をファイルに書き出す。
+# 再実行すると終わった作業単位は飛ばすため、途中で止まっても続きから再開できる。
+# --shard で複数のプロセスに分担させ、最後に merge で結果をまとめる。
+# "store_samples": true にすると、全サンプルを結果キューブ (result_cube.py) にも書き込む。
+# The parameter space (the product of the axes) is split into work units of "parameter point x sample chunk",
+# and a mergeable summary (counts, sums, bins) is written to a file as each unit completes.
+# Running again skips finished units, so an interrupted sweep resumes where it stopped.
+# Split the work across processes with --shard, then combine the results with merge.
+# With "store_samples": true every sample is also written to a result cube (result_cube.py).
+#
+# 使い方 / Usage:
+#   python sweep.py run spec.json sweep_out --shard 0/2
+#   python sweep.py run spec.json sweep_out --shard 1/2
+#   python sweep.py status sweep_out
+#   python sweep.py merge sweep_out --output result.json
+#
+# spec.json の例 / Example spec.json:
+#   {
+#     "base": {"base_attack": 800000},
+#     "axes": {"atk_level": [0, 5, 10], "def_level": [-5, 0, 5], "memoria": [[...25 rows...], [...25 rows...]]},
+#     "num_samples": 100000, "samples_per_unit": 20000, "seed": 1, "store_samples": true
+#   }
+
+# ヒストグラムのビン (HP割合) の既定値
+# Default histogram bins (HP percentage)
+DEFAULT_BIN_WIDTH_PERCENTAGE = 10
+DEFAULT_MAX_BIN_PERCENTAGE = 200
+
+UNITS_DIRECTORY = "units"
+SPEC_FILENAME = "spec.json"
+CUBE_FILENAME = "samples.cube"
+
+# スイープの設定に必要なキー
+# Keys required in a sweep spec
+REQUIRED_SPEC_KEYS = ["axes", "num_samples"]
+
+
+def load_spec(spec):
+    """
+    スイープの設定を検証し、既定値を補った辞書を返す。
+    Validates the sweep spec and returns a dict with defaults filled in.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("sweep spec must be a JSON object")
+    for key in REQUIRED_SPEC_KEYS:
+        if key not in spec:
+            raise ValueError(f"sweep spec is missing required key: {key}")
+    if not spec["axes"]:
+        raise ValueError("sweep spec needs at least one axis")
+    for key, values in spec["axes"].items():
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"axis {key} must be a non-empty list")
+
+    spec = {
+        "base": {}, "seed": 0,
+        "bin_width_percentage": DEFAULT_BIN_WIDTH_PERCENTAGE, "max_bin_percentage": DEFAULT_MAX_BIN_PERCENTAGE,
+        **spec,
+    }
+    spec.setdefault("samples_per_unit", spec["num_samples"])
+    for key in ["num_samples", "samples_per_unit"]:
+        if isinstance(spec[key], bool) or not isinstance(spec[key], int):
+            raise ValueError(f"{key} must be an integer")
+    if spec["num_samples"] < 1 or spec["samples_per_unit"] < 1:
+        raise ValueError("num_samples and samples_per_unit must be at least 1")
+
+    # 全てのパラメータ点がシナリオとして正しいか先に確認する
+    # Check up front that every parameter point is a valid scenario
+    for point in parameter_points(spec):
+        build_scenario({**spec["base"], **point})
+    return spec
+
+
+def parameter_points(spec):
+    """
+    軸の直積として全てのパラメータ点 (軸名 -> 値 の辞書) を返す。
+    Returns every parameter point (dict of axis name -> value) as the product of the axes.
+    """
+    axis_names = list(spec["axes"])
+    return [dict(zip(axis_names, values)) for values in itertools.product(*(spec["axes"][name] for name in axis_names))]
+
+
+def parameter_point(spec, point_index):
+    """
+    point_index 番目のパラメータ点を、全ての点を作らずに返す (parameter_points と同じ並び順)。
+    Returns the point_index-th parameter point without building every point (same order as parameter_points).
+    """
+    point = {}
+    for name in reversed(list(spec["axes"])):
+        point_index, value_index = divmod(point_index, len(spec["axes"][name]))
+        point[name] = spec["axes"][name][value_index]
+    return {name: point[name] for name in spec["axes"]}
+
+
+def work_units(spec):
+    """
+    (パラメータ点の番号, 塊の番号, サンプル数) の作業単位の一覧を返す。
+    Returns the list of work units as (point index, chunk index, number of samples).
+    """
+    units = []
+    num_points = int(np.prod([len(values) for values in spec["axes"].values()]))
+    for point_index in range(num_points):
+        remaining = spec["num_samples"]
+        chunk_index = 0
+        while remaining > 0:
+            num_samples = min(spec["samples_per_unit"], remaining)
+            units.append((point_index, chunk_index, num_samples))
+            remaining -= num_samples
+            chunk_index += 1
+    return units
+
+
+def unit_path(output_directory, point_index, chunk_index):
+    return Path(output_directory) / UNITS_DIRECTORY / f"{point_index:06d}_{chunk_index:04d}.json"
+
+
+def summarize_chunk(damages, target_hp, bin_width_percentage, max_bin_percentage):
+    """
+    ダメージの配列を合算可能な要約 (件数・合計・二乗和・最小・最大・ワンパン数・HP割合のビン) にする。
+    最後のビンは max_bin_percentage 以上の全てを数える。
+    Turns an array of damages into a mergeable summary (count, sum, sum of squares, min, max, one-shot count, HP percentage bins).
+    The last bin counts everything at or above max_bin_percentage.
+    """
+    num_bins = int(max_bin_percentage // bin_width_percentage) + 1
+    bin_indices = np.minimum((damages / target_hp * 100 // bin_width_percentage).astype(np.int64), num_bins - 1)
+    return {
+        "count": int(len(damages)),
+        "sum": float(np.sum(damages, dtype=np.float64)),
+        "sum_of_squares": float(np.sum(damages.astype(np.float64) ** 2)),
+        "min": int(np.min(damages)),
+        "max": int(np.max(damages)),
+        "one_shot_count": int(np.count_nonzero(damages >= target_hp)),
+        "bins": np.bincount(bin_indices, minlength=num_bins).tolist(),
+    }
+
+
+def merge_summaries(summary, other):
+    """
+    二つの要約を合算する。
+    Merges two summaries.
+    """
+    return {
+        "count": summary["count"] + other["count"],
+        "sum": summary["sum"] + other["sum"],
+        "sum_of_squares": summary["sum_of_squares"] + other["sum_of_squares"],
+        "min": min(summary["min"], other["min"]),
+        "max": max(summary["max"], other["max"]),
+        "one_shot_count": summary["one_shot_count"] + other["one_shot_count"],
+        "bins": [a + b for a, b in zip(summary["bins"], other["bins"])],
+    }
+
+
+# 同じプロセス内で同じステータス設定 (PLANE_KEYS) のテーブルを使い回し、補正の設定は with_corrections で差し替える。
+# 保持するのは最近使った MAX_CACHED_TABLES 個まで。
+# Reuse tables with the same stat configuration (PLANE_KEYS) within one process; correction settings are swapped in
+# with with_corrections. Only the MAX_CACHED_TABLES most recently used are kept.
+MAX_CACHED_TABLES = 8
+_table_cache = OrderedDict()
+
+def _get_table(scenario):
+    table_key = json.dumps({key: scenario[key] for key in PLANE_KEYS}, sort_keys=True, ensure_ascii=False)
+    if table_key in _table_cache:
+        _table_cache.move_to_end(table_key)
+    else:
+        _table_cache[table_key] = DamageTable(scenario)
+        while len(_table_cache) > MAX_CACHED_TABLES:
+            _table_cache.popitem(last=False)
+    return _table_cache[table_key].with_corrections(
+        **{key: value for key, value in scenario.items() if key not in PLANE_KEYS})
+
+
+def open_sample_cube(spec, output_directory):
+    """
+    スイープの全サンプルを保存する結果キューブを開く (なければ作成する)。
+    Opens the result cube holding every sweep sample (creating it if missing).
+    """
+    return create_result_cube(Path(output_directory) / CUBE_FILENAME, spec["axes"], spec["num_samples"], spec["samples_per_unit"],
+                              metadata={"base": spec["base"], "seed": spec["seed"]})
+
+
+# 同じプロセス内では結果キューブを開いたままにする
+# Keep the result cube open within one process
+_cube_cache = {}
+
+def _get_cube(spec, output_directory):
+    if output_directory not in _cube_cache:
+        _cube_cache[output_directory] = open_sample_cube(spec, output_directory)
+    return _cube_cache[output_directory]
+
+
+def run_unit(spec, output_directory, point_index, chunk_index, num_samples):
+    """
+    一つの作業単位を実行し、要約を一時ファイル経由で書き出す (書きかけのファイルが残らない)。
+    乱数はスイープの seed・パラメータ点・塊の番号から決まるため、再実行しても同じ結果になる。
+    Runs one work unit and writes its summary via a temporary file (no half-written files are left behind).
+    The random stream is determined by the sweep seed, point and chunk index, so rerunning gives the same result.
+    """
+    point = parameter_point(spec, point_index)
+    scenario = build_scenario({**spec["base"], **point})
+    rng = np.random.default_rng([spec["seed"], point_index, chunk_index])
+    damages = _get_table(scenario).simulate(
+        scenario["atk_level"], scenario["def_level"], num_samples, rng,
+        scenario["attribute_atk_buff_value"], scenario["attribute_def_buff_value"])
+    if spec.get("store_samples"):
+        # 要約ファイルより先に書き込む (要約ファイルがあればサンプルも書き込み済み)
+        # Written before the summary file (if the summary file exists, the samples are written too)
+        _get_cube(spec, output_directory).write_chunk(point_index, chunk_index, damages)
+
+    unit = {
+        "point_index": point_index,
+        "chunk_index": chunk_index,
+        "point": point,
+        "target_hp": scenario["target_hp"],
+        "summary": summarize_chunk(damages, scenario["target_hp"], spec["bin_width_percentage"], spec["max_bin_percentage"]),
+    }
+    path = unit_path(output_directory, point_index, chunk_index)
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(unit, f, ensure_ascii=False)
+    os.replace(temporary_path, path)
+    return point_index, chunk_index
+
+
+def prepare_output_directory(spec, output_directory):
+    """
+    出力先を作成し、スイープの設定を保存する。既存の設定と異なる場合は ValueError を送出する。
+    複数のシャードが同時に呼んでも、書きかけの設定ファイルを読むことはない。
+    Creates the output directory and saves the sweep spec. Raises ValueError if it differs from an existing spec.
+    Safe to call from several shards at once: a half-written spec file is never read.
+    """
+    (Path(output_directory) / UNITS_DIRECTORY).mkdir(parents=True, exist_ok=True)
+    spec_path = Path(output_directory) / SPEC_FILENAME
+    if not spec_path.exists():
+        # 一時ファイルに書いてからリンクする (既にあれば他のシャードが作成済みなので、下で内容を比べる)
+        # Write a temporary file, then link it into place (if it already exists another shard created it; compared below)
+        temporary_path = spec_path.with_name(f"{spec_path.name}.{os.getpid()}.tmp")
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(spec, f, ensure_ascii=False, indent=2)
+        try:
+            os.link(temporary_path, spec_path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temporary_path)
+    with open(spec_path, encoding="utf-8") as f:
+        if json.load(f) != spec:
+            raise ValueError(f"{spec_path} differs from the given spec; use a new output directory")
+    if spec.get("store_samples"):
+        open_sample_cube(spec, output_directory)
+
+
+def pending_units(spec, output_directory, shard_index=0, num_shards=1):
+    """
+    このシャードが担当する作業単位のうち、まだ終わっていないものを返す。
+    Returns the work units assigned to this shard that have not finished yet.
+    """
+    return [
+        unit for unit_index, unit in enumerate(work_units(spec))
+        if unit_index % num_shards == shard_index and not unit_path(output_directory, unit[0], unit[1]).exists()
+    ]
+
+
+def run_sweep(spec, output_directory, shard_index=0, num_shards=1, num_workers=1, progress=None):
+    """
+    未完了の作業単位を実行する。num_workers が2以上ならプロセスプールで並列に実行する。
+    Runs the unfinished work units, in parallel on a process pool when num_workers is 2 or more.
+    """
+    spec = load_spec(spec)
+    prepare_output_directory(spec, output_directory)
+    units = pending_units(spec, output_directory, shard_index, num_shards)
+
+    if num_workers <= 1:
+        for unit in units:
+            run_unit(spec, output_directory, *unit)
+            if progress:
+                progress(unit)
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(run_unit, spec, output_directory, *unit) for unit in units]
+            for unit, future in zip(units, futures):
+                future.result()
+                if progress:
+                    progress(unit)
+    return len(units)
+
+
+def merge_sweep(output_directory):
+    """
+    書き出された作業単位をパラメータ点ごとに合算し、統計量を付けた結果の一覧を返す。
+    Merges the written work units per parameter point and returns the results with statistics.
+    """
+    with open(Path(output_directory) / SPEC_FILENAME, encoding="utf-8") as f:
+        spec = json.load(f)
+    points = parameter_points(spec)
+
+    merged = {}
+    target_hps = {}
+    for path in sorted((Path(output_directory) / UNITS_DIRECTORY).glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            unit = json.load(f)
+        point_index = unit["point_index"]
+        target_hps[point_index] = unit["target_hp"]
+        merged[point_index] = merge_summaries(merged[point_index], unit["summary"]) if point_index in merged else unit["summary"]
+
+    results = []
+    for point_index, point in enumerate(points):
+        if point_index not in merged:
+            continue
+        summary = merged[point_index]
+        count = summary["count"]
+        average_damage = summary["sum"] / count
+        variance = max(0.0, summary["sum_of_squares"] / count - average_damage ** 2)
+        results.append({
+            "point": point,
+            "complete": count == spec["num_samples"],
+            "average_damage": average_damage,
+            "std_damage": variance ** 0.5,
+            "hp_shaved_percentage": min(100.0, max(0.0, average_damage / target_hps[point_index] * 100)),
+            "one_shot_rate_percentage": summary["one_shot_count"] / count * 100,
+            **summary,
+        })
+    return results
+
+
+def parse_shard(value):
+    """
+    "i/n" 形式のシャード指定を (i, n) に変換する (0 <= i < n)。
+    Parses a shard given as "i/n" into (i, n), with 0 <= i < n.
+    """
+    try:
+        shard_index, num_shards = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/n: {value}")
+    if num_shards <= 0 or not 0 <= shard_index < num_shards:
+        raise argparse.ArgumentTypeError(f"shard must satisfy 0 <= i < n: {value}")
+    return shard_index, num_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="再開可能なパラメータスイープ") # Resumable parameter sweeps
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="未完了の作業単位を実行する / run unfinished work units")
+    run_parser.add_argument("spec")
+    run_parser.add_argument("output_directory")
+    run_parser.add_argument("--shard", type=parse_shard, default="0/1", help="担当するシャード (例: 0/4) / shard to run (e.g. 0/4)")
+    run_parser.add_argument("--workers", type=int, default=1)
+
+    status_parser = subparsers.add_parser("status", help="進捗を表示する / show progress")
+    status_parser.add_argument("output_directory")
+
+    merge_parser = subparsers.add_parser("merge", help="結果をまとめる / combine results")
+    merge_parser.add_argument("output_directory")
+    merge_parser.add_argument("--output", help="結果を書き出すJSONファイル / JSON file to write results to")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        shard_index, num_shards = args.shard
+        with open(args.spec, encoding="utf-8") as f:
+            spec = json.load(f)
+        num_units = run_sweep(spec, args.output_directory, shard_index, num_shards, args.workers,
+                              progress=lambda unit: print(f"done point {unit[0]} chunk {unit[1]}", flush=True))
+        print(f"{num_units} work units completed")
+    elif args.command == "status":
+        with open(Path(args.output_directory) / SPEC_FILENAME, encoding="utf-8") as f:
+            spec = json.load(f)
+        num_units = len(work_units(spec))
+        num_pending = len(pending_units(spec, args.output_directory))
+        print(f"{num_units - num_pending}/{num_units} work units completed")
+    elif args.command == "merge":
+        results = merge_sweep(args.output_directory)
+        encoded = json.dumps(results, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(encoded)
+        else:
+            print(encoded)
+
+
+if __name__ == "__main__":
+    main()
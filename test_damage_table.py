@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import damage_calc
+from damage_calc import build_scenario, simulate_damage
+from damage_table import DamageTable
+from game_tables import GAME_TABLE_VERSIONS, get_game_tables
+
+NUM_SAMPLES = 200
+
+
+class ScriptedRandom:
+    """
+    与えられた一様乱数を順に返す random モジュールの代わり。
+    A stand-in for the random module that returns the given uniforms in order.
+    """
+
+    def __init__(self, uniforms):
+        self.uniforms = iter(uniforms)
+
+    def random(self):
+        return next(self.uniforms)
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+
+def _scenario(game_table_version):
+    skill_types = [skill_type for skill_type in get_game_tables(game_table_version).supportskill_damageup_rate if skill_type != "なし"]
+    breakthroughs = list(get_game_tables(game_table_version).activation_probability)
+    memoria = [{"種類": "なし" if i % 6 == 5 else skill_types[i % len(skill_types)],
+                "凸数": breakthroughs[i % len(breakthroughs)],
+                "属性": damage_calc.ATTRIBUTE_OPTIONS[i % 3]} for i in range(25)]
+    return build_scenario({
+        "game_table_version": game_table_version,
+        "selected_attack_memoria_category": "特殊単体", "selected_lily_role": "特殊単体",
+        "selected_lily_attribute": "火", "lily_aux_prob_amp_value": 0.05,
+        "legendary_amplification_per_attribute_totals": {"火": 0.3},
+        "selected_opponent_lily_attribute": "火", "critical_active": True, "stack_meteor_active": True,
+        "memoria": memoria,
+    })
+
+
+def _reference_damages(scenario, atk_level, def_level, attribute_atk_buff_value, attribute_def_buff_value,
+                       aux_uniforms, random_uniforms, monkeypatch):
+    buff_level_to_percent_multiplier = get_game_tables(scenario["game_table_version"]).corrections["buff_level_to_percent_multiplier"]
+    damages = []
+    for sample_aux_uniforms, random_uniform in zip(aux_uniforms, random_uniforms):
+        # 逐次版は「なし」以外のメモリアごとに一つ、最後に乱数係数に一つ乱数を使う
+        # The sequential version draws one uniform per memoria other than "None", then one for the random factor
+        draws = [u for memoria, u in zip(scenario["memoria"], sample_aux_uniforms) if memoria["種類"] != "なし"]
+        monkeypatch.setattr(damage_calc, "random", ScriptedRandom(draws + [random_uniform]))
+        damages.append(simulate_damage(
+            scenario["base_attack"], scenario["base_spattack"], scenario["base_defence"], scenario["base_spdefence"],
+            atk_level * buff_level_to_percent_multiplier, def_level * buff_level_to_percent_multiplier,
+            attribute_atk_buff_value, attribute_def_buff_value,
+            scenario["selected_attack_memoria_subtype"], scenario["selected_breakthrough_multiplier_rate"],
+            scenario["selected_attack_memoria_attribute"], scenario["selected_attack_memoria_category"],
+            scenario["memoria"], scenario["legendary_amplification_per_attribute_totals"],
+            scenario["selected_lily_role"], scenario["lily_role_correction_rate"],
+            scenario["lily_aux_prob_amp_value"], scenario["selected_aux_prob_amp_attribute"],
+            scenario["selected_lily_attribute"], scenario["lily_attribute_correction_rate"],
+            scenario["charm_rates"], scenario["order_rate"], scenario["counterattack_rate"], scenario["theme_rates"],
+            scenario["grace_active"], scenario["neunwelt_active"],
+            scenario["stack_meteor_active"], scenario["stack_barrier_active"],
+            scenario["critical_active"],
+            scenario["selected_opponent_lily_attribute"], scenario["opponent_lily_reduction_rate"],
+            game_table_version=scenario["game_table_version"],
+        ))
+    return np.array(damages)
+
+
+@pytest.mark.parametrize("game_table_version", list(GAME_TABLE_VERSIONS))
+@pytest.mark.parametrize("atk_level, def_level, attribute_atk_buff_value, attribute_def_buff_value",
+                         [(0, 0, 0, 0), (25, -20, 0, 0), (-20, 5, 30000, -10000), (10, -5, -50000, 20000)])
+def test_table_matches_sequential_reference(game_table_version, atk_level, def_level,
+                                            attribute_atk_buff_value, attribute_def_buff_value, monkeypatch):
+    scenario = _scenario(game_table_version)
+    table = DamageTable(scenario)
+    rng = np.random.default_rng(0)
+    aux_uniforms, random_uniforms = rng.random((NUM_SAMPLES, 25)), rng.random(NUM_SAMPLES)
+
+    auxiliary_skill_factors, random_factors = table.random_inputs_from_uniforms(aux_uniforms, random_uniforms)
+    damages = table.damages(atk_level, def_level, auxiliary_skill_factors, random_factors,
+                            attribute_atk_buff_value, attribute_def_buff_value)
+    reference_damages = _reference_damages(scenario, atk_level, def_level, attribute_atk_buff_value, attribute_def_buff_value,
+                                           aux_uniforms, random_uniforms, monkeypatch)
+    assert np.array_equal(damages, reference_damages)
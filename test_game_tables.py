@@ -0,0 +1,67 @@
+import copy
+import json
+
+import numpy as np
+import pytest
+
+import game_tables
+from damage_calc import build_scenario
+from damage_table import DamageTable
+from game_tables import DEFAULT_GAME_TABLE_VERSION, GAME_TABLES_PATH, load_game_tables
+
+PROVISIONAL_VERSION = "test-provisional"
+
+
+def _data_with_provisional_version():
+    """
+    既定の版に加えて、未検証の Ⅴ/Ⅵ の値と凸数を変えた仮の版を持つデータを返す。
+    Returns the data with a provisional version next to the default one, with different unverified V/VI values and breakthroughs.
+    """
+    with open(GAME_TABLES_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    provisional = copy.deepcopy(data["versions"][DEFAULT_GAME_TABLE_VERSION])
+    provisional["description"] = "テスト用の仮の値"
+    provisional["memoria_skill_effect_rate"]["AⅤ"] = 0.17
+    provisional["breakthrough_multiplier_rate"]["5凸"] = 1.6
+    provisional["activation_probability"]["5凸"] = 0.16
+    data["versions"][PROVISIONAL_VERSION] = provisional
+    return data
+
+
+@pytest.fixture
+def provisional_version(tmp_path, monkeypatch):
+    path = tmp_path / "game_tables.json"
+    path.write_text(json.dumps(_data_with_provisional_version(), ensure_ascii=False), encoding="utf-8")
+    _, versions, _ = load_game_tables(path)
+    monkeypatch.setitem(game_tables.GAME_TABLE_VERSIONS, PROVISIONAL_VERSION, versions[PROVISIONAL_VERSION])
+    return versions
+
+
+def test_versions_load_side_by_side(provisional_version):
+    assert set(provisional_version) == {DEFAULT_GAME_TABLE_VERSION, PROVISIONAL_VERSION}
+    assert provisional_version[PROVISIONAL_VERSION].memoria_skill_effect_rate["AⅤ"] == 0.17
+    assert provisional_version[DEFAULT_GAME_TABLE_VERSION].memoria_skill_effect_rate["AⅤ"] == 0.165
+
+
+def test_invalid_version_is_rejected(tmp_path):
+    data = _data_with_provisional_version()
+    del data["versions"][PROVISIONAL_VERSION]["corrections"]["grace"]
+    path = tmp_path / "game_tables.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    with pytest.raises(ValueError, match="missing corrections"):
+        load_game_tables(path)
+
+
+def test_scenario_selects_version(provisional_version):
+    # 凸数の選択肢は選んだ版のもの / Breakthrough options come from the selected version
+    build_scenario({"game_table_version": PROVISIONAL_VERSION, "selected_breakthrough_multiplier_rate": "5凸"})
+    with pytest.raises(ValueError, match="unknown breakthrough"):
+        build_scenario({"selected_breakthrough_multiplier_rate": "5凸"})
+
+    def mean_damage(version, subtype):
+        table = DamageTable(build_scenario({"game_table_version": version, "selected_attack_memoria_subtype": subtype}))
+        return table.simulate(10, 0, 1000, np.random.default_rng(0)).mean()
+
+    # 値を変えたスキルだけが版によって変わる / Only the skill whose value changed differs between versions
+    assert mean_damage(PROVISIONAL_VERSION, "AⅣ") == mean_damage(DEFAULT_GAME_TABLE_VERSION, "AⅣ")
+    assert mean_damage(PROVISIONAL_VERSION, "AⅤ") > mean_damage(DEFAULT_GAME_TABLE_VERSION, "AⅤ")
@@ -0,0 +1,62 @@
+import numpy as np
+
+from damage_calc import attack_buff_levels, build_scenario, defense_buff_levels
+from damage_table import DamageTable, sample_auxiliary_factors
+from incremental import IncrementalRun
+
+GRID_CELLS = [(atk_level, def_level) for atk_level in attack_buff_levels for def_level in defense_buff_levels]
+
+
+def _memoria(first_row):
+    return [first_row] + [{"種類": "なし", "凸数": "4凸", "属性": "火"} for _ in range(24)]
+
+
+def _tables():
+    table = DamageTable(build_scenario({"target_hp": 300000, "memoria": _memoria({"種類": "なし", "凸数": "4凸", "属性": "火"})}))
+    edited_table = table.with_corrections(memoria=_memoria({"種類": "ダメージUPⅠ", "凸数": "4凸", "属性": "火"}))
+    return table, edited_table
+
+
+def _count_damages_calls(table):
+    calls = []
+    damages = table.damages
+
+    def counting_damages(*args, **kwargs):
+        calls.append(args[:2])
+        return damages(*args, **kwargs)
+
+    table.damages = counting_damages
+    return calls
+
+
+def test_update_matches_full_recompute():
+    table, edited_table = _tables()
+    for method in ["random", "rqmc"]:
+        run = IncrementalRun.draw(table, 512, np.random.default_rng(0), method)
+        for cell in GRID_CELLS:
+            run.damages(*cell)
+        run.update(edited_table)
+
+        auxiliary_skill_factors = sample_auxiliary_factors(
+            edited_table.aux_probabilities, edited_table.aux_amplifications,
+            edited_table.legendary_amplification_total, run.row_uniforms.T)
+        assert np.array_equal(auxiliary_skill_factors, run.auxiliary_skill_factors)
+        for cell in GRID_CELLS:
+            assert np.array_equal(edited_table.damages(*cell, auxiliary_skill_factors, run.random_factors), run.damages(*cell))
+
+
+def test_update_cost_bounded_after_uncached_cells():
+    table, edited_table = _tables()
+    run = IncrementalRun.draw(table, 512, np.random.default_rng(0))
+    for cell in GRID_CELLS:
+        run.damages(*cell)
+    # ヒストグラムのようにスライダーで多くのセルを参照しても、保持するのは表のセルだけ
+    # Visiting many cells like the histogram sliders do keeps only the grid cells
+    for atk_level in range(-20, 21):
+        for attribute_atk_buff_value in [0, 10000, 20000]:
+            run.damages(atk_level, 3, attribute_atk_buff_value, 0, cache=False)
+    assert len(run.cells) == len(GRID_CELLS)
+
+    calls = _count_damages_calls(edited_table)
+    assert run.update(edited_table) > 0
+    assert len(calls) == len(GRID_CELLS)
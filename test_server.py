@@ -0,0 +1,31 @@
+import threading
+
+from server import SimulationService
+
+
+def test_concurrent_small_requests_do_not_deadlock():
+    # 小さい N の計算は add_done_callback の前に終わることがあり、そのときコールバックは呼び出し元のスレッドで即座に実行される
+    # Small-N computations can finish before add_done_callback, which then runs the callback immediately on the calling thread
+    service = SimulationService(2)
+    errors = []
+
+    def send_requests(thread_index):
+        try:
+            for i in range(250):
+                service.simulate({"num_simulations": 1, "seed": thread_index * 100 + i % 5})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=send_requests, args=(thread_index,), daemon=True) for thread_index in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        assert not any(thread.is_alive() for thread in threads)
+        assert not errors
+        metrics = service.metrics()
+        assert metrics["total_requests"] == 1000
+        assert metrics["in_flight"] == 0
+    finally:
+        service.shutdown()